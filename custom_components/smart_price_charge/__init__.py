@@ -1,22 +1,65 @@
-"""SmartPriceCharge Init."""
-import logging
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+"""SmartPriceCharge Init.
+
+Home Assistant wird erst in den Setup-Funktionen importiert, damit die reinen
+Module (engine, timeline, optimizer, ...) ohne HA importierbar bleiben.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 from .const import DOMAIN
-from .manager import SmartPriceChargeManager
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant, ServiceCall
 
 PLATFORMS = ["sensor", "switch"]
+SERVICE_PROFILE = "profile"
+
+def _async_register_services(hass: HomeAssistant):
+    """Registriert die Domain-Dienste einmalig."""
+    if hass.services.has_service(DOMAIN, SERVICE_PROFILE): return
+    import voluptuous as vol
+    from homeassistant.exceptions import HomeAssistantError
+    profile_schema = vol.Schema({
+        vol.Optional("ticks", default=10): vol.All(vol.Coerce(int), vol.Range(min=1, max=500)),
+        vol.Optional("entry_id"): str,
+    })
+
+    async def handle_profile(call: ServiceCall):
+        # cProfile erlaubt nur einen aktiven Profiler pro Prozess, daher immer genau ein Eintrag
+        managers = hass.data.get(DOMAIN, {})
+        entry_id = call.data.get("entry_id")
+        if entry_id is None and len(managers) == 1: entry_id = next(iter(managers))
+        manager = managers.get(entry_id)
+        if manager is None: raise HomeAssistantError("Bitte einen gültigen Eintrag (entry_id) angeben")
+        if any(m.profiling for m in managers.values()): raise HomeAssistantError("Es läuft bereits eine Profilierung")
+        manager.async_start_profile(call.data["ticks"])
+
+    hass.services.async_register(DOMAIN, SERVICE_PROFILE, handle_profile, schema=profile_schema)
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Setze die Integration auf."""
+    from .manager import SmartPriceChargeManager
+    from .websocket import async_register_websocket
     hass.data.setdefault(DOMAIN, {})
     
     manager = SmartPriceChargeManager(hass, entry)
-    await manager.async_config_entry_first_refresh()
+    # Warmstart von der Platte, damit der Setup nicht auf die Preis-API wartet
+    await manager.async_warm_start()
     
     hass.data[DOMAIN][entry.entry_id] = manager
+    _async_register_services(hass)
+    async_register_websocket(hass)
+    manager.async_start_listeners()
+    entry.async_on_unload(manager.async_stop_listeners)
+    manager.async_join_fleet()
+    entry.async_on_unload(manager.async_leave_fleet)
+    entry.async_on_unload(manager.async_cancel_ai_advice)
+    entry.async_on_unload(manager.price_service.subscribe(entry.entry_id, manager.async_prices_updated))
     
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_create_background_task(hass, manager.async_refresh(), f"{DOMAIN}_first_refresh")
     
     # Listener für Einstellungs-Änderungen
     entry.async_on_unload(entry.add_update_listener(update_listener))
@@ -27,9 +70,16 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Entlade die Integration."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        manager = hass.data[DOMAIN].pop(entry.entry_id)
+        await manager.trackers.async_save()
+        if not hass.data[DOMAIN]:
+            hass.services.async_remove(DOMAIN, SERVICE_PROFILE)
     return unload_ok
 
 async def update_listener(hass: HomeAssistant, entry: ConfigEntry):
-    """Lädt die Integration neu, wenn Optionen geändert wurden."""
-    await hass.config_entries.async_reload(entry.entry_id)
\ No newline at end of file
+    """Übernimmt geänderte Optionen im laufenden Manager, ohne die Integration neu zu laden."""
+    manager = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if manager is None:
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    manager.async_apply_options()
\ No newline at end of file
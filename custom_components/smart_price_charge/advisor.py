@@ -0,0 +1,207 @@
+"""KI-Berater für SmartPriceCharge: Anfragen im Hintergrund, mit Warteschlange, Cache und Backoff."""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+
+import aiohttp
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Ein Berater pro Home Assistant, geteilt von allen Config-Entries
+DATA_ADVISOR = f"{DOMAIN}_advisor"
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+REQUEST_TIMEOUT = 30
+# Offene Anfragen; weitere werden verworfen statt sich aufzustauen
+QUEUE_SIZE = 4
+# Exponentieller Backoff bei Fehlern (Sekunden)
+BACKOFF_BASE = 300
+BACKOFF_MAX = 6 * 3600
+# Gespeicherte Antworten je Eingabe-Hash
+CACHE_SIZE = 16
+# Zeitraum der Tages-Historie im Prompt, zusammengefasst in Wochen
+HISTORY_DAYS = 28
+TRACKER_LABELS = (
+    ("kwh", "Geladen kWh"), ("cost", "Kosten EUR"), ("saved", "Ersparnis Laden EUR"),
+    ("discharge", "Ersparnis Entladen EUR"), ("pv", "PV direkt EUR"),
+)
+
+
+def build_summary(history, settings):
+    """Kompakte Eingabe aus der Tages-Historie [(Datum, {key: Wert})]: Wochensummen plus Einstellungen."""
+    days = history[-HISTORY_DAYS:]
+    weeks = []
+    for i in range(0, len(days), 7):
+        chunk = days[i:i + 7]
+        week = {k: round(sum(v[k] for _, v in chunk), 2) for k, _ in TRACKER_LABELS}
+        week["from"] = chunk[0][0].isoformat()
+        week["days"] = len(chunk)
+        weeks.append(week)
+    kwh = sum(v["kwh"] for _, v in days)
+    cost = sum(v["cost"] for _, v in days)
+    return {
+        "weeks": weeks,
+        "avg_charge_price": round(cost / kwh, 3) if kwh else None,
+        "settings": {k: settings[k] for k in sorted(settings)},
+    }
+
+
+def summary_hash(summary, endpoint=""):
+    return hashlib.sha1(json.dumps([endpoint, summary], sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def build_prompt(summary):
+    lines = ["Du bist ein Smart-Home Energie-Optimierer. Analysiere kurz die Effizienz.", "Wochenwerte:"]
+    for w in summary["weeks"]:
+        values = ", ".join(f"{label} {w[k]}" for k, label in TRACKER_LABELS)
+        lines.append(f"- ab {w['from']} ({w['days']} Tage): {values}")
+    if summary["avg_charge_price"] is not None:
+        lines.append(f"Mittlerer Ladepreis: {summary['avg_charge_price']} EUR/kWh")
+    lines.append("Einstellungen: " + ", ".join(f"{k}={v}" for k, v in summary["settings"].items()))
+    lines.append(
+        "Aufgabe: Gib EINEN kurzen, konkreten Satz als Empfehlung an den Nutzer. "
+        "Lohnt sich die aktuelle Einstellung? Sollte er Parameter ändern?"
+    )
+    return "\n".join(lines)
+
+
+def _parse_answer(data):
+    """Gemini-Format oder ein lokaler Endpunkt mit {"text": ...}/{"advice": ...}."""
+    if isinstance(data, dict):
+        for key in ("text", "advice"):
+            if isinstance(data.get(key), str): return data[key]
+        try: return data["candidates"][0]["content"]["parts"][0]["text"]
+        except (KeyError, IndexError, TypeError): pass
+    raise RuntimeError("Unbekanntes Antwortformat")
+
+
+def async_get_advisor(hass):
+    advisor = hass.data.get(DATA_ADVISOR)
+    if advisor is None: advisor = hass.data[DATA_ADVISOR] = AiAdvisor(hass)
+    return advisor
+
+
+class AiAdvisor:
+    """Beantwortet Anfragen nacheinander in einem Hintergrund-Task; die Regelung wartet nie darauf.
+
+    `endpoint` ist entweder leer (Gemini mit API-Key) oder die URL eines eigenen
+    Dienstes, der {"prompt": ...} per POST annimmt und {"text": ...} liefert.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.advisor")
+        self._loaded = False
+        self._queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._worker = None
+        # Im Backoff zurückgestellte Anfragen, die jüngste je Empfänger
+        self._pending = {}
+        self._cache = OrderedDict()
+        self.failures = 0
+        self.next_attempt = 0.0
+        self.requests = 0
+        self.cache_hits = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def submit(self, summary, endpoint, api_key, on_advice):
+        """Reiht eine Anfrage ein; `on_advice(text)` wird nach der Antwort aufgerufen. False wenn verworfen.
+
+        Während des Backoffs werden nur Antworten aus dem Cache sofort geliefert; alle
+        anderen Anfragen (auch fehlgeschlagene) werden nach Ablauf des Backoffs wiederholt.
+        """
+        if not endpoint and not api_key: return False
+        try: self._queue.put_nowait((summary, endpoint, api_key, on_advice))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        if self._worker is None or self._worker.done():
+            self._worker = self.hass.async_create_background_task(self._async_work(), f"{DOMAIN}_advisor")
+        return True
+
+    def cancel(self, on_advice):
+        """Verwirft eine zurückgestellte Anfrage für `on_advice` (z.B. beim Entladen des Eintrags)."""
+        self._pending.pop(on_advice, None)
+
+    async def _async_work(self):
+        # Läuft, bis Warteschlange und Rückstellungen leer sind; submit startet ihn bei Bedarf neu
+        if not self._loaded: await self._async_load()
+        while True:
+            if not self._queue.empty():
+                await self._async_handle(self._queue.get_nowait())
+                continue
+            if not self._pending: return
+            await asyncio.sleep(max(0.0, self.next_attempt - time.time()))
+            if time.time() < self.next_attempt: continue
+            pending, self._pending = list(self._pending.values()), {}
+            for request in pending: await self._async_handle(request)
+
+    async def _async_handle(self, request):
+        summary, endpoint, api_key, on_advice = request
+        key = summary_hash(summary, endpoint)
+        advice = self._cache.get(key)
+        if advice is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+        else:
+            if time.time() < self.next_attempt:
+                self._pending[on_advice] = request
+                return
+            advice = await self._async_request(build_prompt(summary), endpoint, api_key)
+            if advice is None:
+                self._pending[on_advice] = request
+                return
+            self._cache[key] = advice
+            while len(self._cache) > CACHE_SIZE: self._cache.popitem(last=False)
+            self._store.async_delay_save(lambda: {"cache": dict(self._cache)}, SAVE_DELAY)
+        # Eine ältere, noch zurückgestellte Anfrage desselben Empfängers ist damit überholt
+        self._pending.pop(on_advice, None)
+        try: on_advice(advice)
+        except Exception as e: _LOGGER.error(f"KI-Empfehlung konnte nicht übernommen werden: {e}")
+
+    async def _async_load(self):
+        self._loaded = True
+        try: data = await self._store.async_load()
+        except Exception as e:
+            _LOGGER.warning(f"KI-Cache nicht lesbar: {e}")
+            return
+        for key, advice in ((data or {}).get("cache") or {}).items(): self._cache[key] = advice
+
+    async def _async_request(self, prompt, endpoint, api_key):
+        self.requests += 1
+        session = async_get_clientsession(self.hass)
+        if endpoint:
+            url, headers, payload = endpoint, {}, {"prompt": prompt}
+        else:
+            url, headers = GEMINI_URL, {"x-goog-api-key": api_key}
+            payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        try:
+            async with session.post(url, json=payload, headers=headers, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as resp:
+                if resp.status != 200: raise RuntimeError(f"HTTP {resp.status}")
+                advice = _parse_answer(await resp.json(content_type=None))
+        except Exception as e:
+            self.failures += 1
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.failures - 1))
+            self.next_attempt = time.time() + delay
+            self.last_error = str(e)[:200]
+            _LOGGER.error(f"KI Request Fehler: {e} (nächster Versuch frühestens in {int(delay)}s)")
+            return None
+        self.failures = 0
+        self.next_attempt = 0.0
+        return advice.replace("\n", " ").strip()
+
+    def as_dict(self):
+        return {
+            "requests": self.requests, "cache_hits": self.cache_hits, "dropped": self.dropped,
+            "failures": self.failures, "queued": self._queue.qsize(), "pending": len(self._pending),
+            "last_error": self.last_error,
+        }
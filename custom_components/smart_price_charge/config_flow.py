@@ -5,6 +5,7 @@ from homeassistant import config_entries
 from homeassistant.core import callback
 from homeassistant.helpers import selector
 from .const import *
+from .tibber import async_fetch_homes
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -15,6 +16,7 @@ class SmartPriceChargeConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self):
         """Initialisiert den Datenspeicher."""
         self._data = {}
+        self._homes = {}
 
     @staticmethod
     @callback
@@ -24,14 +26,32 @@ class SmartPriceChargeConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_user(self, user_input=None):
         """Schritt 1/3: Verbindung."""
+        errors = {}
         if user_input is not None:
+            source = user_input.get(CONF_PRICE_SOURCE, DEFAULT_PRICE_SOURCE)
+            required = {PRICE_SOURCE_TIBBER: CONF_TIBBER_TOKEN, PRICE_SOURCE_SENSOR: CONF_PRICE_ENTITY, PRICE_SOURCE_FILE: CONF_PRICE_FILE}[source]
+            if not user_input.get(required): errors[required] = "price_source_missing"
+        if user_input is not None and not errors:
             self._data.update(user_input)
+            if source != PRICE_SOURCE_TIBBER: return await self.async_step_sensors()
+            try:
+                self._homes = await async_fetch_homes(self.hass, user_input[CONF_TIBBER_TOKEN])
+            except Exception as e:
+                # Nicht blockieren: ohne Auswahl wird das erste Home genutzt
+                _LOGGER.warning(f"Tibber Homes nicht abrufbar: {e}")
+                self._homes = {}
+            if len(self._homes) > 1: return await self.async_step_home()
+            if self._homes: self._data[CONF_HOME_ID] = next(iter(self._homes))
             return await self.async_step_sensors()
 
         return self.async_show_form(
             step_id="user",
+            errors=errors,
             data_schema=vol.Schema({
-                vol.Required(CONF_TIBBER_TOKEN): str,
+                vol.Required(CONF_PRICE_SOURCE, default=DEFAULT_PRICE_SOURCE): selector.SelectSelector(selector.SelectSelectorConfig(options=PRICE_SOURCES, translation_key=CONF_PRICE_SOURCE)),
+                vol.Optional(CONF_TIBBER_TOKEN): str,
+                vol.Optional(CONF_PRICE_ENTITY): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+                vol.Optional(CONF_PRICE_FILE): str,
                 vol.Required(CONF_SOC_SENSOR): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor", device_class="battery")),
                 vol.Required(CONF_INVERTER_ENTITY): selector.EntitySelector(selector.EntitySelectorConfig(domain=["select", "input_select"])),
                 vol.Required(CONF_MODE_OPTION_NORMAL, default="Normal"): str,
@@ -44,6 +64,20 @@ class SmartPriceChargeConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             })
         )
 
+    async def async_step_home(self, user_input=None):
+        """Zwischenschritt: Auswahl des Tibber-Homes bei mehreren Standorten."""
+        if user_input is not None:
+            self._data.update(user_input)
+            return await self.async_step_sensors()
+
+        options = [selector.SelectOptionDict(value=k, label=v) for k, v in self._homes.items()]
+        return self.async_show_form(
+            step_id="home",
+            data_schema=vol.Schema({
+                vol.Required(CONF_HOME_ID, default=next(iter(self._homes))): selector.SelectSelector(selector.SelectSelectorConfig(options=options)),
+            })
+        )
+
     async def async_step_sensors(self, user_input=None):
         """Schritt 2/3: Leistungssensoren."""
         if user_input is not None:
@@ -65,12 +99,16 @@ class SmartPriceChargeConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Schritt 3/3: Forecast & Abschluss."""
         if user_input is not None:
             self._data.update(user_input)
-            return self.async_create_entry(title="SmartPrice Manager", data=self._data)
+            title = "SmartPrice Manager"
+            if len(self._homes) > 1: title = f"{title} ({self._homes.get(self._data.get(CONF_HOME_ID))})"
+            return self.async_create_entry(title=title, data=self._data)
 
         return self.async_show_form(
             step_id="forecast",
             data_schema=vol.Schema({
                 vol.Optional(CONF_PV_FC_NEXT): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+                vol.Optional(CONF_PV_FC_REM): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+                vol.Optional(CONF_PV_FC_TOMORROW): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
                 vol.Optional(CONF_PV_PEAK_TIME): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
                 vol.Optional(CONF_WEATHER_SENSOR): selector.EntitySelector(selector.EntitySelectorConfig(domain="weather")),
                 vol.Optional(CONF_SUN_SENSOR, default="sun.sun"): selector.EntitySelector(selector.EntitySelectorConfig(domain="sun")),
@@ -97,7 +135,15 @@ class SmartPriceOptionsFlowHandler(config_entries.OptionsFlow):
                 vol.Optional(CONF_MODE_OPTION_FORCE_CHARGE, default=get_o(CONF_MODE_OPTION_FORCE_CHARGE, "ForceCharge")): str,
                 vol.Optional(CONF_AI_ACTIVE, default=get_o(CONF_AI_ACTIVE, False)): bool,
                 vol.Optional(CONF_GEMINI_API_KEY, default=get_o(CONF_GEMINI_API_KEY, "")): str,
+                vol.Optional(CONF_AI_OUTPUT_ENTITY, default=get_o(CONF_AI_OUTPUT_ENTITY, "")): str,
+                vol.Optional(CONF_AI_ENDPOINT, default=get_o(CONF_AI_ENDPOINT, "")): str,
                 vol.Optional(CONF_TARGET_SOC, default=get_o(CONF_TARGET_SOC, 100.0)): vol.Coerce(float),
                 vol.Optional(CONF_MIN_SOC, default=get_o(CONF_MIN_SOC, 10.0)): vol.Coerce(float),
+                vol.Optional(CONF_EVENT_DRIVEN, default=get_o(CONF_EVENT_DRIVEN, DEFAULT_EVENT_DRIVEN)): bool,
+                vol.Optional(CONF_OPTIMIZER_ACTIVE, default=get_o(CONF_OPTIMIZER_ACTIVE, DEFAULT_OPTIMIZER_ACTIVE)): bool,
+                vol.Optional(CONF_SLOT_RESOLUTION, default=get_o(CONF_SLOT_RESOLUTION, DEFAULT_SLOT_RESOLUTION)): vol.All(vol.Coerce(int), vol.In(SLOT_RESOLUTIONS)),
+                vol.Optional(CONF_FLEET_MODE, default=get_o(CONF_FLEET_MODE, DEFAULT_FLEET_MODE)): bool,
+                vol.Optional(CONF_SENSOR_HEARTBEAT, default=get_o(CONF_SENSOR_HEARTBEAT, DEFAULT_SENSOR_HEARTBEAT)): vol.All(vol.Coerce(int), vol.Range(min=1, max=1440)),
+                vol.Optional(CONF_SAFE_STATE, default=get_o(CONF_SAFE_STATE, DEFAULT_SAFE_STATE)): selector.SelectSelector(selector.SelectSelectorConfig(options=SAFE_STATES, translation_key=CONF_SAFE_STATE)),
             })
         )
\ No newline at end of file
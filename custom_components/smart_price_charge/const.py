@@ -2,7 +2,11 @@
 DOMAIN = "smart_price_charge"
 
 # Konfigurations-Keys
+CONF_PRICE_SOURCE = "price_source"
 CONF_TIBBER_TOKEN = "tibber_api_token"
+CONF_HOME_ID = "tibber_home_id"
+CONF_PRICE_ENTITY = "price_forecast_entity_id"
+CONF_PRICE_FILE = "price_file_or_url"
 CONF_SOC_SENSOR = "current_soc_sensor_id"
 CONF_INVERTER_ENTITY = "inverter_mode_entity_id"
 CONF_MODE_OPTION_NORMAL = "mode_option_normal"
@@ -32,6 +36,7 @@ CONF_NOTIFY_ACTIVE = "notification_active"
 CONF_AI_ACTIVE = "ai_active"
 CONF_GEMINI_API_KEY = "gemini_api_key"
 CONF_AI_OUTPUT_ENTITY = "ai_advice_text_id"
+CONF_AI_ENDPOINT = "ai_endpoint_url"
 CONF_INVERTER_MAX_SOC_ENTITY = "inverter_max_soc_entity_id"
 CONF_BATTERY_EFFICIENCY = "battery_efficiency_factor"
 CONF_PV_SAFETY_FACTOR = "pv_forecast_safety_factor"
@@ -45,6 +50,12 @@ CONF_SLEEP_SOC = "sleep_over_soc"
 CONF_MORNING_DIFF = "morning_min_diff"
 CONF_TARGET_SOC = "target_soc_pct"
 CONF_MIN_SOC = "min_soc_pct"
+CONF_EVENT_DRIVEN = "event_driven_mode"
+CONF_OPTIMIZER_ACTIVE = "optimizer_active"
+CONF_SLOT_RESOLUTION = "slot_resolution_min"
+CONF_SENSOR_HEARTBEAT = "sensor_heartbeat_min"
+CONF_FLEET_MODE = "fleet_mode"
+CONF_SAFE_STATE = "safe_state"
 
 # Standardwerte (Fix für den Manager-Error)
 DEFAULT_TARGET_SOC = 100.0
@@ -58,4 +69,23 @@ DEFAULT_SLEEP_SOC = 30.0
 DEFAULT_MORNING_DIFF = 0.10
 DEFAULT_EFFICIENCY = 0.90
 DEFAULT_PV_SAFETY = 0.50
-DEFAULT_MIN_PROFIT = 0.02
\ No newline at end of file
+DEFAULT_MIN_PROFIT = 0.02
+DEFAULT_EVENT_DRIVEN = False
+DEFAULT_OPTIMIZER_ACTIVE = False
+DEFAULT_FLEET_MODE = False
+PRICE_SOURCE_TIBBER = "tibber"
+PRICE_SOURCE_SENSOR = "sensor"
+PRICE_SOURCE_FILE = "file"
+PRICE_SOURCES = [PRICE_SOURCE_TIBBER, PRICE_SOURCE_SENSOR, PRICE_SOURCE_FILE]
+DEFAULT_PRICE_SOURCE = PRICE_SOURCE_TIBBER
+# 0 = feinste Auflösung der Preisquelle
+DEFAULT_SLOT_RESOLUTION = 0
+SLOT_RESOLUTIONS = [0, 15, 30, 60]
+# Kleine Änderungen der Sensoren spätestens nach dieser Zeit schreiben (Minuten)
+DEFAULT_SENSOR_HEARTBEAT = 15
+# Sicherer Zustand ohne brauchbare Preise oder SoC: Eigenverbrauch, Akku halten oder nichts stellen
+SAFE_STATE_GENERAL = "general"
+SAFE_STATE_HOLD = "hold"
+SAFE_STATE_NONE = "none"
+SAFE_STATES = [SAFE_STATE_GENERAL, SAFE_STATE_HOLD, SAFE_STATE_NONE]
+DEFAULT_SAFE_STATE = SAFE_STATE_GENERAL
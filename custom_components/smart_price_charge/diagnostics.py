@@ -0,0 +1,30 @@
+"""Diagnose-Export für SmartPriceCharge."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_GEMINI_API_KEY, CONF_TIBBER_TOKEN, DOMAIN
+
+TO_REDACT = {CONF_TIBBER_TOKEN, CONF_GEMINI_API_KEY}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Konfiguration (ohne Schlüssel) und Laufzeit-Kennzahlen."""
+    manager = hass.data[DOMAIN][entry.entry_id]
+    service = manager.price_service
+    home = service.home(manager.home_id)
+    return {
+        "config": async_redact_data(dict(entry.data), TO_REDACT),
+        "options": async_redact_data(dict(entry.options), TO_REDACT),
+        "runtime": manager.diagnostics(),
+        "prices": {
+            "source": service.source_type,
+            "home_id": manager.home_id,
+            "homes": len(service.homes),
+            "today": len(home["today"]),
+            "tomorrow": len(home["tomorrow"]),
+            "fetched_at": service.fetched_at.isoformat() if service.fetched_at else None,
+            "next_attempt": service.next_attempt.isoformat() if service.next_attempt else None,
+        },
+        "status": manager.status_message,
+    }
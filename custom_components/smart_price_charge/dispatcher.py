@@ -0,0 +1,165 @@
+"""Gebündelter Befehls-Versand an den Wechselrichter."""
+import asyncio
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+# Mindestabstand zwischen zwei Befehlen an dieselbe Entität (Sekunden)
+MIN_INTERVAL = 30
+# Erneut senden, wenn das Gerät vom bestätigten Wert abweicht (Sekunden)
+DRIFT_RESEND = 300
+# Heartbeat für den Modus, damit der Inverter nicht in ein Timeout läuft (Sekunden)
+MODE_HEARTBEAT = 900
+CALL_TIMEOUT = 10
+RETRY_BASE = 30
+RETRY_MAX = 900
+MAX_ATTEMPTS = 5
+MAX_QUEUE = 16
+
+
+class Command:
+    __slots__ = ("entity_id", "domain", "service", "data", "value", "tolerance", "heartbeat")
+
+    def __init__(self, entity_id, domain, service, data, value, tolerance=0.0, heartbeat=None):
+        self.entity_id = entity_id
+        self.domain = domain
+        self.service = service
+        self.data = data
+        self.value = value
+        self.tolerance = tolerance
+        self.heartbeat = heartbeat
+
+    def matches(self, value):
+        if self.tolerance:
+            try: return abs(float(value) - float(self.value)) <= self.tolerance
+            except (TypeError, ValueError): return False
+        return str(value) == str(self.value)
+
+
+class InverterDispatcher:
+    """Sammelt den Soll-Zustand pro Tick und sendet nur Änderungen, parallel und gedrosselt."""
+
+    def __init__(self, hass, stats=None):
+        self.hass = hass
+        self.stats = stats
+        self._desired = {}
+        self._acked = {}        # entity_id -> (Wert, Zeitstempel)
+        self._last_sent = {}    # entity_id -> Zeitstempel
+        self._retry = {}        # entity_id -> (Command, Versuche, nächster Versuch)
+        self._dropped = {}      # entity_id -> Wert, nach MAX_ATTEMPTS aufgegeben
+        self._task = None
+        # Optionaler Semaphor, im Flottenbetrieb von allen Dispatchern geteilt
+        self.limiter = None
+        self.sent = 0
+        self.suppressed = 0
+        self.failed = 0
+        self.last_error = None
+        self.last_error_time = None
+
+    def desire(self, command):
+        self._desired[command.entity_id] = command
+
+    def forget(self, entity_id=None):
+        """Vergisst bestätigte Zustände (z.B. nach geänderter Zuordnung)."""
+        if entity_id is None:
+            self._acked.clear()
+            self._retry.clear()
+            self._dropped.clear()
+        else:
+            self._acked.pop(entity_id, None)
+            self._retry.pop(entity_id, None)
+            self._dropped.pop(entity_id, None)
+
+    @property
+    def dropped(self):
+        """Entitäten, deren Befehl nach MAX_ATTEMPTS aufgegeben wurde."""
+        return sorted(self._dropped)
+
+    @property
+    def busy(self):
+        return self._task is not None and not self._task.done()
+
+    def schedule(self, now_ts):
+        """Startet den Versand im Hintergrund; die Entscheidungsschleife wartet nicht."""
+        if self.busy: return
+        self._task = self.hass.async_create_task(self.async_flush(now_ts))
+
+    def _needs_send(self, cmd, now_ts):
+        acked = self._acked.get(cmd.entity_id)
+        live = self.hass.states.get(cmd.entity_id)
+        if acked is None:
+            if live is not None and cmd.matches(live.state):
+                # Gerät steht schon richtig -> als bestätigt übernehmen
+                self._acked[cmd.entity_id] = (cmd.value, now_ts)
+                return False
+            return True
+        if not cmd.matches(acked[0]): return True
+        if cmd.heartbeat and now_ts - acked[1] >= cmd.heartbeat: return True
+        if live is not None and not cmd.matches(live.state) and now_ts - acked[1] >= DRIFT_RESEND: return True
+        return False
+
+    async def async_flush(self, now_ts):
+        desired, self._desired = self._desired, {}
+        batch = []
+        for eid, cmd in desired.items():
+            if eid in self._dropped:
+                # Aufgegebener Befehl: erst ein neuer Sollwert wird wieder gesendet
+                if cmd.matches(self._dropped[eid]):
+                    self.suppressed += 1
+                    continue
+                del self._dropped[eid]
+            retry = self._retry.get(eid)
+            if retry and retry[0].matches(cmd.value) and now_ts < retry[2]:
+                self.suppressed += 1
+                continue
+            if not retry and not self._needs_send(cmd, now_ts):
+                self.suppressed += 1
+                continue
+            if now_ts - self._last_sent.get(eid, 0) < MIN_INTERVAL:
+                # Gedrosselt; der nächste Tick fordert den Zustand erneut an
+                self.suppressed += 1
+                continue
+            batch.append(cmd)
+
+        if not batch: return
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self._send(cmd) for cmd in batch), return_exceptions=True)
+        if self.stats: self.stats.record("dispatch", (time.perf_counter() - start) * 1000)
+        for cmd, result in zip(batch, results):
+            self._last_sent[cmd.entity_id] = now_ts
+            if isinstance(result, BaseException):
+                self._on_failure(cmd, result, now_ts)
+            else:
+                self.sent += 1
+                self._acked[cmd.entity_id] = (cmd.value, now_ts)
+                self._retry.pop(cmd.entity_id, None)
+
+    async def _send(self, cmd):
+        if self.limiter is None: return await self._call(cmd)
+        async with self.limiter: return await self._call(cmd)
+
+    async def _call(self, cmd):
+        _LOGGER.info(f"Sende {cmd.domain}.{cmd.service} an {cmd.entity_id}: {cmd.value}")
+        await asyncio.wait_for(
+            self.hass.services.async_call(cmd.domain, cmd.service, cmd.data, blocking=True),
+            CALL_TIMEOUT,
+        )
+
+    def _on_failure(self, cmd, err, now_ts):
+        self.failed += 1
+        self.last_error = f"{cmd.entity_id}: {err!r}"
+        self.last_error_time = now_ts
+        prev = self._retry.get(cmd.entity_id)
+        attempts = prev[1] + 1 if prev and prev[0].matches(cmd.value) else 1
+        if attempts > MAX_ATTEMPTS:
+            _LOGGER.error(f"Befehl an {cmd.entity_id} nach {MAX_ATTEMPTS} Versuchen verworfen: {err!r}")
+            self._retry.pop(cmd.entity_id, None)
+            self._dropped[cmd.entity_id] = cmd.value
+            return
+        if cmd.entity_id not in self._retry and len(self._retry) >= MAX_QUEUE:
+            _LOGGER.error(f"Retry-Warteschlange voll, verwerfe Befehl an {cmd.entity_id}")
+            return
+        delay = min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+        self._retry[cmd.entity_id] = (cmd, attempts, now_ts + delay)
+        _LOGGER.warning(f"Befehl an {cmd.entity_id} fehlgeschlagen ({err!r}), Versuch {attempts} in {delay}s")
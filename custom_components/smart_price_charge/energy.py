@@ -0,0 +1,71 @@
+"""Energie-Integration über echte Zeitstempel für die Tracker."""
+
+# Größere Lücken (Neustart, Automatik aus) werden nicht nachträglich angerechnet (Sekunden)
+MAX_GAP = 900
+
+
+class EnergyIntegrator:
+    """Integriert eine Leistung (W) und bewertet jeden Abschnitt mit dem Preis seines Slots.
+
+    Zwischen zwei echten Messwerten (last_updated der Quelle) wird trapezförmig
+    integriert, danach bis zum Auswertezeitpunkt der letzte Wert gehalten.
+    Abschnitte werden an Slot-Grenzen der Timeline geteilt.
+    """
+
+    __slots__ = ("t_acc", "w_acc", "max_gap")
+
+    def __init__(self, max_gap=MAX_GAP):
+        self.t_acc = None
+        self.w_acc = 0.0
+        self.max_gap = max_gap
+
+    def reset(self):
+        self.t_acc = None
+
+    def update(self, watts, sample_ts, now_ts, timeline=None, fallback_price=0.0):
+        """Gibt (kWh, EUR) seit dem letzten Aufruf zurück."""
+        if self.t_acc is None or now_ts - self.t_acc > self.max_gap or now_ts <= self.t_acc:
+            if self.t_acc is None or now_ts > self.t_acc:
+                self.t_acc, self.w_acc = now_ts, watts
+            return 0.0, 0.0
+
+        kwh = eur = 0.0
+        if sample_ts is not None and self.t_acc < sample_ts < now_ts:
+            k, e = _integrate(self.t_acc, sample_ts, self.w_acc, watts, timeline, fallback_price)
+            kwh += k
+            eur += e
+            start = sample_ts
+        else:
+            start = self.t_acc
+        k, e = _integrate(start, now_ts, watts, watts, timeline, fallback_price)
+        kwh += k
+        eur += e
+
+        self.t_acc, self.w_acc = now_ts, watts
+        return kwh, eur
+
+
+def _integrate(t0, t1, w0, w1, timeline, fallback_price):
+    """Lineare Leistung von w0 auf w1 über [t0, t1], geteilt an Slot-Grenzen."""
+    if t1 <= t0: return 0.0, 0.0
+    cuts = [t0]
+    idx = -1
+    if timeline is not None and len(timeline):
+        idx = timeline.index_at(t0)
+        j = idx + 1
+        while j < len(timeline.starts) and timeline.starts[j] < t1:
+            cuts.append(timeline.starts[j])
+            j += 1
+    cuts.append(t1)
+
+    slope = (w1 - w0) / (t1 - t0)
+    kwh = eur = 0.0
+    for n, (a, b) in enumerate(zip(cuts, cuts[1:])):
+        wa = w0 + slope * (a - t0)
+        wb = w0 + slope * (b - t0)
+        part = (wa + wb) / 2 * (b - a) / 3_600_000
+        slot = idx + n
+        price = timeline.prices[slot] if timeline is not None and slot >= 0 else fallback_price
+        kwh += part
+        eur += part * price
+    return kwh, eur
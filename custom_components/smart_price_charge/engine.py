@@ -0,0 +1,402 @@
+"""Entscheidungs-Kern von SmartPriceCharge ohne Home Assistant: Eingabe-Snapshot -> Entscheidung.
+
+Der Manager liest die HA-Zustände, baut daraus ein `EngineInput` und setzt die
+`Decision` um (Stellbefehle, Tracker, Benachrichtigungen). Alles hier ist reines
+Python und läuft genauso im Simulator, Benchmark oder in einem Prozess-Pool.
+"""
+import math
+from datetime import datetime, time, timedelta
+
+from .const import *
+from .frame import FLAG_DEFAULT
+from .optimizer import ACTION_HOLD, solve_policy
+from .plancache import ENERGY_STEP, LOAD_STEP, PlanCache, PolicyCache, SelectionCache, quantise
+from .stats import Instrumentation
+
+MODE_GENERAL = "general"
+MODE_CHARGE = "eco_charge"
+# Obergrenze für die gebuchte Ladezeit im Greedy-Modus (Stunden)
+MAX_CHARGE_HOURS = 4
+# Plausible Hauslast für Fallback und Kurzfrist-Mischung (W)
+MIN_LOAD_W = 200.0
+MAX_LOAD_W = 1500.0
+# Ab diesem Preis gilt ein Slot als teuer (EUR/kWh)
+EXPENSIVE_PRICE = 0.30
+
+
+class EngineSettings:
+    """Akku-Daten und Schwellwerte aus Config-Entry und Optionen."""
+
+    __slots__ = ("capacity_kwh", "charge_kw", "target_soc", "min_spread", "soc_med", "spread_med", "soc_high",
+                 "spread_high", "morning_diff", "sleep_soc", "pv_safety", "efficiency", "min_profit", "optimizer",
+                 "safe_state", "key")
+
+    def __init__(self, capacity_kwh, charge_kw=3.0, target_soc=DEFAULT_TARGET_SOC, min_spread=DEFAULT_MIN_SPREAD,
+                 soc_med=DEFAULT_SOC_MED, spread_med=DEFAULT_SPREAD_MED, soc_high=DEFAULT_SOC_HIGH,
+                 spread_high=DEFAULT_SPREAD_HIGH, morning_diff=DEFAULT_MORNING_DIFF, sleep_soc=DEFAULT_SLEEP_SOC,
+                 pv_safety=DEFAULT_PV_SAFETY, efficiency=DEFAULT_EFFICIENCY, min_profit=DEFAULT_MIN_PROFIT,
+                 optimizer=DEFAULT_OPTIMIZER_ACTIVE, safe_state=DEFAULT_SAFE_STATE, key=""):
+        self.capacity_kwh = capacity_kwh
+        self.charge_kw = charge_kw
+        self.target_soc = target_soc
+        self.min_spread = min_spread
+        self.soc_med = soc_med
+        self.spread_med = spread_med
+        self.soc_high = soc_high
+        self.spread_high = spread_high
+        self.morning_diff = morning_diff
+        self.sleep_soc = sleep_soc
+        self.pv_safety = pv_safety
+        self.efficiency = efficiency
+        self.min_profit = min_profit
+        self.optimizer = optimizer
+        self.safe_state = safe_state
+        # Hash der Optionen, Teil der Cache-Fingerprints
+        self.key = key
+
+    @classmethod
+    def from_entry(cls, data, options, key=""):
+        """Aus `entry.data` (Akku) und `entry.options` (Schwellwerte)."""
+        return cls(
+            capacity_kwh=data.get(CONF_BATTERY_CAPACITY),
+            charge_kw=data.get(CONF_CHARGER_POWER, 3.0),
+            target_soc=options.get(CONF_TARGET_SOC, DEFAULT_TARGET_SOC),
+            min_spread=options.get(CONF_MIN_SPREAD, DEFAULT_MIN_SPREAD),
+            soc_med=options.get(CONF_SOC_MED, DEFAULT_SOC_MED),
+            spread_med=options.get(CONF_SPREAD_MED, DEFAULT_SPREAD_MED),
+            soc_high=options.get(CONF_SOC_HIGH, DEFAULT_SOC_HIGH),
+            spread_high=options.get(CONF_SPREAD_HIGH, DEFAULT_SPREAD_HIGH),
+            morning_diff=options.get(CONF_MORNING_DIFF, DEFAULT_MORNING_DIFF),
+            sleep_soc=options.get(CONF_SLEEP_SOC, DEFAULT_SLEEP_SOC),
+            pv_safety=options.get(CONF_PV_SAFETY_FACTOR, DEFAULT_PV_SAFETY),
+            efficiency=options.get(CONF_BATTERY_EFFICIENCY, DEFAULT_EFFICIENCY),
+            min_profit=options.get(CONF_MIN_PROFIT, DEFAULT_MIN_PROFIT),
+            optimizer=options.get(CONF_OPTIMIZER_ACTIVE, DEFAULT_OPTIMIZER_ACTIVE),
+            safe_state=options.get(CONF_SAFE_STATE, DEFAULT_SAFE_STATE),
+            key=key,
+        )
+
+
+class EngineInput:
+    """Momentaufnahme aller Eingaben eines Ticks.
+
+    `fc_rem_kwh`/`fc_next_kwh` = PV-Rest heute bzw. nächste Stunde aus den Forecast-Sensoren;
+    `pv_forecast` (Kurve) hat Vorrang, wenn vorhanden. `flags` sind die Qualitäts-Flags
+    je Eingabefeld aus dem Eingabe-Frame (siehe frame.py). `price_profile` liefert
+    Ersatzpreise, wenn `timeline` den aktuellen Zeitpunkt nicht abdeckt (siehe fallback.py).
+    """
+
+    __slots__ = ("now", "timeline", "current_price", "soc", "min_soc", "settings", "house_w", "pv_w", "avg_house_w",
+                 "fc_rem_kwh", "fc_next_kwh", "sun_elevation", "weather_factor", "pv_peak_time", "has_tomorrow",
+                 "session_active", "load_profile", "pv_forecast", "flags", "price_profile")
+
+    def __init__(self, now, timeline, current_price, soc, min_soc, settings, house_w=0.0, pv_w=0.0, avg_house_w=500.0,
+                 fc_rem_kwh=0.0, fc_next_kwh=0.0, sun_elevation=0.0, weather_factor=0.5, pv_peak_time=None,
+                 has_tomorrow=False, session_active=False, load_profile=None, pv_forecast=None, flags=None,
+                 price_profile=None):
+        self.now = now
+        self.timeline = timeline
+        self.current_price = current_price
+        self.soc = soc
+        self.min_soc = min_soc
+        self.settings = settings
+        self.house_w = house_w
+        self.pv_w = pv_w
+        self.avg_house_w = avg_house_w
+        self.fc_rem_kwh = fc_rem_kwh
+        self.fc_next_kwh = fc_next_kwh
+        self.sun_elevation = sun_elevation
+        self.weather_factor = weather_factor
+        self.pv_peak_time = pv_peak_time
+        self.has_tomorrow = has_tomorrow
+        self.session_active = session_active
+        self.load_profile = load_profile
+        self.pv_forecast = pv_forecast
+        self.flags = flags or {}
+        self.price_profile = price_profile
+
+
+class Decision:
+    """Ergebnis eines Ticks; `mode` None heißt: nichts stellen.
+
+    `session` ist "start", "stop" oder None (Wechsel der Lade-Session).
+    `price_source`: "live", "fallback" (Ersatzpreise, `low_confidence`) oder None (sicherer Zustand).
+    `timeline`/`price` sind die tatsächlich verwendeten Preise.
+    """
+
+    __slots__ = ("message", "mode", "min_soc_limit", "max_soc_limit", "peak_price", "peak_time", "start_idx", "now_idx",
+                 "cheap_slots", "next_charge_time", "slots_info", "plan", "pv_curve", "needed_kwh", "sleep_over",
+                 "panic", "session", "timeline", "price", "price_source", "low_confidence", "safe")
+
+    def __init__(self, message, mode=None, start_idx=0, now_idx=-1):
+        self.message = message
+        self.mode = mode
+        self.min_soc_limit = None
+        self.max_soc_limit = None
+        self.peak_price = 0.0
+        self.peak_time = None
+        self.start_idx = start_idx
+        self.now_idx = now_idx
+        self.cheap_slots = []
+        self.next_charge_time = None
+        self.slots_info = "Keine Slots nötig"
+        self.plan = None
+        self.pv_curve = None
+        self.needed_kwh = 0.0
+        self.sleep_over = False
+        self.panic = False
+        self.session = None
+        self.timeline = None
+        self.price = 0.0
+        self.price_source = None
+        self.low_confidence = False
+        self.safe = False
+
+
+class Engine:
+    """Planer mit seinen Caches; `decide` hat keine Seiteneffekte außerhalb davon."""
+
+    def __init__(self, stats=None):
+        self.stats = stats or Instrumentation()
+        self.plan_cache = PlanCache()
+        self.selection_cache = SelectionCache()
+        self.policies = PolicyCache()
+        self._load_fc = None
+        self._load_fc_key = None
+
+    def invalidate(self):
+        self.plan_cache.invalidate()
+        self.selection_cache.invalidate()
+
+    def load_forecast(self, inp, tl, start):
+        """Erwartete Hauslast (W) pro Slot ab `start`: gelerntes Profil, in der nächsten Stunde mit der aktuellen Last gemischt."""
+        fallback = max(MIN_LOAD_W, min(MAX_LOAD_W, inp.avg_house_w))
+        profile = inp.load_profile
+        key = (tl.version, start, profile.version if profile else None, int(fallback // 50))
+        if key != self._load_fc_key:
+            if profile: self._load_fc = profile.forecast(tl.starts[start:], tl.slot_seconds, inp.now.tzinfo, fallback)
+            else: self._load_fc = [fallback] * (len(tl) - start)
+            self._load_fc_key = key
+        load = list(self._load_fc)
+        if inp.house_w > 0:
+            for i in range(min(len(load), max(1, int(3600 // tl.slot_seconds)))):
+                load[i] = max(MIN_LOAD_W, min(MAX_LOAD_W, inp.house_w * 0.7 + load[i] * 0.3))
+        return load
+
+    def solve_plan(self, inp, tl, start, load_w, load_kwh, pv_kwh, pv_key, min_soc):
+        """DP-Plan über den ganzen bekannten Horizont; bei unveränderten Eingaben nur weitergeschoben.
+
+        `load_kwh`/`pv_kwh` sind dieselben Vektoren wie in `decide` (laufender Slot anteilig),
+        `load_w` die ungekürzte Prognose für den Fingerprint.
+        """
+        s = inp.settings
+        now_ts = inp.now.timestamp()
+        load_version = inp.load_profile.version if inp.load_profile else None
+        fingerprint = (tl.version, pv_key, load_version, s.key, s.capacity_kwh, s.charge_kw,
+                       quantise(min_soc, 1), quantise(s.target_soc, 1), quantise(load_w[0], LOAD_STEP) if load_w else 0)
+        progress = max(0.0, (now_ts - tl.starts[start]) / tl.slot_seconds) if start < len(tl) else 0.0
+        plan = self.plan_cache.lookup(fingerprint, start, inp.soc, now_ts, min(1.0, progress))
+        if plan is not None: return plan
+
+        # Die Policy hängt nicht vom SoC ab: bei SoC-Abweichung oder gleichen Eingaben
+        # eines anderen Akkus (Flottenbetrieb) genügt die Vorwärts-Simulation.
+        # Der laufende Slot bleibt aus dem Schlüssel, sein Rest schrumpft mit jedem Tick
+        slot_h = tl.slot_seconds / 3600
+        prices = tl.prices[start:]
+        key = PolicyCache.key(
+            (start, tl.slot_seconds, hash(tuple(prices))),
+            (s.capacity_kwh, s.charge_kw, quantise(min_soc, 1), quantise(s.target_soc, 1), s.efficiency, s.min_profit),
+            load_kwh[1:], pv_kwh[1:],
+        )
+        policy = self.policies.get(key)
+        if policy is None:
+            with self.stats.measure("optimizer"):
+                policy = self.policies.put(key, solve_policy(
+                    prices, load_kwh, pv_kwh, slot_h, s.capacity_kwh, s.charge_kw,
+                    min_soc, s.target_soc, s.efficiency, s.min_profit, start=start,
+                ))
+        first_net = load_kwh[0] - pv_kwh[0] if load_kwh else None
+        return self.plan_cache.store(policy.plan(inp.soc, first_net), fingerprint, now_ts)
+
+    def safe_decision(self, inp, reason):
+        """Sicherer Zustand aus den Optionen, wenn weder Preise noch Ersatzpreise oder kein SoC vorliegen."""
+        s = inp.settings
+        d = Decision(f"Sicherheitsmodus ({reason})")
+        d.safe = d.low_confidence = True
+        if s.safe_state == SAFE_STATE_NONE: return d
+        d.mode = MODE_GENERAL
+        d.min_soc_limit = inp.min_soc
+        d.max_soc_limit = s.target_soc
+        # Halten nur mit gültigem SoC, sonst Eigenverbrauch
+        if s.safe_state == SAFE_STATE_HOLD and not inp.flags.get("soc", 0) & FLAG_DEFAULT:
+            d.min_soc_limit = max(inp.min_soc, math.floor(inp.soc))
+        if inp.session_active: d.session = "stop"
+        return d
+
+    def decide(self, inp):
+        s = inp.settings
+        tl, now = inp.timeline, inp.now
+        now_ts = now.timestamp()
+        cur_soc, curr_p = inp.soc, inp.current_price
+        # Ein Ersatzwert statt SoC würde Panik-Laden auslösen
+        if inp.flags.get("soc", 0) & FLAG_DEFAULT: return self.safe_decision(inp, "SoC ungültig")
+
+        # Ohne aktuelle Preise: Median-Profil der letzten Tage, sonst sicherer Zustand
+        price_source = "live"
+        now_idx = tl.slot_at(now_ts) if tl else -1
+        if now_idx < 0:
+            fallback = inp.price_profile.timeline(now, tl.slot_seconds if tl else None) if inp.price_profile else None
+            if fallback is not None and fallback.slot_at(now_ts) >= 0:
+                tl, price_source = fallback, "fallback"
+                now_idx = tl.slot_at(now_ts)
+                curr_p = tl.prices[now_idx]
+
+        # Planung in exakten Slots ab dem laufenden Slot
+        start_idx = now_idx if now_idx >= 0 else (tl.index_from(now_ts) if tl else 0)
+        peak_idx = tl.peak_from(start_idx) if tl else None
+        if peak_idx is None: return self.safe_decision(inp, "Keine Preise")
+
+        d = Decision("Standardbetrieb", MODE_GENERAL, start_idx=start_idx, now_idx=now_idx)
+        d.timeline, d.price, d.price_source = tl, curr_p, price_source
+        d.low_confidence = price_source == "fallback" or bool(inp.flags.get("soc", 0))
+        d.peak_price = tl.prices[peak_idx]
+        d.peak_time = tl.time(peak_idx)
+
+        fc_next = inp.fc_next_kwh
+        pv_fc = inp.pv_forecast
+        if pv_fc: fc_next = pv_fc.energy_between(now_ts, now_ts + 3600)
+        approaching_peak = False
+        if inp.pv_peak_time is not None:
+            diff_min = (inp.pv_peak_time - now).total_seconds() / 60
+            approaching_peak = -30 < diff_min < 90
+
+        is_sun_shining = False
+        if inp.pv_w > 50: is_sun_shining = True
+        elif inp.sun_elevation > 0 and inp.weather_factor >= 0.4 and fc_next > 0.1: is_sun_shining = True
+        elif approaching_peak: is_sun_shining = True
+
+        hours_to_peak = (d.peak_time - now).total_seconds() / 3600
+        d.panic = 0 < hours_to_peak < 1.5 and cur_soc < (inp.min_soc + 5.0)
+
+        eff_spread = s.min_spread
+        if cur_soc > s.soc_high: eff_spread = max(eff_spread, s.spread_high)
+        elif cur_soc > s.soc_med: eff_spread = max(eff_spread, s.spread_med)
+        price_spread = d.peak_price - curr_p
+        should_hold = price_spread >= eff_spread
+
+        effective_min_soc = inp.min_soc
+        if now.hour >= 18 and inp.has_tomorrow:
+            tomorrow = now.date() + timedelta(days=1)
+            morning_start = datetime.combine(tomorrow, time(5), now.tzinfo).timestamp()
+            morning_end = datetime.combine(tomorrow, time(10), now.tzinfo).timestamp()
+            morning_peak = tl.max_price(tl.index_from(morning_start), tl.index_from(morning_end))
+            if morning_peak is not None and (morning_peak - curr_p) > s.morning_diff:
+                effective_min_soc = s.sleep_soc
+                d.sleep_over = True
+        d.min_soc_limit = effective_min_soc
+        d.max_soc_limit = s.target_soc
+
+        deadline = d.peak_time if (d.peak_price > EXPENSIVE_PRICE and d.peak_time > now) else datetime.combine(now.date(), time(23, 59)).astimezone(now.tzinfo)
+        end_idx = tl.index_from(deadline.timestamp())
+        first_cheapest = tl.cheapest(start_idx, end_idx, 1)
+
+        slot_h = tl.slot_seconds / 3600
+        load_w = self.load_forecast(inp, tl, start_idx)
+        load_kwh = [w / 1000 * slot_h for w in load_w]
+        pv_curve = pv_fc.slot_kwh(tl, start_idx) if pv_fc else None
+        d.pv_curve = pv_curve
+        if pv_curve:
+            pv_kwh = [v * s.pv_safety for v in pv_curve]
+        else:
+            # Ohne Kurve: PV-Rest des Tages gleichmäßig auf die Tagslots bis 18 Uhr verteilen
+            day_end = datetime.combine(now.date(), time(18), now.tzinfo).timestamp()
+            day_slots = tl.index_from(day_end) - start_idx
+            pv_kwh = [inp.fc_rem_kwh * s.pv_safety / day_slots if i < day_slots else 0.0 for i in range(len(load_kwh))]
+        if now_idx >= 0 and load_kwh:
+            # Laufender Slot nur noch anteilig
+            rest = 1 - (now_ts - tl.starts[now_idx]) / tl.slot_seconds
+            load_kwh[0] *= rest
+            pv_kwh[0] *= rest
+
+        # Netto-Bedarf bis zum ersten günstigen Slot, PV-Überschuss bis zur Deadline lädt den Akku
+        first_idx = first_cheapest[0] if first_cheapest else start_idx
+        n_first, n_end = first_idx - start_idx, max(0, end_idx - start_idx)
+        consumption_until = sum(max(0.0, l - p) for l, p in zip(load_kwh[:n_first], pv_kwh[:n_first]))
+        if pv_curve:
+            pv_deduction = sum(max(0.0, p - l) for l, p in zip(load_kwh[:n_end], pv_kwh[:n_end]))
+        else:
+            consumption_until = sum(load_kwh[:n_first])
+            pv_deduction = inp.fc_rem_kwh * s.pv_safety
+        soc_need_kwh = max(0.0, (s.target_soc - cur_soc) / 100 * s.capacity_kwh)
+        needed_kwh = (consumption_until + soc_need_kwh) - pv_deduction
+        d.needed_kwh = needed_kwh = max(0.0, min(needed_kwh, s.capacity_kwh))
+
+        plan_hold = False
+        if s.optimizer:
+            pv_key = pv_fc.version if pv_curve else quantise(inp.fc_rem_kwh * s.pv_safety, ENERGY_STEP)
+            d.plan = plan = self.solve_plan(inp, tl, start_idx, load_w, load_kwh, pv_kwh, pv_key, effective_min_soc)
+            cheap_slots = plan.charge_slots()
+            plan_hold = plan.action_at(now_idx) == ACTION_HOLD
+        else:
+            # Auswahl nur bei spürbar geändertem Bedarf neu, sonst flattern slots_info/next_charge_time
+            fingerprint = (tl.version, end_idx, s.key)
+            cheap_slots = self.selection_cache.lookup(fingerprint, needed_kwh, start_idx)
+            if cheap_slots is None:
+                slots_needed_count = 0
+                if s.charge_kw > 0 and needed_kwh > 0:
+                    slots_needed_count = min(math.ceil(needed_kwh / (s.charge_kw * slot_h)), int(MAX_CHARGE_HOURS / slot_h))
+                cheap_slots = self.selection_cache.store(tl.cheapest(start_idx, end_idx, slots_needed_count), fingerprint, needed_kwh)
+        d.cheap_slots = cheap_slots
+
+        shown = cheap_slots
+        if s.optimizer and cheap_slots:
+            # Der Plan reicht über zwei Tage: angezeigt wird nur der nächste zusammenhängende Ladeblock
+            shown = cheap_slots[:1]
+            for i in cheap_slots[1:]:
+                if i != shown[-1] + 1: break
+                shown.append(i)
+        if shown:
+            start_str = tl.time(shown[0]).strftime('%H:%M')
+            end_dt = tl.time(shown[-1]) + timedelta(seconds=tl.slot_seconds)
+            end_str = end_dt.strftime('%H:%M')
+            avg_p = sum(tl.prices[i] for i in shown) / len(shown)
+            d.slots_info = f"{len(shown)}x {tl.slot_minutes}min ({start_str}...{end_str}) Ø {avg_p:.3f} €"
+            d.next_charge_time = tl.time(shown[0])
+
+        is_cheap_now = now_idx in cheap_slots
+
+        if d.panic:
+            d.mode = MODE_CHARGE
+            d.message = f"PANIK! SoC < {inp.min_soc+5}%. Peak bald."
+            if not inp.session_active: d.session = "start"
+
+        elif (curr_p > EXPENSIVE_PRICE or (price_spread < eff_spread and not is_cheap_now)):
+            if is_sun_shining:
+                d.message = "Warten (PV/Peak erwartet)."
+            elif should_hold and curr_p > EXPENSIVE_PRICE:
+                d.message = f"Warten (Peak erwartet: {d.peak_price:.3f}€)"
+            elif cur_soc > effective_min_soc:
+                d.message = f"Entladen (Preis: {curr_p:.3f}€)"
+                if price_spread < eff_spread: d.message = "Entladen (Spread zu klein)."
+            else:
+                d.message = f"Reserve erreicht ({effective_min_soc}%)."
+
+        elif is_cheap_now and cur_soc < s.target_soc and (needed_kwh > 0.1 or s.optimizer):
+            d.mode = MODE_CHARGE
+            d.message = f"Laden bis {s.target_soc}% ({curr_p:.3f}€)"
+            if not inp.session_active: d.session = "start"
+
+        else:
+            d.message = "Warten (Standardbetrieb)."
+            if d.sleep_over: d.message = f"Warten (Sleep-Over {effective_min_soc}%)"
+            elif should_hold: d.message = "Warten (Spread/Hold)"
+            elif is_sun_shining: d.message = "Warten (PV/Peak erwartet)"
+            if inp.session_active: d.session = "stop"
+
+        if plan_hold and d.mode == MODE_GENERAL:
+            # Halten umsetzen: Entladegrenze auf den aktuellen SoC, das Haus läuft über das Netz
+            d.min_soc_limit = max(d.min_soc_limit, math.floor(cur_soc))
+            d.message = f"Halten (Plan, {d.min_soc_limit}%)"
+
+        if price_source == "fallback": d.message += " [Ersatzpreise]"
+        return d
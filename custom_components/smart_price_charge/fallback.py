@@ -0,0 +1,114 @@
+"""Ersatzpreise bei Ausfall der Preisquelle: gleitender Median je Viertelstunde über die letzten Tage."""
+from datetime import datetime, time, timedelta
+
+from .timeline import PriceTimeline
+
+BIN_SECONDS = 900
+BINS_PER_DAY = 96
+# Gespeicherte Tage (Ringpuffer, eine Zeile pro Kalendertag)
+HISTORY_DAYS = 14
+# Mindestzahl Tage pro Viertelstunde für einen Ersatzpreis
+MIN_SAMPLES = 3
+# Liegen die letzten echten Preise länger zurück, gilt auch das Profil als veraltet (Tage)
+MAX_AGE_DAYS = 7
+
+
+class PriceProfile:
+    """Fester Speicher: HISTORY_DAYS × 96 Viertelstunden-Preise, Zeile = Tag modulo HISTORY_DAYS.
+
+    Wird einmal pro Preis-Datenstand aus der Timeline befüllt; ein neuer Tag
+    überschreibt die Zeile des ältesten. Der Median je Viertelstunde ergibt die
+    Ersatz-Timeline für heute und morgen.
+    """
+
+    __slots__ = ("days", "values", "version", "_seen", "_median_key", "_median", "_timeline")
+
+    def __init__(self):
+        # Ordinal des Kalendertags je Zeile (None = leer); Preis = values[Zeile * BINS_PER_DAY + Viertelstunde]
+        self.days = [None] * HISTORY_DAYS
+        self.values = [None] * (HISTORY_DAYS * BINS_PER_DAY)
+        # Wird bei jeder Änderung erhöht
+        self.version = 0
+        self._seen = None
+        self._median_key = None
+        self._median = None
+        self._timeline = None
+
+    @property
+    def latest_day(self):
+        return max((d for d in self.days if d is not None), default=None)
+
+    @property
+    def stored_days(self):
+        return sum(1 for d in self.days if d is not None)
+
+    def add_timeline(self, tl):
+        """Übernimmt die Preise einer Timeline, einmal pro Datenstand. True bei Änderungen."""
+        if tl is None or not len(tl) or tl.version == self._seen: return False
+        self._seen = tl.version
+        parts = max(1, int(tl.slot_seconds // BIN_SECONDS))
+        changed = False
+        for j, (ts, price) in enumerate(zip(tl.starts, tl.prices)):
+            # Interpolierte Lücken sind keine beobachteten Preise
+            if j in tl.gaps: continue
+            price = round(price, 4)
+            for k in range(parts):
+                dt = datetime.fromtimestamp(ts + k * BIN_SECONDS, tl.tz)
+                day = dt.toordinal()
+                row = day % HISTORY_DAYS
+                if self.days[row] != day:
+                    # Ältere Daten verdrängen keinen neueren Tag
+                    if self.days[row] is not None and self.days[row] > day: continue
+                    self.days[row] = day
+                    base = row * BINS_PER_DAY
+                    self.values[base:base + BINS_PER_DAY] = [None] * BINS_PER_DAY
+                i = row * BINS_PER_DAY + (dt.hour * 60 + dt.minute) // 15
+                if self.values[i] != price:
+                    self.values[i] = price
+                    changed = True
+        if changed: self.version += 1
+        return changed
+
+    def medians(self, today):
+        """Median je Viertelstunde über die Tage bis `today` (Ordinal); None bei zu wenigen Werten."""
+        key = (self.version, today)
+        if key == self._median_key: return self._median
+        rows = [r for r, d in enumerate(self.days) if d is not None and today - d < HISTORY_DAYS]
+        out = []
+        for b in range(BINS_PER_DAY):
+            vals = sorted(v for v in (self.values[r * BINS_PER_DAY + b] for r in rows) if v is not None)
+            n = len(vals)
+            if n < MIN_SAMPLES: out.append(None)
+            elif n % 2: out.append(vals[n // 2])
+            else: out.append((vals[n // 2 - 1] + vals[n // 2]) / 2)
+        self._median_key, self._median = key, out
+        return out
+
+    def timeline(self, now, slot_seconds=None):
+        """Ersatz-Timeline für heute und morgen; None, wenn das Profil zu alt oder zu dünn ist."""
+        today = now.toordinal()
+        latest = self.latest_day
+        if latest is None or today - latest > MAX_AGE_DAYS: return None
+        version = ("fallback", self.version, today, slot_seconds)
+        if self._timeline is not None and self._timeline.version == version: return self._timeline
+        slots = []
+        for offset in (0, 1):
+            midnight = datetime.combine(now.date() + timedelta(days=offset), time(), now.tzinfo)
+            for b, price in enumerate(self.medians(today)):
+                if price is None: continue
+                start = midnight + timedelta(seconds=b * BIN_SECONDS)
+                slots.append({"startsAt": start.isoformat(), "total": price})
+        if not slots: return None
+        self._timeline = PriceTimeline(slots, now.tzinfo, version, slot_seconds)
+        return self._timeline
+
+    def as_dict(self):
+        return {"days": self.days, "values": self.values}
+
+    def load(self, data):
+        if not data: return
+        days, values = data.get("days") or [], data.get("values") or []
+        if len(days) != HISTORY_DAYS or len(values) != HISTORY_DAYS * BINS_PER_DAY: return
+        self.days = [int(d) if d is not None else None for d in days]
+        self.values = [float(v) if v is not None else None for v in values]
+        self.version += 1
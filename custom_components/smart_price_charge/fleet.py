@@ -0,0 +1,99 @@
+"""Flottenbetrieb: ein gemeinsamer Timer für alle Einträge, geteilter Policy-Cache und begrenzter Befehlsversand."""
+import asyncio
+import logging
+from datetime import timedelta
+from time import perf_counter
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DOMAIN
+from .plancache import PolicyCache
+from .stats import Instrumentation
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_FLEET = f"{DOMAIN}_fleet"
+FLEET_INTERVAL = timedelta(seconds=60)
+# Gleichzeitige Service-Calls an Wechselrichter über die ganze Flotte
+MAX_CONCURRENT_COMMANDS = 8
+# Größe des gemeinsamen Policy-Caches pro Mitglied
+POLICIES_PER_MEMBER = 2
+# Obergrenze für den Tick eines Mitglieds (Sekunden); ein hängendes Mitglied hält die anderen nicht auf
+MEMBER_TIMEOUT = 30
+
+
+def async_get_fleet(hass):
+    fleet = hass.data.get(DATA_FLEET)
+    if fleet is None: fleet = hass.data[DATA_FLEET] = Fleet(hass)
+    return fleet
+
+
+class Fleet:
+    """Ein Timer statt N eigener Coordinator-Timer; die Mitglieder laufen parallel, jedes mit Zeitlimit.
+
+    Das ist kein gemeinsamer Planer: Jeder Akku plant selbst, der Rechenaufwand wächst
+    linear mit der Flotte. Geteilt werden die Preis-Timeline (über den Preis-Dienst),
+    der Policy-Cache des DP-Planers (trifft nur bei gleichen Eingaben inkl. Last und PV)
+    und ein Semaphor, der die gleichzeitigen Befehle aller Dispatcher begrenzt.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.members = {}
+        self.policies = PolicyCache(POLICIES_PER_MEMBER)
+        self.limiter = asyncio.Semaphore(MAX_CONCURRENT_COMMANDS)
+        self.stats = Instrumentation()
+        self._unsub_timer = None
+        self._task = None
+
+    @callback
+    def join(self, manager):
+        """Nimmt einen Manager auf; gibt die Funktion zum Austreten zurück."""
+        key = manager.entry.entry_id
+        self.members[key] = manager
+        self.policies.size = POLICIES_PER_MEMBER * len(self.members)
+        if self._unsub_timer is None:
+            self._unsub_timer = async_track_time_interval(self.hass, self._handle_interval, FLEET_INTERVAL)
+
+        @callback
+        def leave():
+            if self.members.pop(key, None) is None: return
+            self.policies.size = POLICIES_PER_MEMBER * max(1, len(self.members))
+            if self.members: return
+            if self._unsub_timer:
+                self._unsub_timer()
+                self._unsub_timer = None
+            self.hass.data.pop(DATA_FLEET, None)
+        return leave
+
+    @callback
+    def _handle_interval(self, _now):
+        # Läuft der vorige Takt noch, wird dieser ausgelassen statt sich zu stapeln
+        if self._task is not None and not self._task.done():
+            self.stats.count("skipped")
+            return
+        self._task = self.hass.async_create_background_task(self.async_tick(), f"{DOMAIN}_fleet")
+
+    async def async_tick(self):
+        start = perf_counter()
+        await asyncio.gather(*(self._async_refresh(m) for m in list(self.members.values())))
+        self.stats.record("tick", (perf_counter() - start) * 1000)
+
+    async def _async_refresh(self, manager):
+        try:
+            await asyncio.wait_for(manager.async_refresh(), MEMBER_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.stats.count("timeouts")
+            _LOGGER.warning(f"Flotten-Takt: {manager.entry.title} nach {MEMBER_TIMEOUT}s abgebrochen")
+        except Exception as e:
+            _LOGGER.error(f"Flotten-Takt: {manager.entry.title} fehlgeschlagen: {e}")
+
+    def as_dict(self):
+        return {
+            "members": len(self.members),
+            "policies": self.policies.as_dict(),
+            "tick": self.stats.phases["tick"].as_dict(),
+            "skipped": self.stats.counters.get("skipped", 0),
+            "timeouts": self.stats.counters.get("timeouts", 0),
+        }
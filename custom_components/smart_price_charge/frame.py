@@ -0,0 +1,120 @@
+"""Eingabe-Frame: alle Quell-Entitäten einmal pro Tick gelesen, geparst und mit Qualitäts-Flags versehen."""
+from datetime import datetime
+
+# Entspricht STATE_UNAVAILABLE / STATE_UNKNOWN aus homeassistant.const
+INVALID_STATES = frozenset(("unavailable", "unknown"))
+
+# Qualitäts-Flags je Feld (Bitmaske)
+FLAG_MISSING = 1        # Entität existiert nicht
+FLAG_UNAVAILABLE = 2    # unavailable / unknown
+FLAG_INVALID = 4        # Zustand nicht lesbar
+FLAG_STALE = 8          # länger als max_age nicht gemeldet
+# Bei diesen Flags steht im Feld der Ersatzwert
+FLAG_DEFAULT = FLAG_MISSING | FLAG_UNAVAILABLE | FLAG_INVALID
+FLAG_NAMES = ((FLAG_MISSING, "missing"), (FLAG_UNAVAILABLE, "unavailable"), (FLAG_INVALID, "invalid"), (FLAG_STALE, "stale"))
+
+# Messwerte gelten nach 30 Minuten ohne Meldung als veraltet
+STALE_AFTER = 1800
+
+# Wetter Faktoren
+WEATHER_PV_FACTOR = {
+    'sunny': 1.0, 'clear-night': 0.0, 'partlycloudy': 0.8, 'cloudy': 0.5,
+    'fog': 0.3, 'rainy': 0.1, 'pouring': 0.05, 'snowy': 0.4,
+    'lightning': 0.1, 'hail': 0.1, 'windy': 0.5, 'exceptional': 0.0
+}
+
+
+def _float(state): return float(state.state)
+def _elevation(state): return float(state.attributes.get('elevation', 0))
+def _weather(state): return WEATHER_PV_FACTOR[state.state]
+def _datetime(state): return datetime.fromisoformat(state.state)
+
+
+# Feld -> (Parser, Ersatzwert, max. Alter in s oder None)
+FIELDS = {
+    "soc": (_float, 0.0, STALE_AFTER),
+    "grid_w": (_float, 0.0, STALE_AFTER),
+    "house_w": (_float, 0.0, STALE_AFTER),
+    "pv_w": (_float, 0.0, STALE_AFTER),
+    "battery_w": (_float, 0.0, STALE_AFTER),
+    "avg_house_w": (_float, 500.0, None),
+    "min_soc": (_float, None, None),
+    "fc_rem_kwh": (_float, 0.0, None),
+    "fc_next_kwh": (_float, 0.0, None),
+    "sun_elevation": (_elevation, 0.0, None),
+    "weather_factor": (_weather, 0.5, None),
+    "pv_peak_time": (_datetime, None, None),
+}
+
+
+class InputFrame:
+    """Werte eines Ticks, ein Attribut pro Feld aus FIELDS.
+
+    `flags[name]` ist die Qualitäts-Bitmaske, `updated[name]` das last_updated der
+    Quelle (None ohne Entität). Nicht konfigurierte Felder tragen den Ersatzwert ohne Flag.
+    """
+
+    __slots__ = tuple(FIELDS) + ("flags", "updated")
+
+    def latest(self, *names):
+        """Jüngster last_updated-Zeitstempel (Unix-Zeit) der Felder oder None."""
+        stamps = [self.updated[n] for n in names if self.updated[n] is not None]
+        return max(stamps).timestamp() if stamps else None
+
+    def flagged(self, *names, mask=~0):
+        """True, wenn eines der Felder (ohne Angabe: irgendeines) ein Flag aus `mask` trägt."""
+        return any(self.flags[n] & mask for n in (names or FIELDS))
+
+    def quality(self):
+        """Felder mit Flags als {Feld: [Flag-Namen]} für die Diagnose."""
+        return {n: [label for bit, label in FLAG_NAMES if f & bit] for n, f in self.flags.items() if f}
+
+
+class FrameReader:
+    """Liest die Entitäten in einen `InputFrame`; geparst wird nur bei neuem last_updated."""
+
+    __slots__ = ("entities", "_cache", "hits", "misses")
+
+    def __init__(self, entities):
+        # {Feld: entity_id oder None}
+        self.entities = entities
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def read(self, get_state, now_ts):
+        """`get_state(entity_id)` liefert einen HA-State oder None."""
+        frame = InputFrame()
+        flags, updated = {}, {}
+        for name, (parse, default, max_age) in FIELDS.items():
+            entity_id = self.entities.get(name)
+            value, flag, stamp = default, 0, None
+            state = get_state(entity_id) if entity_id else None
+            if state is not None:
+                stamp = state.last_updated
+                cached = self._cache.get(name)
+                if cached is not None and cached[0] == entity_id and cached[1] == stamp:
+                    self.hits += 1
+                    value, flag = cached[2], cached[3]
+                else:
+                    self.misses += 1
+                    if state.state in INVALID_STATES: flag = FLAG_UNAVAILABLE
+                    else:
+                        try: value = parse(state)
+                        except (TypeError, ValueError, KeyError): flag = FLAG_INVALID
+                    self._cache[name] = (entity_id, stamp, value, flag)
+                if max_age is not None and not flag:
+                    # last_reported wird auch bei gleichem Wert erneuert (HA >= 2024.3)
+                    seen = getattr(state, "last_reported", None) or stamp
+                    if now_ts - seen.timestamp() > max_age: flag |= FLAG_STALE
+            elif entity_id:
+                flag = FLAG_MISSING
+            setattr(frame, name, value)
+            flags[name] = flag
+            updated[name] = stamp
+        frame.flags = flags
+        frame.updated = updated
+        return frame
+
+    def as_dict(self):
+        return {"hits": self.hits, "misses": self.misses}
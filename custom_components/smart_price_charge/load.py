@@ -0,0 +1,87 @@
+"""Gelerntes Lastprofil (Wochentag × Viertelstunde) für SmartPriceCharge."""
+from datetime import datetime
+
+BIN_SECONDS = 900
+BINS_PER_DAY = 96
+BINS = 7 * BINS_PER_DAY
+# Gewicht eines neuen Viertelstunden-Werts (exponentieller Zerfall alter Wochen)
+DEFAULT_ALPHA = 0.2
+
+
+class LoadProfile:
+    """Fester Speicher: ein Wert pro Wochentag und Viertelstunde.
+
+    Messwerte werden pro Viertelstunde gemittelt und beim Wechsel der
+    Viertelstunde per EWMA ins Profil übernommen; jedes `add` ist O(1).
+    """
+
+    __slots__ = ("values", "counts", "alpha", "version", "_bin", "_sum", "_n")
+
+    def __init__(self, alpha=DEFAULT_ALPHA):
+        self.values = [0.0] * BINS
+        self.counts = [0] * BINS
+        self.alpha = alpha
+        # Wird bei jeder Übernahme eines Viertelstunden-Werts erhöht
+        self.version = 0
+        self._bin = None
+        self._sum = 0.0
+        self._n = 0
+
+    @staticmethod
+    def bin_of(dt):
+        return dt.weekday() * BINS_PER_DAY + (dt.hour * 60 + dt.minute) // 15
+
+    @property
+    def coverage(self):
+        """Anteil der bereits gelernten Viertelstunden (0..1)."""
+        return sum(1 for c in self.counts if c) / BINS
+
+    def add(self, watts, dt):
+        """Neuer Messwert (W) zur lokalen Zeit `dt`. True wenn ein Profilwert aktualisiert wurde."""
+        b = self.bin_of(dt)
+        folded = False
+        if b != self._bin:
+            folded = self._fold()
+            self._bin = b
+        self._sum += watts
+        self._n += 1
+        return folded
+
+    def _fold(self):
+        i, n, total = self._bin, self._n, self._sum
+        self._sum, self._n = 0.0, 0
+        if i is None or not n: return False
+        avg = total / n
+        if self.counts[i]: self.values[i] += self.alpha * (avg - self.values[i])
+        else: self.values[i] = avg
+        self.counts[i] += 1
+        self.version += 1
+        return True
+
+    def expected(self, dt, fallback):
+        i = self.bin_of(dt)
+        return self.values[i] if self.counts[i] else fallback
+
+    def forecast(self, starts, slot_seconds, tz, fallback):
+        """Erwartete Last (W) für Slots mit den Startzeiten `starts`; ungelernte Werte = `fallback`."""
+        parts = max(1, int(slot_seconds // BIN_SECONDS))
+        out = []
+        for ts in starts:
+            if parts == 1:
+                out.append(self.expected(datetime.fromtimestamp(ts, tz), fallback))
+            else:
+                out.append(sum(
+                    self.expected(datetime.fromtimestamp(ts + k * BIN_SECONDS, tz), fallback) for k in range(parts)
+                ) / parts)
+        return out
+
+    def as_dict(self):
+        return {"values": [round(v, 1) for v in self.values], "counts": self.counts}
+
+    def load(self, data):
+        if not data: return
+        values, counts = data.get("values") or [], data.get("counts") or []
+        if len(values) != BINS or len(counts) != BINS: return
+        self.values = [float(v) for v in values]
+        self.counts = [int(c) for c in counts]
+        self.version += 1
@@ -1,22 +1,55 @@
 """Logik Manager für SmartPriceCharge."""
+import cProfile
 import logging
-import aiohttp
-import math
-from datetime import timedelta, datetime, time
+import pstats
+from io import StringIO
+from time import monotonic, perf_counter
+from datetime import date, timedelta
+from homeassistant.core import callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import async_track_point_in_time, async_track_state_change_event
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 import homeassistant.util.dt as dt_util
-from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
 
 from .const import *
+from .prices import FilePriceService, SensorPriceService, async_get_shared
+from .tibber import TibberPriceService
+from .engine import Engine, EngineInput, EngineSettings
+from .fallback import PriceProfile
+from .frame import FrameReader
+from .planview import build_columns
+from .plancache import PolicyCache, options_hash
+from .store import Snapshot, TrackerStore
+from .advisor import async_get_advisor, build_summary
+from .fleet import async_get_fleet
+from .energy import EnergyIntegrator
+from .load import LoadProfile
+from .pv import PvForecast
+from .dispatcher import MODE_HEARTBEAT, Command, InverterDispatcher
+from .stats import Instrumentation
 
 _LOGGER = logging.getLogger(__name__)
 
-# Wetter Faktoren
-WEATHER_PV_FACTOR = {
-    'sunny': 1.0, 'clear-night': 0.0, 'partlycloudy': 0.8, 'cloudy': 0.5,
-    'fog': 0.3, 'rainy': 0.1, 'pouring': 0.05, 'snowy': 0.4,
-    'lightning': 0.1, 'hail': 0.1, 'windy': 0.5, 'exceptional': 0.0
+# Event-Modus: Quellen und Mindeständerung bis zur Neubewertung (None = jede Zustandsänderung)
+EVENT_SOURCES = {
+    CONF_SOC_SENSOR: 1.0,
+    CONF_GRID_POWER: 200.0,
+    CONF_PV_POWER: 200.0,
+    CONF_BATTERY_POWER: 200.0,
+    CONF_HOUSE_POWER: 200.0,
+    CONF_WEATHER_SENSOR: None,
+    CONF_SUN_SENSOR: None,
 }
+POLL_INTERVAL = timedelta(seconds=60)
+WATCHDOG_INTERVAL = timedelta(minutes=5)
+REFRESH_COOLDOWN = 10
+# Entitäten, deren Forecast-Attribute (Solcast, Forecast.Solar) als PV-Kurve gelesen werden
+PV_CURVE_SOURCES = (CONF_PV_FC_REM, CONF_PV_FC_TOMORROW, CONF_PV_FC_NEXT)
+# Options, deren Änderung die bestätigten Stellbefehle des Dispatchers ungültig macht
+DISPATCH_OPTIONS = frozenset({
+    CONF_MODE_OPTION_NORMAL, CONF_MODE_OPTION_FORCE_CHARGE,
+    CONF_INVERTER_MIN_SOC_ENTITY, CONF_INVERTER_MIN_SOC_INVERT, CONF_INVERTER_MAX_SOC_ENTITY,
+})
 
 class SmartPriceChargeManager(DataUpdateCoordinator):
     """Hauptlogik."""
@@ -24,23 +57,42 @@ class SmartPriceChargeManager(DataUpdateCoordinator):
     def __init__(self, hass, entry):
         self.entry = entry
         self.config = entry.data
-        super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=timedelta(seconds=60))
+        self.event_driven = entry.options.get(CONF_EVENT_DRIVEN, DEFAULT_EVENT_DRIVEN)
+        self.fleet_mode = entry.options.get(CONF_FLEET_MODE, DEFAULT_FLEET_MODE)
+        super().__init__(
+            hass, _LOGGER, name=DOMAIN,
+            update_interval=self._own_interval(),
+            request_refresh_debouncer=Debouncer(hass, _LOGGER, cooldown=REFRESH_COOLDOWN, immediate=True),
+        )
 
         self.is_active = True
         self.tibber_token = self.config.get(CONF_TIBBER_TOKEN)
         self.notify_service_static = self.config.get(CONF_NOTIFY_SERVICE)
         self.ref_price = self.config.get(CONF_REFERENCE_PRICE, 0.35)
+        self.price_source = self.config.get(CONF_PRICE_SOURCE, DEFAULT_PRICE_SOURCE)
+        self.price_service = self._create_price_service()
+        self.home_id = self.config.get(CONF_HOME_ID)
+        self.slot_seconds = entry.options.get(CONF_SLOT_RESOLUTION, DEFAULT_SLOT_RESOLUTION) * 60 or None
         
         self.prices_today = []
         self.prices_tomorrow = []
+        self.timeline = None
         self.current_api_price = 0.0
+        self._price_task = None
         
-        # Tracker
-        self.tracker_cost_total = 0.0
-        self.tracker_savings_total = 0.0
-        self.tracker_discharge_savings = 0.0
-        self.tracker_pv_savings = 0.0
-        self.tracker_charged_kwh = 0.0
+        # Tracker (persistent, siehe store.py)
+        self.trackers = TrackerStore(hass, entry.entry_id)
+        self.load_profile = LoadProfile()
+        self.trackers.attach("load_profile", self.load_profile)
+        self.snapshot = Snapshot()
+        self.trackers.attach("snapshot", self.snapshot)
+        # Median-Preise der letzten Tage als Ersatz bei Ausfall der Preisquelle (siehe fallback.py)
+        self.price_profile = PriceProfile()
+        self.trackers.attach("price_profile", self.price_profile)
+        self.pv_forecast = PvForecast()
+        # Alle Quell-Entitäten einmal pro Tick, geparst nur bei neuem last_updated (siehe frame.py)
+        self.frame_reader = FrameReader(self._frame_entities())
+        self.frame = None
         
         # Output States
         self.status_message = "Init..."
@@ -50,35 +102,276 @@ class SmartPriceChargeManager(DataUpdateCoordinator):
         self.peak_time = None
         self.next_charge_time = None
         self.slots_info = "Keine Slots"
+        # Herkunft der Preise der letzten Entscheidung (live/fallback); price_source ist das konfigurierte Backend
+        self.decision_price_source = None
+        self.low_confidence = False
+        self.safe_mode = False
+        self.plan = None
+        self._options_ref = None
+        self._options_hash = None
+        self._settings = None
+        self._applied_options = dict(entry.options)
+        # Spaltenweiser Plan für Sensor-Attribut und Websocket (siehe planview.py)
+        self.plan_columns = None
+        self.plan_revision = 0
+        self._plan_view_key = None
+        self._plan_listeners = []
 
         self.charging_session_active = False
-        self.last_mode_command_time = None
-        self.last_limit_command_time = None
+        self.stats = Instrumentation()
+        # Entscheidungs-Kern ohne HA (siehe engine.py), hält Plan-, Auswahl- und Policy-Cache
+        self.engine = Engine(self.stats)
+        # Sensor-Schreibvorgänge je unique_id: [geschrieben, unterdrückt] (siehe sensor.py)
+        self.sensor_writes = {}
+        self._started = monotonic()
+        self.dispatcher = InverterDispatcher(hass, self.stats)
+        self._profiler = None
+        self._profile_ticks = 0
         self.last_sleep_over_notified_date = None
         self.last_ai_run_date = None
+        self.advisor = async_get_advisor(hass)
+        self.ai_advice = None
+        self.integrators = {k: EnergyIntegrator() for k in ("pv", "grid", "discharge")}
+
+        # Event-Modus
+        self._unsub_listeners = []
+        self._unsub_slot_timer = None
+        self._slot_timer_at = None
+        self._event_baseline = {}
+        self._fleet_leave = None
+
+    def _own_interval(self):
+        """Eigener Coordinator-Timer; im Flottenbetrieb taktet die Flotte (siehe fleet.py)."""
+        if self.fleet_mode: return None
+        return WATCHDOG_INTERVAL if self.event_driven else POLL_INTERVAL
+
+    @callback
+    def async_join_fleet(self):
+        if not self.fleet_mode or self._fleet_leave: return
+        fleet = async_get_fleet(self.hass)
+        self._fleet_leave = fleet.join(self)
+        self.engine.policies = fleet.policies
+        self.dispatcher.limiter = fleet.limiter
+
+    @callback
+    def async_leave_fleet(self):
+        if not self._fleet_leave: return
+        self._fleet_leave()
+        self._fleet_leave = None
+        self.engine.policies = PolicyCache()
+        self.dispatcher.limiter = None
+
+    def _create_price_service(self):
+        """Ein Preis-Dienst pro Quelle (Token, Entität, Datei/URL), geteilt mit anderen Einträgen."""
+        if self.price_source == PRICE_SOURCE_SENSOR:
+            entity_id = self.config.get(CONF_PRICE_ENTITY)
+            return async_get_shared(self.hass, f"sensor:{entity_id}", lambda: SensorPriceService(self.hass, entity_id))
+        if self.price_source == PRICE_SOURCE_FILE:
+            source = self.config.get(CONF_PRICE_FILE)
+            return async_get_shared(self.hass, f"file:{source}", lambda: FilePriceService(self.hass, source))
+        return async_get_shared(self.hass, f"tibber:{self.tibber_token}", lambda: TibberPriceService(self.hass, self.tibber_token))
+
+    def _price_source_configured(self):
+        if self.price_source == PRICE_SOURCE_SENSOR: return bool(self.config.get(CONF_PRICE_ENTITY))
+        if self.price_source == PRICE_SOURCE_FILE: return bool(self.config.get(CONF_PRICE_FILE))
+        return bool(self.tibber_token)
+
+    async def async_warm_start(self):
+        """Letzten Stand (Tracker, Preis-Cache, Ausgabewerte) von der Platte laden, ohne Netzwerk.
+
+        Der erste echte Tick mit Preisabruf läuft danach im Hintergrund.
+        """
+        await self.trackers.async_load()
+        self._restore_snapshot()
+        if self._price_source_configured():
+            await self.price_service.async_ensure_loaded()
+            self._apply_prices(dt_util.now())
+        self.async_set_updated_data(self._get_data_dict(self.status_message))
+
+    def _restore_snapshot(self):
+        s = self.snapshot.values
+        if not s: return
+        self.status_message = "Warmstart"
+        self.recommendation_mode = s.get("mode", self.recommendation_mode)
+        self.peak_price = s.get("peak_price", 0.0)
+        self.slots_info = s.get("slots_info", self.slots_info)
+        for attr in ("peak_time", "next_charge_time"):
+            if s.get(attr): setattr(self, attr, dt_util.parse_datetime(s[attr]))
+        self.charging_session_active = s.get("session_active", False)
+        self.charging_session_net_charged_kwh = s.get("session_kwh", 0.0)
+        self.last_sleep_over_notified_date = s.get("sleep_over_date")
+        if s.get("plan"):
+            self.plan_columns = s["plan"]
+            self.plan_revision = s.get("plan_revision", 0)
+
+    def _update_snapshot(self):
+        values = {
+            "mode": self.recommendation_mode,
+            "peak_price": self.peak_price,
+            "peak_time": self.peak_time.isoformat() if self.peak_time else None,
+            "next_charge_time": self.next_charge_time.isoformat() if self.next_charge_time else None,
+            "slots_info": self.slots_info,
+            "session_active": self.charging_session_active,
+            "session_kwh": round(self.charging_session_net_charged_kwh, 3),
+            "sleep_over_date": self.last_sleep_over_notified_date,
+            "plan": self.plan_columns,
+            "plan_revision": self.plan_revision,
+        }
+        if values == self.snapshot.values: return
+        self.snapshot.values = values
+        self.trackers.touch()
+
+    def _apply_prices(self, now):
+        """Preise aus dem Cache des Preis-Dienstes übernehmen."""
+        home = self.price_service.home(self.home_id)
+        self.prices_today = home["today"]
+        self.prices_tomorrow = home["tomorrow"]
+        self.timeline = self.price_service.timeline(self.home_id, now.tzinfo, self.slot_seconds)
+        if self.price_profile.add_timeline(self.timeline): self.trackers.touch()
+        idx = self.timeline.slot_at(now.timestamp())
+        self.current_api_price = self.timeline.prices[idx] if idx >= 0 else 0.0
+
+    async def _fetch_prices(self):
+        if not self._price_source_configured(): return
+        now = dt_util.now()
+        if self.timeline and self.timeline.slot_at(now.timestamp()) >= 0:
+            # Gültige Preise im Cache: Abruf im Hintergrund, die Regelung wartet nicht auf die Cloud.
+            # Neue Daten melden sich über async_prices_updated (auch bei diesem Eintrag).
+            if self._price_task is None or self._price_task.done():
+                self._price_task = self.entry.async_create_background_task(
+                    self.hass, self.price_service.async_update(now), f"{DOMAIN}_prices_{self.entry.entry_id}"
+                )
+        else:
+            await self.price_service.async_update(now, source=self.entry.entry_id)
+        self._apply_prices(now)
+
+    @property
+    def tracker_cost_total(self): return self.trackers.totals["cost"]
+
+    @property
+    def tracker_savings_total(self): return self.trackers.totals["saved"]
+
+    @property
+    def tracker_discharge_savings(self): return self.trackers.totals["discharge"]
 
-    async def _fetch_tibber_data(self):
-        if not self.tibber_token: return
-        query = """
-        { viewer { homes { currentSubscription { priceInfo {
-          current { total }
-          today { total startsAt }
-          tomorrow { total startsAt }
-        } } } } }
+    @property
+    def tracker_pv_savings(self): return self.trackers.totals["pv"]
+
+    @property
+    def tracker_charged_kwh(self): return self.trackers.totals["kwh"]
+
+    @callback
+    def async_start_listeners(self):
+        """Event-Modus: Neubewertung bei Sensor-Änderungen statt festem Polling."""
+        if not self.event_driven: return
+        entities = [self.config.get(k) for k in EVENT_SOURCES if self.config.get(k)]
+        if entities:
+            self._unsub_listeners.append(
+                async_track_state_change_event(self.hass, entities, self._handle_source_event)
+            )
+        self._schedule_slot_timer()
+
+    @callback
+    def async_prices_updated(self):
+        """Neue Preise im Dienst (anderer Eintrag oder Hintergrund-Abruf) -> neu bewerten."""
+        self.hass.async_create_task(self.async_request_refresh())
+
+    @callback
+    def async_apply_options(self):
+        """Geänderte Optionen im laufenden Betrieb übernehmen; verworfen wird nur, was betroffen ist.
+
+        Schwellwerte liest die Logik ohnehin bei jedem Tick aus den Optionen.
         """
-        url = "https://api.tibber.com/v1-beta/gql"
-        headers = {"Authorization": f"Bearer {self.tibber_token}", "Content-Type": "application/json"}
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json={"query": query}, headers=headers) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        pi = data['data']['viewer']['homes'][0]['currentSubscription']['priceInfo']
-                        self.current_api_price = pi['current']['total']
-                        self.prices_today = pi['today']
-                        self.prices_tomorrow = pi['tomorrow']
-        except Exception as e:
-            _LOGGER.error(f"Tibber API Error: {e}")
+        opts = dict(self.entry.options)
+        changed = {k for k in opts.keys() | self._applied_options.keys() if opts.get(k) != self._applied_options.get(k)}
+        self._applied_options = opts
+        if not changed: return
+        _LOGGER.debug(f"Optionen geändert: {sorted(changed)}")
+
+        self.engine.invalidate()
+        if changed & DISPATCH_OPTIONS: self.dispatcher.forget()
+        if CONF_INVERTER_MIN_SOC_ENTITY in changed: self.frame_reader = FrameReader(self._frame_entities())
+        if CONF_SLOT_RESOLUTION in changed:
+            self.slot_seconds = opts.get(CONF_SLOT_RESOLUTION, DEFAULT_SLOT_RESOLUTION) * 60 or None
+            self._plan_view_key = None
+            if self._price_source_configured(): self._apply_prices(dt_util.now())
+        if CONF_EVENT_DRIVEN in changed:
+            self.async_stop_listeners()
+            self.event_driven = opts.get(CONF_EVENT_DRIVEN, DEFAULT_EVENT_DRIVEN)
+            self.async_start_listeners()
+        if CONF_FLEET_MODE in changed:
+            self.async_leave_fleet()
+            self.fleet_mode = opts.get(CONF_FLEET_MODE, DEFAULT_FLEET_MODE)
+            self.async_join_fleet()
+        self.update_interval = self._own_interval()
+        self.hass.async_create_task(self.async_request_refresh())
+
+    @callback
+    def async_add_plan_listener(self, listener):
+        """`listener(alt, neu)` bei jeder Planänderung; gibt die Abmelde-Funktion zurück."""
+        self._plan_listeners.append(listener)
+
+        @callback
+        def remove():
+            if listener in self._plan_listeners: self._plan_listeners.remove(listener)
+        return remove
+
+    def _update_plan_columns(self, tl, start, cheap_slots, pv_curve, pv_safety):
+        """Spalten nur neu bauen, wenn sich Raster, Startslot, Plan oder PV-Kurve geändert haben."""
+        # Der Plan selbst steht im Schlüssel (Vergleich per Identität); eine id() könnte nach dem Freigeben wiederverwendet werden
+        key = (tl.version, start, self.plan if self.plan is not None else tuple(cheap_slots), self.pv_forecast.version if pv_curve else None)
+        if key == self._plan_view_key: return
+        self._plan_view_key = key
+        pv = [v * pv_safety for v in pv_curve] if pv_curve else None
+        old, self.plan_columns = self.plan_columns, build_columns(tl, start, cheap_slots, self.plan, pv)
+        self.plan_revision += 1
+        for listener in list(self._plan_listeners):
+            try: listener(old, self.plan_columns)
+            except Exception as e: _LOGGER.error(f"Plan-Listener Fehler: {e}")
+
+    @callback
+    def async_stop_listeners(self):
+        for unsub in self._unsub_listeners: unsub()
+        self._unsub_listeners = []
+        if self._unsub_slot_timer:
+            self._unsub_slot_timer()
+            self._unsub_slot_timer = None
+        self._slot_timer_at = None
+
+    @callback
+    def _handle_source_event(self, event):
+        entity_id = event.data["entity_id"]
+        new_state = event.data.get("new_state")
+        old_state = event.data.get("old_state")
+        if new_state is None or (old_state and old_state.state == new_state.state): return
+
+        threshold = next((t for k, t in EVENT_SOURCES.items() if self.config.get(k) == entity_id), None)
+        if threshold is not None:
+            try: value = float(new_state.state)
+            except (TypeError, ValueError): return
+            last = self._event_baseline.get(entity_id)
+            if last is not None and abs(value - last) < threshold: return
+            self._event_baseline[entity_id] = value
+
+        self.hass.async_create_task(self.async_request_refresh())
+
+    @callback
+    def _schedule_slot_timer(self):
+        """Timer exakt auf den Beginn des nächsten Preis-Slots."""
+        if not self.event_driven or not self.timeline: return
+        nxt = self.timeline.index_at(dt_util.now().timestamp()) + 1
+        if nxt >= len(self.timeline): return
+        when = self.timeline.time(nxt)
+        if when == self._slot_timer_at: return
+        if self._unsub_slot_timer: self._unsub_slot_timer()
+        self._slot_timer_at = when
+        self._unsub_slot_timer = async_track_point_in_time(self.hass, self._handle_slot_boundary, when)
+
+    @callback
+    def _handle_slot_boundary(self, _now):
+        self._unsub_slot_timer = None
+        self._slot_timer_at = None
+        self.hass.async_create_task(self.async_refresh())
 
     async def _send_push(self, title, message):
         opts = self.entry.options
@@ -93,8 +386,43 @@ class SmartPriceChargeManager(DataUpdateCoordinator):
         try: await self.hass.services.async_call(domain, service_name, {"title": title, "message": message})
         except: pass
 
+    @property
+    def profiling(self):
+        return self._profiler is not None
+
+    def async_start_profile(self, ticks):
+        """Zeichnet die nächsten `ticks` Durchläufe mit cProfile auf."""
+        self._profiler = cProfile.Profile()
+        self._profile_ticks = max(1, int(ticks))
+
+    async def _async_finish_profile(self):
+        profiler, self._profiler = self._profiler, None
+        path = self.hass.config.path(f"{DOMAIN}_{self.entry.entry_id}_{dt_util.now():%Y%m%d_%H%M%S}.prof")
+        await self.hass.async_add_executor_job(profiler.dump_stats, path)
+        out = StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+        _LOGGER.warning(f"Profil gespeichert: {path}\n{out.getvalue()}")
+
     async def _async_update_data(self):
-        if not self.prices_today or dt_util.now().minute % 15 == 0: await self._fetch_tibber_data()
+        if self._profiler:
+            try: self._profiler.enable()
+            except ValueError:
+                # Ein anderer Profiler im Prozess ist aktiv (z. B. die Integration "profiler")
+                _LOGGER.warning("Profilierung abgebrochen: anderer Profiler aktiv")
+                self._profiler = None
+        try:
+            with self.stats.measure("tick"):
+                return await self._async_tick()
+        finally:
+            if self._profiler:
+                self._profiler.disable()
+                self._profile_ticks -= 1
+                if self._profile_ticks <= 0: await self._async_finish_profile()
+
+    async def _async_tick(self):
+        # Der Fetcher entscheidet selbst, ob ein API-Abruf nötig ist
+        with self.stats.measure("fetch"):
+            await self._fetch_prices()
         if not self.is_active: return self._get_data_dict("Deaktiviert")
         
         # KI-Berater Sonntags um 20:00 triggern
@@ -102,373 +430,310 @@ class SmartPriceChargeManager(DataUpdateCoordinator):
         if now_dt.weekday() == 6 and now_dt.hour == 20:
             today_str = now_dt.strftime('%Y-%m-%d')
             if self.last_ai_run_date != today_str:
-                self.hass.async_create_task(self.trigger_ai_analysis())
+                self.request_ai_advice()
                 self.last_ai_run_date = today_str
                 
         try:
             await self.run_logic()
+            self._update_snapshot()
             return self._get_data_dict(self.status_message)
         except Exception as e:
             _LOGGER.error(f"Logic Error: {e}")
+            self.stats.error("logic", e)
             return self._get_data_dict(f"Error: {e}")
+        finally:
+            self._schedule_slot_timer()
 
     def _get_data_dict(self, status):
         return {
             "status": status,
             "mode": self.recommendation_mode,
-            "session_kwh": self.charging_session_net_charged_kwh,
+            "session_kwh": round(self.charging_session_net_charged_kwh, 3),
             "current_price": self.current_api_price,
             "peak_price": self.peak_price,
             "peak_time": self.peak_time,
             "next_charge_time": self.next_charge_time,
             "slots_info": self.slots_info,
-            "track_cost": self.tracker_cost_total,
-            "track_saved": self.tracker_savings_total,
-            "track_discharge": self.tracker_discharge_savings,
-            "track_pv": self.tracker_pv_savings,
-            "track_kwh": self.tracker_charged_kwh
+            "price_source": self.decision_price_source,
+            "low_confidence": self.low_confidence,
+            "track_cost": round(self.tracker_cost_total, 3),
+            "track_saved": round(self.tracker_savings_total, 3),
+            "track_discharge": round(self.tracker_discharge_savings, 3),
+            "track_pv": round(self.tracker_pv_savings, 3),
+            "track_kwh": round(self.tracker_charged_kwh, 3),
+            "tick_ms": round(self.stats.phases["tick"].last_ms, 2),
+            "api_calls": self.price_service.api_calls,
+            "commands_sent": self.dispatcher.sent,
+        }
+
+    def diagnostics(self):
+        """Laufzeit-Kennzahlen für Diagnose-Sensoren und den diagnostics-Export."""
+        data = self.stats.as_dict()
+        data["counters"].update({
+            "api_calls": self.price_service.api_calls,
+            "api_failures": self.price_service.failures,
+            "cache_hits": self.price_service.cache_hits,
+            "commands_sent": self.dispatcher.sent,
+            "commands_suppressed": self.dispatcher.suppressed,
+            "commands_failed": self.dispatcher.failed,
+        })
+        if self.dispatcher.dropped: data["errors"]["dropped_commands"] = self.dispatcher.dropped
+        if self.price_service.last_error_time:
+            data["errors"]["fetch"] = {"time": self.price_service.last_error_time, "message": self.price_service.last_error}
+        if self.dispatcher.last_error_time:
+            data["errors"]["dispatch"] = {"time": self.dispatcher.last_error_time, "message": self.dispatcher.last_error}
+        data["advisor"] = self.advisor.as_dict()
+        data["policy_cache"] = self.engine.policies.as_dict()
+        if self._fleet_leave: data["fleet"] = async_get_fleet(self.hass).as_dict()
+        latest = self.price_profile.latest_day
+        data["price_data"] = {
+            "source": self.decision_price_source,
+            "backend": self.price_source,
+            "low_confidence": self.low_confidence,
+            "fetched_at": self.price_service.fetched_at.isoformat() if self.price_service.fetched_at else None,
+            "profile_days": self.price_profile.stored_days,
+            "profile_latest": date.fromordinal(latest).isoformat() if latest else None,
         }
+        data["input_frame"] = {**self.frame_reader.as_dict(), "quality": self.frame.quality() if self.frame else {}}
+        data["load_profile"] = {"coverage": round(self.load_profile.coverage, 3), "version": self.load_profile.version}
+        data["plan_cache"] = {
+            **self.engine.plan_cache.as_dict(),
+            "selection_hits": self.engine.selection_cache.hits,
+            "selection_misses": self.engine.selection_cache.misses,
+        }
+        hours = max((monotonic() - self._started) / 3600, 1 / 60)
+        writes = sum(w for w, _ in self.sensor_writes.values())
+        data["sensor_writes"] = {
+            "writes_per_hour": round(writes / hours, 1),
+            "suppressed": sum(s for _, s in self.sensor_writes.values()),
+            "per_sensor": {k: round(w / hours, 1) for k, (w, _) in self.sensor_writes.items()},
+        }
+        return data
+
+    def _option(self, key, default=None):
+        """Wert aus den Optionen, sonst aus den Entry-Daten (Einrichtung), sonst `default`."""
+        if key in self.entry.options: return self.entry.options[key]
+        return self.config.get(key, default)
 
-    def _get_float(self, entity_id, default=0.0):
-        if not entity_id: return default
-        state = self.hass.states.get(entity_id)
-        if state and state.state not in [STATE_UNAVAILABLE, STATE_UNKNOWN]:
-            try: return float(state.state)
-            except: pass
-        return default
+    def _min_soc_sensor(self):
+        """Min-SoC-Entität nur, wenn sie ein reiner Sensor ist.
+
+        Eine number-/input_number-Entität beschreibt die Integration selbst (Sleep-Over,
+        Halten); ihr Wert ist dann nicht der Min-SoC des Nutzers, der kommt aus den Optionen.
+        """
+        entity = self._option(CONF_INVERTER_MIN_SOC_ENTITY)
+        return entity if entity and entity.startswith("sensor.") else None
+
+    def _frame_entities(self):
+        """Feld -> Entität für den FrameReader."""
+        return {
+            "soc": self.config.get(CONF_SOC_SENSOR),
+            "grid_w": self.config.get(CONF_GRID_POWER),
+            "house_w": self.config.get(CONF_HOUSE_POWER),
+            "pv_w": self.config.get(CONF_PV_POWER),
+            "battery_w": self.config.get(CONF_BATTERY_POWER),
+            "avg_house_w": self.config.get(CONF_AVG_CONSUMPTION),
+            "min_soc": self._min_soc_sensor(),
+            "fc_rem_kwh": self.config.get(CONF_PV_FC_REM),
+            "fc_next_kwh": self.config.get(CONF_PV_FC_NEXT),
+            "sun_elevation": self.config.get(CONF_SUN_SENSOR),
+            "weather_factor": self.config.get(CONF_WEATHER_SENSOR),
+            "pv_peak_time": self.config.get(CONF_PV_PEAK_TIME),
+        }
 
-    async def _set_inverter_mode(self, internal_mode):
+    def _set_inverter_mode(self, internal_mode):
         self.recommendation_mode = internal_mode
         entity = self.config.get(CONF_INVERTER_ENTITY)
         if not entity: return
 
-        opts = self.entry.options
-        data = self.entry.data
-        def get_opt(key, default):
-            if key in opts: return opts[key]
-            if key in data: return data[key]
-            return default
-
-        mapped_normal = get_opt(CONF_MODE_OPTION_NORMAL, "General")
-        mapped_charge = get_opt(CONF_MODE_OPTION_FORCE_CHARGE, "Eco Charge")
+        mapped_normal = self._option(CONF_MODE_OPTION_NORMAL, "General")
+        mapped_charge = self._option(CONF_MODE_OPTION_FORCE_CHARGE, "Eco Charge")
 
         target_option = mapped_normal
         if internal_mode == "eco_charge":
             target_option = mapped_charge
-        
-        now = dt_util.now()
-        should_send = True
-        
-        if self.last_mode_command_time:
-             if (now - self.last_mode_command_time).total_seconds() < 900: 
-                 cur_state = self.hass.states.get(entity)
-                 if cur_state and cur_state.state == target_option: 
-                     should_send = False
-        
-        if should_send:
-            domain = "input_select" if "input_select" in entity else "select"
-            try:
-                _LOGGER.info(f"Sende Inverter Modus '{target_option}' an {entity}")
-                await self.hass.services.async_call(domain, "select_option", {"entity_id": entity, "option": target_option})
-                self.last_mode_command_time = now
-            except Exception as e: 
-                _LOGGER.error(f"Fehler beim Modus setzen: {e}")
-
-    async def _set_inverter_limit(self, target_min_soc):
-        opts = self.entry.options
-        entity = opts.get(CONF_INVERTER_MIN_SOC_ENTITY)
-        invert_logic = opts.get(CONF_INVERTER_MIN_SOC_INVERT, False)
-        if not entity: return 
+
+        domain = "input_select" if "input_select" in entity else "select"
+        self.dispatcher.desire(Command(
+            entity, domain, "select_option", {"entity_id": entity, "option": target_option},
+            target_option, heartbeat=MODE_HEARTBEAT,
+        ))
+
+    def _set_inverter_limit(self, target_min_soc):
+        entity = self._option(CONF_INVERTER_MIN_SOC_ENTITY)
+        invert_logic = self._option(CONF_INVERTER_MIN_SOC_INVERT, False)
+        # Reine Sensoren sind nur lesbar
+        if not entity or entity.startswith("sensor."): return 
         target_value = 100.0 - target_min_soc if invert_logic else target_min_soc
         target_value = max(0, min(100, int(target_value)))
-        current_val = self._get_float(entity, -1)
-        if abs(current_val - target_value) > 1:
-            try: await self.hass.services.async_call("number", "set_value", {"entity_id": entity, "value": target_value})
-            except: pass
-
-    async def _set_inverter_max_limit(self, target_max_soc):
-        opts = self.entry.options
-        entity = getattr(self, "CONF_INVERTER_MAX_SOC_ENTITY", "inverter_max_soc_entity_id")
-        if entity in opts:
-            entity_id = opts.get(entity)
-        else:
-            return
-            
+        domain = "input_number" if entity.startswith("input_number.") else "number"
+        self.dispatcher.desire(Command(
+            entity, domain, "set_value", {"entity_id": entity, "value": target_value},
+            target_value, tolerance=1,
+        ))
+
+    def _set_inverter_max_limit(self, target_max_soc):
+        entity_id = self._option(CONF_INVERTER_MAX_SOC_ENTITY)
         if not entity_id: return 
-        
         target_value = max(0, min(100, int(target_max_soc)))
-        current_val = self._get_float(entity_id, -1)
-        
-        if abs(current_val - target_value) > 1:
-            try: 
-                await self.hass.services.async_call("number", "set_value", {"entity_id": entity_id, "value": target_value})
-                _LOGGER.info(f"Hardware-Sync: Max SoC Limit auf {target_value}% gesetzt.")
-            except Exception as e: 
-                _LOGGER.error(f"Fehler beim Setzen des Max SoC: {e}")
-
-    async def trigger_ai_analysis(self):
+        domain = "input_number" if entity_id.startswith("input_number.") else "number"
+        self.dispatcher.desire(Command(
+            entity_id, domain, "set_value", {"entity_id": entity_id, "value": target_value},
+            target_value, tolerance=1,
+        ))
+
+    def request_ai_advice(self):
+        """Reicht eine Anfrage an den KI-Berater weiter; die Antwort kommt asynchron (siehe advisor.py)."""
         opts = self.entry.options
-        
-        ai_active = getattr(self, "CONF_AI_ACTIVE", "ai_active")
-        if not opts.get(ai_active, False):
-            return
-
-        api_key_conf = getattr(self, "CONF_GEMINI_API_KEY", "gemini_api_key")
-        output_conf = getattr(self, "CONF_AI_OUTPUT_ENTITY", "ai_advice_text_id")
-        
-        api_key = opts.get(api_key_conf)
-        output_entity = opts.get(output_conf)
-        
-        if not api_key or not output_entity:
-            return
-
-        target_soc = opts.get(CONF_TARGET_SOC, DEFAULT_TARGET_SOC)
-        min_spread = opts.get(CONF_MIN_SPREAD, DEFAULT_MIN_SPREAD)
-        sleep_soc = opts.get(CONF_SLEEP_SOC, DEFAULT_SLEEP_SOC)
-
-        prompt_text = (
-            f"Du bist ein Smart-Home Energie-Optimierer. Analysiere kurz die Effizienz.\n"
-            f"Daten diesen Monat:\n"
-            f"- Geladen: {self.tracker_charged_kwh:.1f} kWh\n"
-            f"- Kosten: {self.tracker_cost_total:.2f} EUR\n"
-            f"- Ersparnis (Laden): {self.tracker_savings_total:.2f} EUR\n"
-            f"- Ersparnis (Entladen): {self.tracker_discharge_savings:.2f} EUR\n"
-            f"Einstellungen:\n"
-            f"- Ziel-SoC: {target_soc}%\n"
-            f"- Min Spread: {min_spread} EUR\n"
-            f"- Sleep-Over Reserve: {sleep_soc}%\n\n"
-            f"Aufgabe: Gib EINEN kurzen, konkreten Satz als Empfehlung an den Nutzer. "
-            f"Lohnt sich die aktuelle Einstellung? Sollte er Parameter ändern?"
+        if not opts.get(CONF_AI_ACTIVE, False): return
+        if not (opts.get(CONF_AI_OUTPUT_ENTITY) or self.config.get(CONF_AI_OUTPUT_ENTITY)): return
+        settings = {
+            "target_soc": opts.get(CONF_TARGET_SOC, DEFAULT_TARGET_SOC),
+            "min_spread": opts.get(CONF_MIN_SPREAD, DEFAULT_MIN_SPREAD),
+            "sleep_soc": opts.get(CONF_SLEEP_SOC, DEFAULT_SLEEP_SOC),
+        }
+        summary = build_summary(self.trackers.daily_history(), settings)
+        self.advisor.submit(summary, opts.get(CONF_AI_ENDPOINT, ""), opts.get(CONF_GEMINI_API_KEY), self._on_ai_advice)
+
+    @callback
+    def async_cancel_ai_advice(self):
+        """Zurückgestellte KI-Anfrage verwerfen (beim Entladen des Eintrags)."""
+        self.advisor.cancel(self._on_ai_advice)
+
+    @callback
+    def _on_ai_advice(self, advice):
+        self.ai_advice = advice
+        _LOGGER.info(f"KI-Empfehlung empfangen: {advice}")
+        output_entity = self.entry.options.get(CONF_AI_OUTPUT_ENTITY) or self.config.get(CONF_AI_OUTPUT_ENTITY)
+        if output_entity: self.hass.states.async_set(output_entity, advice[:254])
+
+    @property
+    def options_hash(self):
+        """Hash der aktuellen Options, nur bei neuem Options-Objekt neu berechnet."""
+        if self.entry.options is not self._options_ref:
+            self._options_ref = self.entry.options
+            self._options_hash = options_hash(self.entry.options)
+        return self._options_hash
+
+    @property
+    def settings(self):
+        """Akku-Daten und Schwellwerte für die Engine, nur bei neuem Options-Objekt neu gebaut."""
+        key = self.options_hash
+        if self._settings is None or self._settings.key != key:
+            self._settings = EngineSettings.from_entry(self.config, self.entry.options, key)
+        return self._settings
+
+    def _read_input(self, now):
+        """Liest alle Zustände eines Ticks in einen `EngineInput`."""
+        self.frame = frame = self.frame_reader.read(self.hass.states.get, now.timestamp())
+        # Der Frame liest nur eine reine Min-SoC-Sensor-Entität (siehe _min_soc_sensor)
+        user_min_soc = self._option(CONF_MIN_SOC, DEFAULT_MIN_SOC)
+        if frame.min_soc is not None:
+            if self._option(CONF_INVERTER_MIN_SOC_INVERT, False): user_min_soc = 100.0 - frame.min_soc
+            else: user_min_soc = frame.min_soc
+            user_min_soc = max(0.0, user_min_soc)
+
+        pv_peak_dt = frame.pv_peak_time
+        if pv_peak_dt is not None and pv_peak_dt.tzinfo is None:
+            pv_peak_dt = pv_peak_dt.replace(tzinfo=now.tzinfo)
+
+        # PV-Kurve nur neu parsen, wenn sich eine Forecast-Entität geändert hat
+        self.pv_forecast.update([self.hass.states.get(self.config.get(k)) for k in PV_CURVE_SOURCES if self.config.get(k)], now.tzinfo)
+
+        return EngineInput(
+            now=now,
+            timeline=self.timeline,
+            current_price=self.current_api_price,
+            soc=frame.soc,
+            min_soc=user_min_soc,
+            settings=self.settings,
+            house_w=frame.house_w,
+            pv_w=frame.pv_w,
+            avg_house_w=frame.avg_house_w,
+            fc_rem_kwh=frame.fc_rem_kwh,
+            fc_next_kwh=frame.fc_next_kwh,
+            sun_elevation=frame.sun_elevation,
+            weather_factor=frame.weather_factor,
+            pv_peak_time=pv_peak_dt,
+            has_tomorrow=bool(self.prices_tomorrow),
+            session_active=self.charging_session_active,
+            load_profile=self.load_profile,
+            pv_forecast=self.pv_forecast,
+            flags=frame.flags,
+            price_profile=self.price_profile,
         )
 
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={api_key}"
-        headers = {'Content-Type': 'application/json'}
-        data = {"contents": [{"parts": [{"text": prompt_text}]}]}
+    def _track(self, inp, d):
+        """Tracker: Integration über echte Zeitstempel, bewertet mit dem Preis des jeweiligen Slots."""
+        frame = self.frame
+        now, tl, curr_p = inp.now, d.timeline, d.price
+        now_ts = now.timestamp()
+        cur_pv, cur_house = inp.pv_w, inp.house_w
+        pv_w = min(cur_pv, cur_house) if cur_pv > 0 and cur_house > 0 else 0.0
+        _, eur = self.integrators["pv"].update(pv_w, frame.latest("pv_w", "house_w"), now_ts, tl, curr_p)
+        self.trackers.add("pv", eur, now)
+
+        cur_grid = frame.grid_w
+        grid_w = abs(cur_grid) if self.charging_session_active and cur_grid < -50 else 0.0
+        kwh_grid, eur = self.integrators["grid"].update(grid_w, frame.latest("grid_w"), now_ts, tl, curr_p)
+        if kwh_grid:
+             self.charging_session_net_charged_kwh += kwh_grid
+             self.trackers.add("kwh", kwh_grid, now)
+             self.trackers.add("cost", eur, now)
+             self.trackers.add("saved", kwh_grid * self.ref_price - eur, now)
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data, timeout=30) as resp:
-                    if resp.status == 200:
-                        result = await resp.json()
-                        advice = result['candidates'][0]['content']['parts'][0]['text']
-                        advice = advice.replace('\n', ' ').strip()
-                        _LOGGER.info(f"KI-Empfehlung empfangen: {advice}")
-                        self.hass.states.async_set(output_entity, advice[:254])
-                    else:
-                        _LOGGER.error(f"Gemini API Fehler: {resp.status}")
-        except Exception as e:
-            _LOGGER.error(f"KI Request Fehler: {e}")
+        bat_w = frame.battery_w if frame.battery_w > 50 else 0.0
+        _, eur = self.integrators["discharge"].update(bat_w, frame.latest("battery_w"), now_ts, tl, curr_p)
+        self.trackers.add("discharge", eur, now)
 
     async def run_logic(self):
-        batt_cap = self.config.get(CONF_BATTERY_CAPACITY)
-        charge_power = self.config.get(CONF_CHARGER_POWER, 3.0) 
-        
-        cur_soc = self._get_float(self.config.get(CONF_SOC_SENSOR))
-        cur_grid = self._get_float(self.config.get(CONF_GRID_POWER))
-        cur_house = self._get_float(self.config.get(CONF_HOUSE_POWER), default=0.0)
-        cur_pv = self._get_float(self.config.get(CONF_PV_POWER), default=0.0)
-        avg_house = self._get_float(self.config.get(CONF_AVG_CONSUMPTION), default=500.0)
-        
-        opts = self.entry.options
-        target_soc = opts.get(CONF_TARGET_SOC, DEFAULT_TARGET_SOC)
-        default_min_soc = opts.get(CONF_MIN_SOC, DEFAULT_MIN_SOC)
-        
-        inv_limit_entity = opts.get(CONF_INVERTER_MIN_SOC_ENTITY)
-        inv_invert_logic = opts.get(CONF_INVERTER_MIN_SOC_INVERT, False)
-        user_min_soc = default_min_soc 
-        if inv_limit_entity:
-            live_limit = self._get_float(inv_limit_entity, default=None)
-            if live_limit is not None:
-                if inv_invert_logic: user_min_soc = 100.0 - live_limit
-                else: user_min_soc = live_limit
-                user_min_soc = max(0.0, user_min_soc)
-
-        fc_rem = self._get_float(self.config.get(CONF_PV_FC_REM), default=0.0)
-        fc_next = self._get_float(self.config.get(CONF_PV_FC_NEXT), default=0.0)
-        
-        sun_id = self.config.get(CONF_SUN_SENSOR)
-        sun_elevation = 0
-        if sun_id:
-            try: sun_elevation = float(self.hass.states.get(sun_id).attributes.get('elevation', 0))
-            except: pass
-        
-        weather_id = self.config.get(CONF_WEATHER_SENSOR)
-        weather_factor = 0.5
-        if weather_id:
-            w_state = self.hass.states.get(weather_id)
-            if w_state and w_state.state in WEATHER_PV_FACTOR:
-                weather_factor = WEATHER_PV_FACTOR[w_state.state]
-
-        pv_peak_id = self.config.get(CONF_PV_PEAK_TIME)
-        approaching_peak = False
+        """Adapter um `Engine.decide`: Zustände lesen, entscheiden, Entscheidung umsetzen."""
+        t_start = perf_counter()
         now = dt_util.now()
-        
-        if pv_peak_id:
-            pv_peak_state = self.hass.states.get(pv_peak_id)
-            if pv_peak_state and pv_peak_state.state not in [STATE_UNAVAILABLE, STATE_UNKNOWN]:
-                try:
-                    pv_peak_dt = datetime.fromisoformat(pv_peak_state.state)
-                    if pv_peak_dt.tzinfo is None:
-                        pv_peak_dt = pv_peak_dt.replace(tzinfo=now.tzinfo)
-                    
-                    diff_min = (pv_peak_dt - now).total_seconds() / 60
-                    if -30 < diff_min < 90:
-                        approaching_peak = True
-                except: pass
-
-        is_daylight = sun_elevation > 0
-        forecast_strong = fc_next > 0.1
-        pv_active = cur_pv > 50
-        
-        is_sun_shining = False
-        if pv_active: is_sun_shining = True
-        elif is_daylight and weather_factor >= 0.4 and forecast_strong: is_sun_shining = True
-        elif approaching_peak: is_sun_shining = True
-
-        prices_all = []
-        for p in self.prices_today + self.prices_tomorrow:
-            dt = datetime.fromisoformat(p['startsAt']).astimezone(now.tzinfo)
-            prices_all.append({'time': dt, 'price': p['total']})
-        future_prices = [p for p in prices_all if p['time'] >= now.replace(minute=0, second=0, microsecond=0)]
-        
-        if not future_prices:
-            self.status_message = "Keine Preise"
-            return
-            
-        curr_p = self.current_api_price
-        max_item = max(future_prices, key=lambda x: x['price'])
-        self.peak_price = max_item['price']
-        self.peak_time = max_item['time']
-
-        if cur_pv > 0 and cur_house > 0: self.tracker_pv_savings += ((min(cur_pv, cur_house) / 1000) / 60) * curr_p
-        if self.charging_session_active and cur_grid < -50:
-             kwh_grid = (abs(cur_grid) / 1000) / 60
-             self.charging_session_net_charged_kwh += kwh_grid
-             self.tracker_charged_kwh += kwh_grid
-             self.tracker_cost_total += kwh_grid * curr_p
-             self.tracker_savings_total += kwh_grid * (self.ref_price - curr_p)
-        cur_bat_pwr = self._get_float(self.config.get(CONF_BATTERY_POWER))
-        if cur_bat_pwr > 50: self.tracker_discharge_savings += ((cur_bat_pwr / 1000) / 60) * curr_p
-
-        new_mode = "general"
-        msg = "Standardbetrieb"
-        panic_mode = False
-        
-        if self.peak_time:
-            hours_to_peak = (self.peak_time - now).total_seconds() / 3600
-            if 0 < hours_to_peak < 1.5 and cur_soc < (user_min_soc + 5.0):
-                panic_mode = True
-        
-        base_spread = opts.get(CONF_MIN_SPREAD, DEFAULT_MIN_SPREAD)
-        soc_med = opts.get(CONF_SOC_MED, DEFAULT_SOC_MED)
-        spread_med = opts.get(CONF_SPREAD_MED, DEFAULT_SPREAD_MED)
-        soc_high = opts.get(CONF_SOC_HIGH, DEFAULT_SOC_HIGH)
-        spread_high = opts.get(CONF_SPREAD_HIGH, DEFAULT_SPREAD_HIGH)
-        
-        eff_spread = base_spread
-        if cur_soc > soc_high: eff_spread = max(eff_spread, spread_high)
-        elif cur_soc > soc_med: eff_spread = max(eff_spread, spread_med)
-        
-        price_spread = self.peak_price - curr_p
-        should_hold = (price_spread >= eff_spread)
-        
-        target_effective_min_soc = user_min_soc
-        sleep_over_active = False
-        morning_diff = opts.get(CONF_MORNING_DIFF, DEFAULT_MORNING_DIFF)
-        sleep_soc = opts.get(CONF_SLEEP_SOC, DEFAULT_SLEEP_SOC)
-        
-        if now.hour >= 18 and self.prices_tomorrow:
-            morning_prices = [p for p in prices_all if p['time'].date() == (now.date() + timedelta(days=1)) and 5 <= p['time'].hour <= 9]
-            if morning_prices:
-                morning_peak = max(morning_prices, key=lambda x: x['price'])['price']
-                if (morning_peak - curr_p) > morning_diff:
-                    target_effective_min_soc = sleep_soc
-                    sleep_over_active = True
-                    today_str = now.strftime('%Y-%m-%d')
-                    if self.last_sleep_over_notified_date != today_str:
-                        await self._send_push("Sleep-Over 🌙", f"Reserviere {target_effective_min_soc}% Akku.")
-                        self.last_sleep_over_notified_date = today_str
-
-        await self._set_inverter_limit(target_effective_min_soc)
-        await self._set_inverter_max_limit(target_soc)
-
-        effective_min_soc = target_effective_min_soc
-
-        deadline = self.peak_time if (self.peak_price > 0.30 and self.peak_time > now) else datetime.combine(now.date(), time(23, 59)).astimezone(now.tzinfo)
-        pool = sorted([x for x in future_prices if x['time'] < deadline], key=lambda x: x['price'])
-        
-        first_slot_dt = pool[0]['time'] if pool else now
-        time_until_slot = (first_slot_dt - now).total_seconds() / 3600
-        calc_load = avg_house
-        if time_until_slot <= 1.0 and cur_house > 0: calc_load = (cur_house * 0.7) + (avg_house * 0.3)
-        calc_load = max(200.0, min(1500.0, calc_load))
-        consumption_until = (calc_load / 1000) * max(0, time_until_slot)
-        soc_need_kwh = max(0.0, (target_soc - cur_soc) / 100 * batt_cap)
-        pv_deduction = fc_rem * opts.get(CONF_PV_SAFETY_FACTOR, DEFAULT_PV_SAFETY)
-        needed_kwh = (consumption_until + soc_need_kwh) - pv_deduction
-        needed_kwh = max(0.0, min(needed_kwh, batt_cap))
-        
-        slots_needed_count = 0
-        if charge_power > 0 and needed_kwh > 0:
-            slots_needed_count = min(math.ceil(needed_kwh / charge_power * 4), 16)
-        
-        cheap_slots = []
-        if slots_needed_count > 0 and len(pool) >= slots_needed_count:
-            cheap_slots = sorted(pool[:slots_needed_count], key=lambda x: x['time'])
-            start_str = cheap_slots[0]['time'].strftime('%H:%M')
-            end_dt = cheap_slots[-1]['time'] + timedelta(minutes=15)
-            end_str = end_dt.strftime('%H:%M')
-            avg_p = sum(x['price'] for x in cheap_slots) / len(cheap_slots)
-            self.slots_info = f"{len(cheap_slots)}x 15min ({start_str}...{end_str}) Ø {avg_p:.3f} €"
-            self.next_charge_time = cheap_slots[0]['time']
-        else:
-            self.slots_info = "Keine Slots nötig"
-            self.next_charge_time = None
+        inp = self._read_input(now)
 
-        is_cheap_now = any(t['time'].hour == now.hour and (t['time'].minute // 15) == (now.minute // 15) for t in cheap_slots)
-        
-        if panic_mode:
-            new_mode = "eco_charge"
-            msg = f"PANIK! SoC < {user_min_soc+5}%. Peak bald."
-            if not self.charging_session_active:
-                 self.charging_session_active = True
-                 self.charging_session_net_charged_kwh = 0.0
-
-        elif (curr_p > 0.30 or (price_spread < eff_spread and not is_cheap_now)):
-            if is_sun_shining:
-                new_mode = "general"
-                msg = "Warten (PV/Peak erwartet)."
-            elif should_hold and curr_p > 0.30:
-                new_mode = "general"
-                msg = f"Warten (Peak erwartet: {self.peak_price:.3f}€)"
-            else:
-                if cur_soc > effective_min_soc:
-                    new_mode = "general"
-                    msg = f"Entladen (Preis: {curr_p:.3f}€)"
-                    if price_spread < eff_spread: msg = "Entladen (Spread zu klein)."
-                else:
-                    new_mode = "general"
-                    msg = f"Reserve erreicht ({effective_min_soc}%)."
-
-        elif is_cheap_now and cur_soc < target_soc and needed_kwh > 0.1:
-            new_mode = "eco_charge"
-            msg = f"Laden bis {target_soc}% ({curr_p:.3f}€)"
-            if not self.charging_session_active:
-                self.charging_session_active = True
-                self.charging_session_net_charged_kwh = 0.0
-                await self._send_push("Smart Charge Start 🔋", f"Preis: {curr_p:.3f}€")
+        # Lastprofil lernen (O(1) pro Messwert, gespeichert mit den Trackern)
+        if self.config.get(CONF_HOUSE_POWER) and inp.house_w > 0:
+            if self.load_profile.add(inp.house_w, now): self.trackers.touch()
 
-        else:
-            new_mode = "general"
-            msg = "Warten (Standardbetrieb)."
-            if sleep_over_active: msg = f"Warten (Sleep-Over {effective_min_soc}%)"
-            elif should_hold: msg = "Warten (Spread/Hold)"
-            elif is_sun_shining: msg = "Warten (PV/Peak erwartet)"
-            
-            if self.charging_session_active:
-                self.charging_session_active = False
-                if self.charging_session_net_charged_kwh > 0.5:
-                     await self._send_push("Smart Charge Ende ✅", f"Geladen: {self.charging_session_net_charged_kwh:.2f} kWh")
-
-        self.status_message = msg
-        await self._set_inverter_mode(new_mode)
\ No newline at end of file
+        t_plan = perf_counter()
+        self.stats.record("state_read", (t_plan - t_start) * 1000)
+
+        d = self.engine.decide(inp)
+        self.decision_price_source, self.low_confidence = d.price_source, d.low_confidence
+        if d.safe and not self.safe_mode: await self._send_push("Sicherheitsmodus ⚠️", d.message)
+        self.safe_mode = d.safe
+        if d.mode is None:
+            self.status_message = d.message
+            return
+
+        self.peak_price = d.peak_price
+        self.peak_time = d.peak_time
+        self.slots_info = d.slots_info
+        self.next_charge_time = d.next_charge_time
+        self.plan = d.plan
+        if d.timeline is not None:
+            self._track(inp, d)
+            self._update_plan_columns(d.timeline, d.start_idx, d.cheap_slots, d.pv_curve, inp.settings.pv_safety)
+
+        if d.sleep_over:
+            today_str = now.strftime('%Y-%m-%d')
+            if self.last_sleep_over_notified_date != today_str:
+                await self._send_push("Sleep-Over 🌙", f"Reserviere {d.min_soc_limit}% Akku.")
+                self.last_sleep_over_notified_date = today_str
+        self._set_inverter_limit(d.min_soc_limit)
+        self._set_inverter_max_limit(d.max_soc_limit)
+
+        if d.session == "start":
+            self.charging_session_active = True
+            self.charging_session_net_charged_kwh = 0.0
+            if not d.panic: await self._send_push("Smart Charge Start 🔋", f"Preis: {d.price:.3f}€")
+        elif d.session == "stop":
+            self.charging_session_active = False
+            if self.charging_session_net_charged_kwh > 0.5:
+                 await self._send_push("Smart Charge Ende ✅", f"Geladen: {self.charging_session_net_charged_kwh:.2f} kWh")
+
+        self.status_message = d.message
+        self._set_inverter_mode(d.mode)
+        self.stats.record("planning", (perf_counter() - t_plan) * 1000)
+        self.dispatcher.schedule(now.timestamp())
@@ -0,0 +1,239 @@
+"""Optimaler Lade-Planer (Dynamische Programmierung über SoC × Slots)."""
+import math
+from array import array
+from operator import sub
+
+ACTION_DISCHARGE = 0   # Normalbetrieb: Akku deckt den Hausverbrauch
+ACTION_HOLD = 1        # Akku halten, Haus läuft über das Netz
+ACTION_CHARGE = 2      # Zwangsladung aus dem Netz
+
+ACTION_NAMES = ("discharge", "hold", "charge")
+SOC_LEVELS = 101
+# Kostenunterschied (€), unter dem Entladen dem Halten vorgezogen wird (Rundungsrauschen)
+TIE_EUR = 1e-6
+
+
+class ChargePlan:
+    """Ergebnis des Planers: Aktion und erwarteter SoC pro Slot."""
+
+    __slots__ = ("start", "actions", "soc", "grid_kwh", "cost", "soc_start")
+
+    def __init__(self, start, actions, soc, grid_kwh, cost, soc_start=None):
+        self.start = start          # Timeline-Index des ersten Slots
+        self.actions = actions      # Aktion je Slot
+        self.soc = soc              # SoC (%) am Ende jedes Slots
+        self.grid_kwh = grid_kwh    # Netzbezug je Slot
+        self.cost = cost            # Erwartete Kosten über den Horizont (ab Planung)
+        self.soc_start = soc_start  # SoC (%) zu Beginn des ersten Slots
+
+    def action_at(self, idx):
+        i = idx - self.start
+        if 0 <= i < len(self.actions): return self.actions[i]
+        return None
+
+    def expected_soc(self, idx, progress=0.0):
+        """Geplanter SoC in Slot `idx`, linear über den Slot interpoliert."""
+        i = idx - self.start
+        if not 0 <= i < len(self.soc): return None
+        before = self.soc[i - 1] if i else self.soc_start
+        if before is None: before = self.soc[i]
+        return before + (self.soc[i] - before) * progress
+
+    def advance(self, idx):
+        """Derselbe Plan ab Slot `idx` (bereits vergangene Slots entfernt)."""
+        i = idx - self.start
+        if i <= 0: return self
+        return ChargePlan(idx, self.actions[i:], self.soc[i:], self.grid_kwh[i:], self.cost, self.soc[i - 1])
+
+    def charge_slots(self):
+        """Timeline-Indizes aller geplanten Ladeslots."""
+        return [self.start + i for i, a in enumerate(self.actions) if a == ACTION_CHARGE]
+
+
+def _interp(value, level):
+    """Wert an der (gebrochenen) Stelle `level`, linear zwischen den Levels."""
+    i = int(level)
+    f = level - i
+    if f < 1e-9: return value[i]
+    return value[i] + (value[i + 1] - value[i]) * f
+
+
+def _interp_run(value, first, count):
+    """`_interp` für die Stellen first, first + 1, … (count Werte); `value` endet mit einem Füllwert."""
+    if count <= 0: return []
+    i = int(first)
+    f = first - i
+    if f > 1 - 1e-9: i, f = i + 1, 0.0
+    if f < 1e-9: return value[i:i + count]
+    return [a + (b - a) * f for a, b in zip(value[i:i + count], value[i + 1:i + 1 + count])]
+
+
+def _lower(best, at, value, worth, first, add):
+    """best[at:] elementweise auf add + _interp(value, first + k) senken, wo das günstiger ist.
+
+    Interpolation, Aufschlag und Minimum in einem Durchlauf; `worth[i]` = value[i] - value[i + 1].
+    """
+    i = int(first)
+    f = first - i
+    if f > 1 - 1e-9: i, f = i + 1, 0.0
+    if f < 1e-9:
+        best[at:] = [c if (c := add + a) < v else v for v, a in zip(best[at:], value[i:])]
+    else:
+        best[at:] = [c if (c := add + a - w * f) < v else v for v, a, w in zip(best[at:], value[i:], worth[i:])]
+
+
+def _step(level, price, net_kwh, value, lvl_kwh, min_lvl, max_lvl, charge_lvls, efficiency, min_profit):
+    """Beste (Aktion, neuer Level, Netzbezug) ab dem (gebrochenen) `level`.
+
+    Dieselben Kosten wie in der Rückwärts-Induktion; der SoC bleibt kontinuierlich,
+    ein Rest unter einem Level wird nicht gerundet, sondern anteilig verbucht.
+    """
+    top = SOC_LEVELS - 1
+    demand = net_kwh if net_kwh > 0 else 0.0
+    # PV-Überschuss lädt in jedem Modus (bis 100 %)
+    pv_lvl = min(top, level - net_kwh * efficiency / lvl_kwh) if net_kwh < 0 else level
+    # Halten
+    best = demand * price + _interp(value, pv_lvl)
+    out = (ACTION_HOLD, pv_lvl, demand)
+    # Entladen bis zur Untergrenze, der Rest kommt aus dem Netz
+    if demand > 0 and pv_lvl > min_lvl:
+        used = min(demand, (pv_lvl - min_lvl) * lvl_kwh)
+        nxt = max(float(min_lvl), pv_lvl - used / lvl_kwh)
+        cost = (demand - used) * price + _interp(value, nxt)
+        # Gleichstand (z. B. gleiche Preise) zugunsten des Normalbetriebs
+        if cost <= best + TIE_EUR: best, out = cost, (ACTION_DISCHARGE, nxt, demand - used)
+    elif demand == 0:
+        out = (ACTION_DISCHARGE, pv_lvl, 0.0)
+    # Laden bis zum Ziel-SoC
+    if pv_lvl < max_lvl and charge_lvls > 0:
+        add = min(charge_lvls, max_lvl - pv_lvl)
+        bought = add * lvl_kwh / efficiency
+        cost = demand * price + bought * (price + min_profit) + _interp(value, pv_lvl + add)
+        if cost < best: out = (ACTION_CHARGE, pv_lvl + add, demand + bought)
+    return out
+
+
+class Policy:
+    """Ergebnis der Rückwärts-Induktion: Restkosten je Slot und SoC-Level.
+
+    Hängt nicht vom aktuellen SoC ab; `plan` ist nur die billige Vorwärts-Simulation.
+    Akkus mit gleichen Eingaben können sich deshalb eine Policy teilen. Der Bedarf des
+    ersten Slots fließt nur in die Vorwärts-Simulation ein (values[0] gilt ab seinem Ende).
+    """
+
+    __slots__ = ("start", "prices", "net_kwh", "values", "lvl_kwh", "min_lvl", "max_lvl", "charge_lvls", "efficiency", "min_profit")
+
+    def __init__(self, start, prices, net_kwh, values, lvl_kwh, min_lvl, max_lvl, charge_lvls, efficiency, min_profit):
+        self.start = start
+        self.prices = prices
+        self.net_kwh = net_kwh
+        # values[t]: Restkosten je Level am Ende von Slot t (bis auf eine Konstante je Slot)
+        self.values = values
+        self.lvl_kwh = lvl_kwh
+        self.min_lvl = min_lvl
+        self.max_lvl = max_lvl
+        self.charge_lvls = charge_lvls
+        self.efficiency = efficiency
+        self.min_profit = min_profit
+
+    def plan(self, soc_pct, first_net=None):
+        """Vorwärts-Simulation ab `soc_pct`; `first_net` ersetzt den Netto-Bedarf des ersten Slots."""
+        actions, soc, grid_kwh = [], [], []
+        level = max(0.0, min(SOC_LEVELS - 1.0, float(soc_pct)))
+        cost = 0.0
+        net_kwh = self.net_kwh
+        if first_net is not None and net_kwh: net_kwh = [first_net] + net_kwh[1:]
+        for t, net in enumerate(net_kwh):
+            action, level, grid = _step(level, self.prices[t], net, self.values[t], self.lvl_kwh, self.min_lvl,
+                                        self.max_lvl, self.charge_lvls, self.efficiency, self.min_profit)
+            actions.append(action)
+            grid_kwh.append(grid)
+            cost += grid * self.prices[t]
+            soc.append(round(level, 2))
+        return ChargePlan(self.start, actions, soc, grid_kwh, cost, soc_pct)
+
+
+def solve(prices, load_kwh, pv_kwh, slot_hours, capacity_kwh, charge_kw, soc_pct,
+          min_soc_pct, target_soc_pct, efficiency=0.9, min_profit=0.0, start=0):
+    """Plant den gesamten Horizont kostenminimal ab `soc_pct` (siehe solve_policy)."""
+    if not prices or capacity_kwh <= 0: return ChargePlan(start, [], [], [], 0.0, soc_pct)
+    return solve_policy(
+        prices, load_kwh, pv_kwh, slot_hours, capacity_kwh, charge_kw,
+        min_soc_pct, target_soc_pct, efficiency, min_profit, start,
+    ).plan(soc_pct)
+
+
+def solve_policy(prices, load_kwh, pv_kwh, slot_hours, capacity_kwh, charge_kw,
+                 min_soc_pct, target_soc_pct, efficiency=0.9, min_profit=0.0, start=0):
+    """Rückwärts-Induktion über den ganzen Horizont.
+
+    Die Kosten sind der Netzbezug zum Slotpreis plus `min_profit` pro geladener kWh
+    (damit nur Zyklen mit ausreichender Marge entstehen). Restenergie am Horizontende
+    wird mit dem Medianpreis × Effizienz gutgeschrieben, sonst würde der Planer
+    den Akku zum Ende hin grundlos leeren.
+
+    Zwischen den 101 Levels wird linear interpoliert: Ein Slot mit weniger
+    Verbrauch als einem Level (z. B. 75 Wh bei 10 kWh) entlädt sonst gar nicht
+    oder ein ganzes Level zu viel. Pro Slot entstehen nur Kostenlisten je Aktion,
+    die elementweise minimiert werden.
+    """
+    n = len(prices)
+    efficiency = max(0.01, min(1.0, efficiency))
+    top = SOC_LEVELS - 1
+    lvl_kwh = max(capacity_kwh, 0.01) / top
+    min_lvl = max(0, min(top, int(round(min_soc_pct))))
+    max_lvl = max(min_lvl, min(top, int(round(target_soc_pct))))
+    charge_lvls = max(0.0, charge_kw * slot_hours * efficiency / lvl_kwh)
+    net_kwh = [load_kwh[t] - pv_kwh[t] for t in range(n)]
+    if n == 0: return Policy(start, [], [], [], lvl_kwh, min_lvl, max_lvl, charge_lvls, efficiency, min_profit)
+
+    ordered = sorted(prices)
+    terminal = ordered[n // 2] * efficiency * lvl_kwh
+    value = [-terminal * s for s in range(SOC_LEVELS)]
+    values = [None] * n
+
+    for t in range(n - 1, -1, -1):
+        values[t] = array("d", value)
+        price = prices[t]
+        net = net_kwh[t]
+        padded = value + value[-1:]
+        unit = lvl_kwh / efficiency * (price + min_profit)
+        # Der Netzbezug beim Halten (net × Preis) ist für alle Levels gleich und bleibt weg:
+        # Die Werte einer Stufe gelten nur bis auf eine Konstante, Entscheidungen ändert das nicht
+        if net >= 0:
+            base = 0.0
+            best = list(value)
+        else:
+            # PV-Überschuss verschiebt alle Levels um `base` nach oben (gekappt bei 100 %)
+            base = -net * efficiency / lvl_kwh
+            below = int(top - base) + 1 if base < top else 0
+            best = _interp_run(padded, base, below) + [value[top]] * (SOC_LEVELS - below)
+        # Wert eines Levels in der Folgestufe: Laden lohnt nur, wo er den Kaufpreis übersteigt,
+        # Entladen nur, wo er unter dem Netzpreis liegt (sonst kann keine Aktion das Halten schlagen)
+        worth = list(map(sub, value, value[1:]))
+        # Entladen: voll aus dem Akku, knapp über der Untergrenze teilweise aus dem Netz
+        if net > 0 and min_lvl < top and min(worth) < lvl_kwh * price:
+            shift = net / lvl_kwh
+            full = min(SOC_LEVELS, math.ceil(min_lvl + shift))
+            floor_value = value[min_lvl]
+            for s in range(min_lvl + 1, full):
+                cost = floor_value - (s - min_lvl) * lvl_kwh * price
+                if cost < best[s]: best[s] = cost
+            if full < SOC_LEVELS: _lower(best, full, value, worth, full - shift, -net * price)
+        # Laden: volle Leistung oder nur bis zum Ziel-SoC
+        if charge_lvls > 0 and base < max_lvl and max(worth) > unit:
+            room = max_lvl - base
+            limit = room - charge_lvls
+            full = int(limit) + 1 if limit >= 0 else 0
+            capped = min(SOC_LEVELS, math.ceil(room))
+            cap_value = value[max_lvl]
+            for s in range(full, capped):
+                cost = (room - s) * unit + cap_value
+                if cost < best[s]: best[s] = cost
+            if full:
+                head = best[:full]
+                _lower(head, 0, value, worth, base + charge_lvls, charge_lvls * unit)
+                best[:full] = head
+        value = best
+
+    return Policy(start, list(prices), net_kwh, values, lvl_kwh, min_lvl, max_lvl, charge_lvls, efficiency, min_profit)
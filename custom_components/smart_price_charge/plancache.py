@@ -0,0 +1,151 @@
+"""Zwischenspeicher für Ladepläne mit Schwellwerten gegen Eingangsrauschen."""
+import hashlib
+import json
+from collections import OrderedDict
+
+# Abweichung vom geplanten SoC-Verlauf, ab der neu geplant wird (%)
+SOC_DRIFT = 5.0
+# Quantisierung von Energiemengen im Fingerprint (kWh)
+ENERGY_STEP = 0.25
+# Quantisierung der Kurzfrist-Last im Fingerprint (W)
+LOAD_STEP = 100.0
+# Änderung des Ladebedarfs, ab der die Greedy-Auswahl neu berechnet wird (kWh)
+NEED_HYSTERESIS = 0.5
+# Spätestens nach dieser Zeit neu planen (Sekunden)
+MAX_AGE = 3600
+# Quantisierung von Last und PV pro Slot im Policy-Schlüssel (kWh)
+SLOT_ENERGY_STEP = 0.05
+# Gespeicherte Policies pro Manager (im Flottenbetrieb gemeinsam, siehe fleet.py)
+POLICY_CACHE_SIZE = 4
+
+
+def options_hash(options):
+    """Kurzer, stabiler Hash der Options (Reihenfolge egal)."""
+    return hashlib.sha1(json.dumps(dict(options), sort_keys=True, default=str).encode()).hexdigest()[:10]
+
+
+def quantise(value, step):
+    return int(round(value / step))
+
+
+class PlanCache:
+    """Hält den letzten DP-Plan und schiebt ihn Slot für Slot weiter, solange die Eingaben passen.
+
+    Der Fingerprint enthält nur Versionen und quantisierte Werte; der SoC wird
+    gegen den geplanten Verlauf geprüft, damit das Abfahren des Plans selbst
+    keine Neuplanung auslöst.
+    """
+
+    __slots__ = ("plan", "fingerprint", "created", "hits", "misses", "reason")
+
+    def __init__(self):
+        self.plan = None
+        self.fingerprint = None
+        self.created = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.reason = None
+
+    def lookup(self, fingerprint, start, soc, now_ts, progress=0.0):
+        """Gültiger Plan ab Slot `start` oder None (Grund in `reason`).
+
+        `progress` ist der bereits vergangene Anteil (0..1) des laufenden Slots.
+        """
+        plan = self.plan
+        if plan is None: reason = "empty"
+        elif fingerprint != self.fingerprint: reason = "inputs"
+        elif not plan.start <= start < plan.start + len(plan.actions): reason = "horizon"
+        elif now_ts - self.created > MAX_AGE: reason = "age"
+        elif abs(plan.expected_soc(start, progress) - soc) > SOC_DRIFT: reason = "soc"
+        else:
+            self.hits += 1
+            if start > plan.start: self.plan = plan = plan.advance(start)
+            return plan
+        self.misses += 1
+        self.reason = reason
+        return None
+
+    def store(self, plan, fingerprint, now_ts):
+        self.plan = plan
+        self.fingerprint = fingerprint
+        self.created = now_ts
+        return plan
+
+    def invalidate(self):
+        self.plan = None
+        self.fingerprint = None
+
+    def as_dict(self):
+        return {"hits": self.hits, "misses": self.misses, "last_miss": self.reason}
+
+
+class PolicyCache:
+    """LRU-Speicher für DP-Policies, Schlüssel = alle Eingaben außer dem SoC.
+
+    Ein Plan-Miss wegen SoC-Abweichung braucht so nur die Vorwärts-Simulation,
+    und Akkus mit gleichen Eingaben teilen sich eine Rückwärts-Induktion.
+    """
+
+    __slots__ = ("size", "_items", "hits", "misses")
+
+    def __init__(self, size=POLICY_CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(grid, params, load_kwh, pv_kwh):
+        """`grid` identifiziert Preise und Raster, `params` die Akku-Parameter, Last und PV in kWh pro Slot."""
+        return (grid, params, tuple(quantise(v, SLOT_ENERGY_STEP) for v in load_kwh), tuple(quantise(v, SLOT_ENERGY_STEP) for v in pv_kwh))
+
+    def get(self, key):
+        policy = self._items.get(key)
+        if policy is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(key)
+        return policy
+
+    def put(self, key, policy):
+        self._items[key] = policy
+        while len(self._items) > self.size: self._items.popitem(last=False)
+        return policy
+
+    def clear(self):
+        self._items.clear()
+
+    def as_dict(self):
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+class SelectionCache:
+    """Greedy-Auswahl der günstigsten Slots mit Hysterese auf den Ladebedarf."""
+
+    __slots__ = ("slots", "fingerprint", "need", "hits", "misses")
+
+    def __init__(self):
+        self.slots = None
+        self.fingerprint = None
+        self.need = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, fingerprint, need_kwh, start):
+        if self.slots is not None and fingerprint == self.fingerprint and abs(need_kwh - self.need) < NEED_HYSTERESIS:
+            remaining = [i for i in self.slots if i >= start]
+            if remaining or need_kwh < NEED_HYSTERESIS:
+                self.hits += 1
+                return remaining
+        self.misses += 1
+        return None
+
+    def store(self, slots, fingerprint, need_kwh):
+        self.slots = slots
+        self.fingerprint = fingerprint
+        self.need = need_kwh
+        return slots
+
+    def invalidate(self):
+        self.slots = None
@@ -0,0 +1,58 @@
+"""Kompakte, spaltenweise Darstellung des Ladeplans für Sensor-Attribute und Websocket."""
+from .optimizer import ACTION_CHARGE, ACTION_DISCHARGE, ACTION_HOLD
+
+# Ein Zeichen pro Slot: c = Laden, h = Halten, d = Normalbetrieb/Entladen
+ACTION_CODES = {ACTION_DISCHARGE: "d", ACTION_HOLD: "h", ACTION_CHARGE: "c"}
+COLUMNS = ("price", "soc", "pv_kwh")
+
+
+def build_columns(tl, start, charge_slots, plan=None, pv_kwh=None):
+    """Plan ab Slot `start` als Spalten; ohne DP-Plan nur Laden/Normalbetrieb und kein SoC."""
+    n = len(tl) - start
+    if plan is not None:
+        offset = max(0, start - plan.start)
+        actions = "".join(ACTION_CODES[a] for a in plan.actions[offset:])
+        soc = [round(v) for v in plan.soc[offset:]]
+    else:
+        charge = set(charge_slots)
+        actions = "".join("c" if start + i in charge else "d" for i in range(n))
+        soc = None
+    return {
+        "start": tl.time(start).isoformat() if n > 0 else None,
+        "start_ts": tl.starts[start] if n > 0 else None,
+        "slot_minutes": tl.slot_minutes,
+        "actions": actions,
+        "price": [round(p, 4) for p in tl.prices[start:]],
+        "soc": soc,
+        "pv_kwh": [round(v, 3) for v in pv_kwh[:n]] if pv_kwh else None,
+    }
+
+
+def diff_columns(old, new):
+    """Änderungen von `old` nach `new`; None, wenn sich nichts geändert hat.
+
+    `shift` = Anzahl vorne weggefallener Slots, danach werden alle Spalten auf
+    `length` gekürzt bzw. verlängert, die Einträge aus `changes` ([Index, Wert])
+    gesetzt und Spalten aus `replace` komplett ersetzt.
+    Passt der neue Plan nicht zum alten Raster, wird der komplette Plan gesendet.
+    """
+    if old is None or old["start_ts"] is None or new["start_ts"] is None or old["slot_minutes"] != new["slot_minutes"]:
+        return {"full": new}
+    shift, rest = divmod(new["start_ts"] - old["start_ts"], new["slot_minutes"] * 60)
+    if shift < 0 or rest: return {"full": new}
+    shift = int(shift)
+
+    changes, replace = {}, {}
+    for col in ("actions",) + COLUMNS:
+        before, after = old[col], new[col]
+        if before is None or after is None:
+            if before != after: replace[col] = after
+            continue
+        before = before[shift:]
+        delta = [[i, v] for i, v in enumerate(after) if i >= len(before) or before[i] != v]
+        if delta: changes[col] = delta
+    if not changes and not replace and not shift and len(old["actions"]) == len(new["actions"]): return None
+    return {
+        "shift": shift, "start": new["start"], "start_ts": new["start_ts"],
+        "length": len(new["actions"]), "changes": changes, "replace": replace,
+    }
@@ -0,0 +1,335 @@
+"""Preisquellen für SmartPriceCharge: gemeinsamer Cache und lokale Backends."""
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from io import StringIO
+
+import aiohttp
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
+import homeassistant.util.dt as dt_util
+
+from .const import DOMAIN
+from .timeline import PriceTimeline
+
+_LOGGER = logging.getLogger(__name__)
+
+# Ein Preis-Dienst pro Quelle, geteilt von allen Config-Entries
+DATA_PRICE_SERVICES = f"{DOMAIN}_price_services"
+STORAGE_VERSION = 1
+
+# Day-Ahead-Preise für morgen erscheinen gegen 13:00 Uhr
+PUBLISH_HOUR = 13
+# Verteilung der Abrufe über die Flotte (Sekunden)
+PUBLISH_JITTER = 900
+RETRY_INTERVAL = 900
+RETRY_JITTER = 300
+# Exponentieller Backoff bei Fehlern (Sekunden)
+BACKOFF_BASE = 60
+BACKOFF_MAX = 3600
+REQUEST_TIMEOUT = 20
+
+# Übliche Feldnamen von Preis-Listen (Tibber, Nordpool, EPEX Spot, eigene Formate)
+START_KEYS = ("startsAt", "start", "start_time", "time", "datetime", "from")
+PRICE_KEYS = ("total", "price", "value", "price_per_kwh", "price_eur_per_kwh")
+EMPTY_HOME = {"name": None, "today": [], "tomorrow": []}
+
+
+def _slot_date(slot):
+    return dt_util.as_local(datetime.fromisoformat(slot['startsAt'])).date()
+
+
+def hash_key(value):
+    # Schlüssel (Token, URL) landen nicht im Klartext im Dateinamen
+    return hashlib.sha256((value or "").encode()).hexdigest()[:12]
+
+
+def async_get_shared(hass, key, factory):
+    """Gemeinsamer Preis-Dienst für `key`, wird bei Bedarf über `factory` angelegt."""
+    services = hass.data.setdefault(DATA_PRICE_SERVICES, {})
+    service = services.get(key)
+    if service is None:
+        service = services[key] = factory()
+        service.key = key
+    return service
+
+
+def normalize_slots(entries, scale=1.0):
+    """Wandelt beliebige Preis-Listen in Tibber-artige Slots {startsAt, total} um."""
+    slots = []
+    for e in entries or []:
+        if not isinstance(e, dict): continue
+        start = next((e[k] for k in START_KEYS if e.get(k) is not None), None)
+        price = next((e[k] for k in PRICE_KEYS if e.get(k) is not None), None)
+        if start is None or price is None: continue
+        if isinstance(start, datetime): start = start.isoformat()
+        try:
+            start_dt = dt_util.parse_datetime(str(start))
+            if start_dt is None: continue
+            if start_dt.tzinfo is None: start_dt = start_dt.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+            slots.append({"startsAt": start_dt.isoformat(), "total": float(price) * scale})
+        except (TypeError, ValueError):
+            continue
+    return slots
+
+
+def split_days(slots, now):
+    """Teilt eine durchgehende Liste in heute/morgen (lokale Kalendertage)."""
+    today, tomorrow = now.date(), now.date() + timedelta(days=1)
+    return (
+        [s for s in slots if _slot_date(s) == today],
+        [s for s in slots if _slot_date(s) == tomorrow],
+    )
+
+
+class PriceService:
+    """Gemeinsamer Preis-Cache: heute/morgen pro Home, Roll-over, Backoff und Verteilung.
+
+    Backends implementieren nur `_async_query(now)` und liefern
+    {home_id: {"name", "today", "tomorrow"}} mit Slots im Format {startsAt, total}.
+    """
+
+    source_type = None
+    # None = auf die Veröffentlichung um 13:00 warten, sonst festes Abruf-Intervall (Sekunden)
+    refresh_interval = None
+
+    def __init__(self, hass, store_key):
+        self.hass = hass
+        self.key = None
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.prices.{store_key}")
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self._listeners = {}
+        self._timelines = {}
+        self._missing = set()
+        # Fester Versatz pro Instanz, damit nicht alle um 13:00 anfragen
+        self._publish_offset = random.uniform(0, PUBLISH_JITTER)
+
+        # home_id -> {"name", "today", "tomorrow"}, Reihenfolge wie in der Quelle
+        self.homes = {}
+        self.fetched_at = None
+        self.next_attempt = None
+        self.failures = 0
+        self.api_calls = 0
+        self.cache_hits = 0
+        self.last_error = None
+        self.last_error_time = None
+        # Wird bei jeder Änderung der Preisdaten erhöht
+        self.version = 0
+
+    def subscribe(self, key, listener):
+        """Meldet einen Manager an; `listener` wird nach neuen Daten aufgerufen."""
+        self._listeners[key] = listener
+
+        def _unsubscribe():
+            self._listeners.pop(key, None)
+            if not self._listeners:
+                self.hass.data.get(DATA_PRICE_SERVICES, {}).pop(self.key, None)
+        return _unsubscribe
+
+    def home(self, home_id=None):
+        """Preisdaten eines Homes, ohne `home_id` das erste.
+
+        Ein unbekanntes oder nicht mehr aktives Home liefert leere Daten statt der
+        Preise eines fremden Homes.
+        """
+        if home_id is None: return next(iter(self.homes.values()), EMPTY_HOME)
+        home = self.homes.get(home_id)
+        if home is not None:
+            self._missing.discard(home_id)
+            return home
+        if self.homes and home_id not in self._missing:
+            self._missing.add(home_id)
+            _LOGGER.error(f"Home {home_id} nicht in den Preisdaten (unbekannt oder ohne aktiven Vertrag)")
+        return EMPTY_HOME
+
+    def timeline(self, home_id, tz, slot_seconds=None):
+        """PriceTimeline pro Home und Raster, einmal pro Datenstand gebaut und geteilt."""
+        key = (home_id, slot_seconds)
+        cached = self._timelines.get(key)
+        if cached is None or cached.version != self.version:
+            home = self.home(home_id)
+            cached = PriceTimeline(home["today"] + home["tomorrow"], tz, self.version, slot_seconds)
+            self._timelines[key] = cached
+        return cached
+
+    async def async_load(self):
+        """Lädt die zuletzt gespeicherten Preise von der Platte."""
+        self._loaded = True
+        try:
+            data = await self._store.async_load()
+        except Exception as e:
+            _LOGGER.warning(f"Preis-Cache nicht lesbar: {e}")
+            return
+        if not data: return
+        self.homes = {
+            home_id: {"name": h.get("name"), "today": h.get("today") or [], "tomorrow": h.get("tomorrow") or []}
+            for home_id, h in (data.get("homes") or {}).items()
+        }
+        fetched = data.get("fetched_at")
+        self.fetched_at = dt_util.parse_datetime(fetched) if fetched else None
+        self.version += 1
+
+    async def async_ensure_loaded(self):
+        """Cache von der Platte laden, falls noch nicht geschehen (ohne Netzwerk)."""
+        async with self._lock:
+            if not self._loaded: await self.async_load()
+
+    def _roll_over(self, now):
+        """Schiebt morgen -> heute, wenn der Tag gewechselt hat. True wenn alle Homes aktuell."""
+        current = bool(self.homes)
+        for home in self.homes.values():
+            if home["today"] and _slot_date(home["today"][0]) == now.date(): continue
+            if home["tomorrow"] and _slot_date(home["tomorrow"][0]) == now.date():
+                home["today"] = home["tomorrow"]
+                home["tomorrow"] = []
+                self.version += 1
+                continue
+            current = False
+        return current
+
+    def needs_refresh(self, now):
+        current = self._roll_over(now)
+        if self.next_attempt and now < self.next_attempt: return False
+        if not current: return True
+        if self.refresh_interval and self.fetched_at and (now - self.fetched_at).total_seconds() >= self.refresh_interval:
+            return True
+        if all(h["tomorrow"] for h in self.homes.values()): return False
+        if self.refresh_interval: return False
+        publish = now.replace(hour=PUBLISH_HOUR, minute=0, second=0, microsecond=0)
+        return now >= publish + timedelta(seconds=self._publish_offset)
+
+    async def async_update(self, now=None, source=None):
+        """Aktualisiert den Cache falls nötig. True wenn neue Daten geladen wurden.
+
+        Nach neuen Daten werden alle Abonnenten außer `source` benachrichtigt.
+        """
+        now = now or dt_util.now()
+        async with self._lock:
+            if not self._loaded: await self.async_load()
+            if not self.needs_refresh(now):
+                self.cache_hits += 1
+                return False
+            updated = await self._async_fetch(now)
+        if updated:
+            for key, listener in list(self._listeners.items()):
+                if key != source: listener()
+        return updated
+
+    async def _async_query(self, now):
+        raise NotImplementedError
+
+    async def _async_fetch(self, now):
+        self.api_calls += 1
+        try:
+            homes = await self._async_query(now)
+            if not homes or not any(h["today"] or h["tomorrow"] for h in homes.values()):
+                raise RuntimeError("Keine Preise in der Quelle")
+        except Exception as e:
+            self.failures += 1
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.failures - 1))
+            delay *= random.uniform(0.8, 1.2)
+            self.next_attempt = now + timedelta(seconds=delay)
+            self.last_error = str(e)[:200]
+            self.last_error_time = now.timestamp()
+            _LOGGER.error(f"Preisquelle {self.source_type} Fehler: {e} (nächster Versuch in {int(delay)}s)")
+            return False
+
+        self.failures = 0
+        self.homes = homes
+        self.fetched_at = now
+        self.next_attempt = None
+        self.version += 1
+        if not self.refresh_interval and not all(h["tomorrow"] for h in homes.values()):
+            # Morgen noch nicht veröffentlicht -> später erneut, leicht gestreut
+            self.next_attempt = now + timedelta(seconds=RETRY_INTERVAL + random.uniform(0, RETRY_JITTER))
+
+        await self._store.async_save({"homes": self.homes, "fetched_at": now.isoformat()})
+        return True
+
+
+class SensorPriceService(PriceService):
+    """Preise aus dem Forecast-Attribut einer HA-Entität (Nordpool, EPEX Spot, ...).
+
+    Es wird nur neu gelesen, wenn sich die Entität geändert hat; kein Netzwerkzugriff.
+    """
+
+    source_type = "sensor"
+
+    def __init__(self, hass, entity_id):
+        super().__init__(hass, f"sensor.{hash_key(entity_id)}")
+        self.entity_id = entity_id
+        self._seen = None
+
+    def needs_refresh(self, now):
+        self._roll_over(now)
+        if self.failures and self.next_attempt and now < self.next_attempt: return False
+        state = self.hass.states.get(self.entity_id)
+        return state is not None and state.last_updated != self._seen
+
+    async def _async_query(self, now):
+        state = self.hass.states.get(self.entity_id)
+        if state is None or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+            raise RuntimeError(f"{self.entity_id} nicht verfügbar")
+        self._seen = state.last_updated
+        attrs = state.attributes
+        unit = str(attrs.get("unit_of_measurement") or attrs.get("unit") or "").lower()
+        scale = 0.01 if "ct" in unit or "cent" in unit else 1.0
+
+        if "raw_today" in attrs:
+            # Nordpool: getrennte Listen für heute und morgen
+            today = normalize_slots(attrs.get("raw_today"), scale)
+            tomorrow = normalize_slots(attrs.get("raw_tomorrow"), scale)
+        else:
+            entries = next((attrs[k] for k in ("data", "forecast", "prices") if attrs.get(k)), [])
+            today, tomorrow = split_days(normalize_slots(entries, scale), now)
+        return {self.entity_id: {"name": attrs.get("friendly_name"), "today": today, "tomorrow": tomorrow}}
+
+
+class FilePriceService(PriceService):
+    """Preise aus einer lokalen CSV/JSON-Datei oder einem HTTP-Endpunkt (z.B. eigener Aggregator)."""
+
+    source_type = "file"
+    refresh_interval = 900
+
+    def __init__(self, hass, source):
+        super().__init__(hass, f"file.{hash_key(source)}")
+        self.source = source
+
+    async def _async_read(self):
+        if self.source.startswith(("http://", "https://")):
+            session = async_get_clientsession(self.hass)
+            async with session.get(self.source, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as resp:
+                if resp.status != 200:
+                    raise RuntimeError(f"HTTP {resp.status}")
+                return await resp.text()
+
+        def _read():
+            with open(self.hass.config.path(self.source), encoding="utf-8") as f: return f.read()
+        return await self.hass.async_add_executor_job(_read)
+
+    async def _async_query(self, now):
+        text = (await self._async_read()).strip()
+        if text.startswith(("[", "{")):
+            data = json.loads(text)
+            if isinstance(data, dict):
+                if "today" in data or "tomorrow" in data:
+                    entries = (data.get("today") or []) + (data.get("tomorrow") or [])
+                else:
+                    entries = data.get("prices") or data.get("data") or []
+            else:
+                entries = data
+        else:
+            rows = list(csv.reader(StringIO(text), delimiter=";" if ";" in text.split("\n", 1)[0] else ","))
+            if rows and rows[0] and rows[0][0] in START_KEYS:
+                header, rows = rows[0], rows[1:]
+            else:
+                header = ["startsAt", "total"]
+            entries = [dict(zip(header, r)) for r in rows if len(r) >= 2]
+        today, tomorrow = split_days(normalize_slots(entries), now)
+        return {"file": {"name": self.source, "today": today, "tomorrow": tomorrow}}
@@ -0,0 +1,112 @@
+"""PV-Prognose als Kurve (Solcast, Forecast.Solar, Open-Meteo) für SmartPriceCharge."""
+from bisect import bisect_right
+from datetime import datetime
+
+# Solcast: Listen mit Perioden-Mittelwert in kW
+LIST_KEYS = ("detailedForecast", "detailedHourly")
+START_KEYS = ("period_start", "start", "datetime")
+POWER_KEYS = ("pv_estimate", "pv_power_kw", "power_kw")
+# Forecast.Solar / Open-Meteo Solar: {Zeitstempel: Watt}
+WATTS_KEY = "watts"
+# Längere Abstände zwischen zwei Punkten gelten als Lücke (Sekunden)
+MAX_PERIOD = 3600
+
+
+def _ts(value, tz):
+    if isinstance(value, datetime): dt = value
+    else:
+        try: dt = datetime.fromisoformat(str(value))
+        except ValueError: return None
+    if dt.tzinfo is None: dt = dt.replace(tzinfo=tz)
+    return dt.timestamp()
+
+
+def parse_forecast(attributes, tz=None):
+    """Liste von (Start-Zeitstempel, Watt) aus den Attributen einer Forecast-Entität."""
+    points = []
+    for key in LIST_KEYS:
+        for e in attributes.get(key) or []:
+            if not isinstance(e, dict): continue
+            start = next((e[k] for k in START_KEYS if e.get(k) is not None), None)
+            power = next((e[k] for k in POWER_KEYS if e.get(k) is not None), None)
+            ts = _ts(start, tz) if start is not None else None
+            if ts is None or power is None: continue
+            try: points.append((ts, float(power) * 1000))
+            except (TypeError, ValueError): continue
+        if points: return points
+    watts = attributes.get(WATTS_KEY)
+    if isinstance(watts, dict):
+        for start, power in watts.items():
+            ts = _ts(start, tz)
+            if ts is None: continue
+            try: points.append((ts, float(power)))
+            except (TypeError, ValueError): continue
+    return points
+
+
+class PvForecast:
+    """Geparste PV-Kurve; neu gelesen nur, wenn sich eine Quell-Entität geändert hat."""
+
+    __slots__ = ("starts", "watts", "ends", "version", "_seen", "_cache_key", "_cache")
+
+    def __init__(self):
+        self.starts = []
+        self.watts = []
+        self.ends = []
+        self.version = 0
+        self._seen = None
+        self._cache_key = None
+        self._cache = None
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def update(self, states, tz=None):
+        """`states`: HA-States der Forecast-Entitäten. True wenn neu geparst wurde."""
+        seen = tuple((s.entity_id, s.last_updated) for s in states if s is not None)
+        if seen == self._seen: return False
+        self._seen = seen
+        merged = {}
+        for s in states:
+            if s is None: continue
+            for ts, w in parse_forecast(s.attributes, tz): merged[ts] = w
+        self.starts = sorted(merged)
+        self.watts = [merged[t] for t in self.starts]
+        # Periodenlänge aus dem Abstand zum nächsten Punkt, letzter Punkt wie sein Vorgänger
+        gaps = [b - a for a, b in zip(self.starts, self.starts[1:])]
+        if gaps: gaps.append(gaps[-1])
+        elif self.starts: gaps = [MAX_PERIOD]
+        self.ends = [t + min(g, MAX_PERIOD) for t, g in zip(self.starts, gaps)]
+        self.version += 1
+        return True
+
+    def energy_between(self, t0, t1):
+        """Erwartete PV-Energie (kWh) im Zeitraum [t0, t1)."""
+        wh = 0.0
+        for k in range(max(0, bisect_right(self.starts, t0) - 1), len(self.starts)):
+            if self.starts[k] >= t1: break
+            overlap = min(t1, self.ends[k]) - max(t0, self.starts[k])
+            if overlap > 0: wh += self.watts[k] * overlap / 3600
+        return wh / 1000
+
+    def slot_kwh(self, tl, start=0):
+        """Erwartete PV-Energie (kWh) pro Slot der Timeline ab `start`, zwischengespeichert."""
+        if not self.starts: return None
+        key = (tl.version, start, self.version, tl.slot_seconds)
+        if key == self._cache_key: return self._cache
+
+        out = []
+        j, m = 0, len(self.starts)
+        for a in tl.starts[start:]:
+            b = a + tl.slot_seconds
+            while j < m and self.ends[j] <= a: j += 1
+            wh = 0.0
+            k = j
+            while k < m and self.starts[k] < b:
+                overlap = min(b, self.ends[k]) - max(a, self.starts[k])
+                if overlap > 0: wh += self.watts[k] * overlap / 3600
+                k += 1
+            out.append(wh / 1000)
+        self._cache_key = key
+        self._cache = out
+        return out
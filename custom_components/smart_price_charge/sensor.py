@@ -1,10 +1,15 @@
 """Sensoren für SmartPriceCharge."""
+import time
 from homeassistant.components.sensor import (
     SensorEntity, SensorDeviceClass, SensorStateClass
 )
-from homeassistant.const import UnitOfEnergy, CURRENCY_EURO
+from homeassistant.const import UnitOfEnergy, UnitOfTime, CURRENCY_EURO, EntityCategory
+from homeassistant.core import callback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from .const import DOMAIN
+from .const import DOMAIN, CONF_SENSOR_HEARTBEAT, DEFAULT_SENSOR_HEARTBEAT
+
+# Diagnose-Sensoren höchstens alle X Sekunden schreiben
+DIAGNOSTIC_INTERVAL = 300
 
 async def async_setup_entry(hass, entry, async_add_entities):
     coordinator = hass.data[DOMAIN][entry.entry_id]
@@ -17,22 +22,67 @@ async def async_setup_entry(hass, entry, async_add_entities):
         SmartPricePeakTimeSensor(coordinator, entry),
         SmartPriceNextChargeSensor(coordinator, entry),
         SmartPriceSlotsInfoSensor(coordinator, entry),
+        SmartPricePlanSensor(coordinator, entry),
         # Kosten
         SmartPriceCostTotalSensor(coordinator, entry),
         SmartPriceSavingsTotalSensor(coordinator, entry),
         SmartPriceDischargeSavingsTotalSensor(coordinator, entry),
         SmartPricePVSavingsTotalSensor(coordinator, entry),
         SmartPriceChargedKwhTotalSensor(coordinator, entry),
+        # Diagnose
+        SmartPriceTickDurationSensor(coordinator, entry),
+        SmartPriceApiCallsSensor(coordinator, entry),
+        SmartPriceCommandsSentSensor(coordinator, entry),
     ])
 
 class SmartPriceSensorBase(CoordinatorEntity, SensorEntity):
+    """Schreibt den Zustand nur bei echter Änderung, damit der Recorder nicht jede Minute wächst.
+
+    `_precision`: Nachkommastellen für den Vergleich (None = exakt).
+    `_min_change`: kleinere Änderungen erst nach dem Heartbeat aus den Optionen schreiben.
+    `_min_interval`: Mindestabstand zwischen zwei Schreibvorgängen (Diagnose-Sensoren).
+    """
+    _precision = None
+    _min_change = 0.0
+    _min_interval = 0
+
     def __init__(self, coordinator, entry):
         super().__init__(coordinator)
         self.entry = entry
         self._attr_has_entity_name = True
+        if self._precision is not None: self._attr_suggested_display_precision = self._precision
+        self._written = None
+        self._written_at = 0.0
     @property
     def device_info(self): return {"identifiers": {(DOMAIN, self.entry.entry_id)}, "name": "SmartPriceCharge", "manufacturer": "Custom"}
 
+    def _snapshot(self):
+        value = self.native_value
+        if self._precision is not None and isinstance(value, float): value = round(value, self._precision)
+        return (self.available, value, self.extra_state_attributes)
+
+    def _should_write(self, snapshot, now):
+        if self._written is None: return True
+        if snapshot == self._written: return False
+        elapsed = now - self._written_at
+        if elapsed < self._min_interval: return False
+        if snapshot[0] != self._written[0] or snapshot[2] != self._written[2]: return True
+        new, old = snapshot[1], self._written[1]
+        if isinstance(new, (int, float)) and isinstance(old, (int, float)) and abs(new - old) < self._min_change:
+            return elapsed >= self.entry.options.get(CONF_SENSOR_HEARTBEAT, DEFAULT_SENSOR_HEARTBEAT) * 60
+        return True
+
+    @callback
+    def _handle_coordinator_update(self):
+        snapshot, now = self._snapshot(), time.monotonic()
+        counts = self.coordinator.sensor_writes.setdefault(self.unique_id, [0, 0])
+        if not self._should_write(snapshot, now):
+            counts[1] += 1
+            return
+        self._written, self._written_at = snapshot, now
+        counts[0] += 1
+        self.async_write_ha_state()
+
 # Status
 class SmartPriceStatusSensor(SmartPriceSensorBase):
     _attr_name = "Status"
@@ -41,6 +91,13 @@ class SmartPriceStatusSensor(SmartPriceSensorBase):
     def unique_id(self): return f"{self.entry.entry_id}_status"
     @property
     def native_value(self): return self.coordinator.data.get("status", "Init...")
+    @property
+    def extra_state_attributes(self):
+        # Preisquelle der Entscheidung: live, fallback (Ersatzpreise) oder None (Sicherheitsmodus)
+        return {
+            "price_source": self.coordinator.data.get("price_source"),
+            "low_confidence": self.coordinator.data.get("low_confidence", False),
+        }
 
 class SmartPriceModeSensor(SmartPriceSensorBase):
     _attr_name = "Modus Empfehlung"
@@ -52,6 +109,8 @@ class SmartPriceModeSensor(SmartPriceSensorBase):
 
 class SmartPriceSessionSensor(SmartPriceSensorBase):
     _attr_name = "Session Geladen"
+    _precision = 2
+    _min_change = 0.05
     _attr_device_class = SensorDeviceClass.ENERGY
     _attr_state_class = SensorStateClass.TOTAL_INCREASING
     _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
@@ -63,6 +122,7 @@ class SmartPriceSessionSensor(SmartPriceSensorBase):
 # Details
 class SmartPriceCurrentPriceSensor(SmartPriceSensorBase):
     _attr_name = "Aktueller Preis"
+    _precision = 4
     _attr_device_class = SensorDeviceClass.MONETARY
     _attr_native_unit_of_measurement = f"{CURRENCY_EURO}/kWh"
     @property
@@ -72,6 +132,7 @@ class SmartPriceCurrentPriceSensor(SmartPriceSensorBase):
 
 class SmartPricePeakPriceSensor(SmartPriceSensorBase):
     _attr_name = "Peak Preis"
+    _precision = 4
     _attr_device_class = SensorDeviceClass.MONETARY
     _attr_native_unit_of_measurement = f"{CURRENCY_EURO}/kWh"
     @property
@@ -103,10 +164,27 @@ class SmartPriceSlotsInfoSensor(SmartPriceSensorBase):
     @property
     def native_value(self): return self.coordinator.data.get("slots_info")
 
+class SmartPricePlanSensor(SmartPriceSensorBase):
+    """Geplante Ladeslots als Zustand, der komplette Plan spaltenweise im Attribut `plan`."""
+    _attr_name = "Ladeplan"
+    _attr_icon = "mdi:chart-timeline-variant"
+    _unrecorded_attributes = frozenset({"plan"})
+    @property
+    def unique_id(self): return f"{self.entry.entry_id}_plan"
+    @property
+    def native_value(self):
+        columns = self.coordinator.plan_columns
+        return columns["actions"].count("c") if columns else None
+    @property
+    def extra_state_attributes(self):
+        return {"revision": self.coordinator.plan_revision, "plan": self.coordinator.plan_columns}
+
 # --- TRACKER (Hier war der Fehler) ---
 
 class SmartPriceCostTotalSensor(SmartPriceSensorBase):
     _attr_name = "Kosten Laden (Gesamt)"
+    _precision = 2
+    _min_change = 0.05
     _attr_device_class = SensorDeviceClass.MONETARY
     # FIX: TOTAL statt TOTAL_INCREASING für Monetary
     _attr_state_class = SensorStateClass.TOTAL 
@@ -118,6 +196,8 @@ class SmartPriceCostTotalSensor(SmartPriceSensorBase):
 
 class SmartPriceSavingsTotalSensor(SmartPriceSensorBase):
     _attr_name = "Ersparnis Laden (Gesamt)"
+    _precision = 2
+    _min_change = 0.05
     _attr_device_class = SensorDeviceClass.MONETARY
     # FIX: TOTAL statt TOTAL_INCREASING
     _attr_state_class = SensorStateClass.TOTAL
@@ -129,6 +209,8 @@ class SmartPriceSavingsTotalSensor(SmartPriceSensorBase):
 
 class SmartPriceDischargeSavingsTotalSensor(SmartPriceSensorBase):
     _attr_name = "Wert Entladung (Gesamt)"
+    _precision = 2
+    _min_change = 0.05
     _attr_device_class = SensorDeviceClass.MONETARY
     # FIX: TOTAL statt TOTAL_INCREASING
     _attr_state_class = SensorStateClass.TOTAL
@@ -140,6 +222,8 @@ class SmartPriceDischargeSavingsTotalSensor(SmartPriceSensorBase):
 
 class SmartPricePVSavingsTotalSensor(SmartPriceSensorBase):
     _attr_name = "Wert PV Direkt (Gesamt)"
+    _precision = 2
+    _min_change = 0.05
     _attr_device_class = SensorDeviceClass.MONETARY
     # FIX: TOTAL statt TOTAL_INCREASING
     _attr_state_class = SensorStateClass.TOTAL
@@ -151,6 +235,8 @@ class SmartPricePVSavingsTotalSensor(SmartPriceSensorBase):
 
 class SmartPriceChargedKwhTotalSensor(SmartPriceSensorBase):
     _attr_name = "Geladen Gesamt (kWh)"
+    _precision = 2
+    _min_change = 0.1
     _attr_device_class = SensorDeviceClass.ENERGY
     # HIER IST TOTAL_INCREASING ERLAUBT (da Energy)
     _attr_state_class = SensorStateClass.TOTAL_INCREASING
@@ -158,4 +244,52 @@ class SmartPriceChargedKwhTotalSensor(SmartPriceSensorBase):
     @property
     def unique_id(self): return f"{self.entry.entry_id}_track_kwh"
     @property
-    def native_value(self): return self.coordinator.data.get("track_kwh", 0.0)
\ No newline at end of file
+    def native_value(self): return self.coordinator.data.get("track_kwh", 0.0)
+
+# --- DIAGNOSE ---
+# Schnell wechselnde Werte: gedrosselt geschrieben und ohne state_class, damit keine Langzeitstatistik entsteht
+
+class SmartPriceTickDurationSensor(SmartPriceSensorBase):
+    _attr_name = "Laufzeit Tick"
+    _precision = 1
+    _min_interval = DIAGNOSTIC_INTERVAL
+    _attr_icon = "mdi:timer-outline"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _unrecorded_attributes = frozenset({"phases"})
+    @property
+    def unique_id(self): return f"{self.entry.entry_id}_tick_ms"
+    @property
+    def native_value(self): return self.coordinator.data.get("tick_ms")
+    @property
+    def extra_state_attributes(self):
+        phases = self.coordinator.stats.as_dict()["phases"]
+        return {"phases": {k: {"p50_ms": v["p50_ms"], "p95_ms": v["p95_ms"], "max_ms": v["max_ms"]} for k, v in phases.items()}}
+
+class SmartPriceApiCallsSensor(SmartPriceSensorBase):
+    _attr_name = "API Abrufe"
+    _min_interval = DIAGNOSTIC_INTERVAL
+    _attr_icon = "mdi:cloud-download-outline"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    @property
+    def unique_id(self): return f"{self.entry.entry_id}_api_calls"
+    @property
+    def native_value(self): return self.coordinator.data.get("api_calls")
+    @property
+    def extra_state_attributes(self):
+        service = self.coordinator.price_service
+        return {"cache_hits": service.cache_hits, "failures": service.failures, "homes": len(service.homes)}
+
+class SmartPriceCommandsSentSensor(SmartPriceSensorBase):
+    _attr_name = "Befehle gesendet"
+    _min_interval = DIAGNOSTIC_INTERVAL
+    _attr_icon = "mdi:send-outline"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    @property
+    def unique_id(self): return f"{self.entry.entry_id}_commands_sent"
+    @property
+    def native_value(self): return self.coordinator.data.get("commands_sent")
+    @property
+    def extra_state_attributes(self):
+        dispatcher = self.coordinator.dispatcher
+        return {"suppressed": dispatcher.suppressed, "failed": dispatcher.failed}
@@ -0,0 +1,86 @@
+"""Laufzeit-Messung der Entscheidungsschleife."""
+import time
+from contextlib import contextmanager
+
+# Obergrenzen der Histogramm-Buckets in Millisekunden (letzter Bucket = darüber)
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+
+class PhaseStats:
+    """Festes Histogramm plus Summe/Maximum pro Phase."""
+
+    __slots__ = ("count", "total_ms", "max_ms", "last_ms", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.last_ms = ms
+        if ms > self.max_ms: self.max_ms = ms
+        for i, limit in enumerate(BUCKETS_MS):
+            if ms <= limit:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, q):
+        """Obergrenze des Buckets, in dem das q-Quantil liegt."""
+        if not self.count: return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target: return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "last_ms": round(self.last_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "buckets": self.buckets,
+        }
+
+
+class Instrumentation:
+    """Phasen-Zeiten, Zähler und letzte Fehler eines Managers."""
+
+    PHASES = ("tick", "fetch", "state_read", "planning", "optimizer", "dispatch")
+
+    def __init__(self):
+        self.phases = {p: PhaseStats() for p in self.PHASES}
+        self.counters = {}
+        self.errors = {}
+
+    def record(self, phase, ms):
+        self.phases.setdefault(phase, PhaseStats()).add(ms)
+
+    @contextmanager
+    def measure(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, (time.perf_counter() - start) * 1000)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def error(self, name, message, ts=None):
+        self.errors[name] = {"time": ts if ts is not None else time.time(), "message": str(message)[:200]}
+
+    def as_dict(self):
+        return {
+            "phases": {k: v.as_dict() for k, v in self.phases.items()},
+            "counters": dict(self.counters),
+            "errors": dict(self.errors),
+        }
@@ -0,0 +1,144 @@
+"""Persistente Tracker-Werte für SmartPriceCharge."""
+import logging
+from datetime import date
+
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+TRACKER_KEYS = ("cost", "saved", "discharge", "pv", "kwh")
+
+# Verzögertes Speichern schont die SD-Karte (Sekunden)
+SAVE_DELAY = 300
+# Begrenzte Historie: Tageswerte und Monatswerte als kompakte Arrays
+DAILY_DAYS = 62
+MONTHLY_MONTHS = 24
+
+
+def _month_index(d):
+    return d.year * 12 + d.month - 1
+
+
+class _Rollup:
+    """Ringpuffer fester Länge: `start` ist der Index des ersten Eintrags."""
+
+    __slots__ = ("start", "size", "values")
+
+    def __init__(self, size):
+        self.start = None
+        self.size = size
+        self.values = {k: [] for k in TRACKER_KEYS}
+
+    def add(self, idx, key, value):
+        if self.start is None: self.start = idx
+        pos = idx - self.start
+        if pos < 0: return
+        if pos >= self.size:
+            # Älteste Einträge verwerfen
+            drop = pos - self.size + 1
+            for k in TRACKER_KEYS: del self.values[k][:drop]
+            self.start += drop
+            pos -= drop
+        for k in TRACKER_KEYS:
+            arr = self.values[k]
+            if len(arr) <= pos: arr.extend([0.0] * (pos + 1 - len(arr)))
+        self.values[key][pos] += value
+
+    def as_dict(self):
+        return {"start": self.start, **{k: [round(v, 4) for v in self.values[k]] for k in TRACKER_KEYS}}
+
+    def load(self, data):
+        if not data: return
+        self.start = data.get("start")
+        for k in TRACKER_KEYS:
+            self.values[k] = [float(v) for v in data.get(k, [])][-self.size:]
+        n = max(len(v) for v in self.values.values())
+        for k in TRACKER_KEYS:
+            self.values[k] = [0.0] * (n - len(self.values[k])) + self.values[k]
+
+
+class Snapshot:
+    """Letzte Ausgabewerte des Managers für den Warmstart, gespeichert mit den Trackern."""
+
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values = {}
+
+    def as_dict(self):
+        return self.values
+
+    def load(self, data):
+        if data: self.values = dict(data)
+
+
+class TrackerStore:
+    """Summen plus Tages-/Monats-Rollups, gesammelt gespeichert über `Store`."""
+
+    def __init__(self, hass, entry_id):
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.trackers.{entry_id}")
+        self._dirty = False
+        self.totals = dict.fromkeys(TRACKER_KEYS, 0.0)
+        self.daily = _Rollup(DAILY_DAYS)
+        self.monthly = _Rollup(MONTHLY_MONTHS)
+        # Weitere Modelle (as_dict/load), die in derselben Datei mitgespeichert werden
+        self._attached = {}
+
+    def attach(self, name, model):
+        self._attached[name] = model
+
+    async def async_load(self):
+        try:
+            data = await self._store.async_load()
+        except Exception as e:
+            _LOGGER.warning(f"Tracker-Speicher nicht lesbar: {e}")
+            return
+        if not data: return
+        for k in TRACKER_KEYS:
+            self.totals[k] = float(data.get("totals", {}).get(k, 0.0))
+        self.daily.load(data.get("daily"))
+        self.monthly.load(data.get("monthly"))
+        for name, model in self._attached.items(): model.load(data.get(name))
+
+    def add(self, key, value, now):
+        if not value: return
+        self.totals[key] += value
+        day = now.date()
+        self.daily.add(day.toordinal(), key, value)
+        self.monthly.add(_month_index(day), key, value)
+        self._schedule_save()
+
+    def daily_history(self):
+        """Liste von (Datum, {key: Wert}) der gespeicherten Tage."""
+        if self.daily.start is None: return []
+        n = len(self.daily.values[TRACKER_KEYS[0]])
+        return [
+            (date.fromordinal(self.daily.start + i), {k: self.daily.values[k][i] for k in TRACKER_KEYS})
+            for i in range(n)
+        ]
+
+    def touch(self):
+        """Angehängtes Modell hat sich geändert -> verzögert speichern."""
+        self._schedule_save()
+
+    def _schedule_save(self):
+        # Nur beim ersten Schreibzugriff planen, sonst verschiebt jeder Tick den Termin
+        if self._dirty: return
+        self._dirty = True
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self):
+        self._dirty = False
+        return {
+            "totals": {k: round(v, 6) for k, v in self.totals.items()},
+            "daily": self.daily.as_dict(),
+            "monthly": self.monthly.as_dict(),
+            **{name: model.as_dict() for name, model in self._attached.items()},
+        }
+
+    async def async_save(self):
+        """Sofort schreiben (z.B. beim Entladen)."""
+        await self._store.async_save(self._data_to_save())
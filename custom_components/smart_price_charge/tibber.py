@@ -0,0 +1,61 @@
+"""Tibber Preis-Backend für SmartPriceCharge."""
+import logging
+
+import aiohttp
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .prices import REQUEST_TIMEOUT, PriceService, hash_key
+
+_LOGGER = logging.getLogger(__name__)
+
+TIBBER_URL = "https://api.tibber.com/v1-beta/gql"
+PRICE_QUERY = """
+{ viewer { homes { id appNickname currentSubscription { priceInfo {
+  today { total startsAt }
+  tomorrow { total startsAt }
+} } } } }
+"""
+HOMES_QUERY = "{ viewer { homes { id appNickname address { address1 } } } }"
+
+
+async def _async_query(hass, token, query):
+    session = async_get_clientsession(hass)
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    async with session.post(
+        TIBBER_URL, json={"query": query}, headers=headers,
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    ) as resp:
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}")
+        data = await resp.json()
+    return data['data']['viewer']['homes']
+
+
+async def async_fetch_homes(hass, token):
+    """Tibber-Homes als {id: Anzeigename} (für den Config-Flow)."""
+    homes = await _async_query(hass, token, HOMES_QUERY)
+    result = {}
+    for h in homes:
+        address = (h.get('address') or {}).get('address1')
+        result[h['id']] = h.get('appNickname') or address or h['id']
+    return result
+
+
+class TibberPriceService(PriceService):
+    """Ein Poller pro Token: holt alle Homes in einer Abfrage."""
+
+    source_type = "tibber"
+
+    def __init__(self, hass, token):
+        super().__init__(hass, hash_key(token))
+        self.token = token
+
+    async def _async_query(self, now):
+        homes = {}
+        for h in await _async_query(self.hass, self.token, PRICE_QUERY):
+            sub = h.get('currentSubscription')
+            if not sub: continue
+            pi = sub['priceInfo']
+            homes[h['id']] = {"name": h.get('appNickname'), "today": pi['today'] or [], "tomorrow": pi['tomorrow'] or []}
+        if not homes: raise RuntimeError("Kein Home mit aktivem Vertrag")
+        return homes
@@ -0,0 +1,148 @@
+"""Vorberechnete Preis-Zeitachse für SmartPriceCharge."""
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+DEFAULT_SLOT_SECONDS = 900
+# Größere Abstände zwischen zwei Quell-Slots gelten als Datenlücke (Sekunden)
+MAX_SOURCE_SECONDS = 3600
+
+
+def resample(starts, durations, prices, slot_seconds):
+    """Verteilt Quell-Slots beliebiger Länge auf ein gleichmäßiges Raster.
+
+    Feinere Raster übernehmen den Preis, gröbere mitteln zeitgewichtet.
+    Das Raster beginnt am ersten Quell-Slot (lokale Mitternacht bei Tibber).
+    """
+    if not starts: return [], []
+    origin = starts[0]
+    sums = {}
+    for t, d, p in zip(starts, durations, prices):
+        end = t + d
+        while t < end:
+            bucket = origin + (t - origin) // slot_seconds * slot_seconds
+            step = min(end, bucket + slot_seconds) - t
+            acc = sums.get(bucket)
+            if acc is None: sums[bucket] = [p * step, step]
+            else:
+                acc[0] += p * step
+                acc[1] += step
+            t += step
+    grid = sorted(sums)
+    return grid, [sums[b][0] / sums[b][1] for b in grid]
+
+
+def fill_gaps(starts, prices, slot_seconds):
+    """Füllt fehlende Raster-Slots mit linear interpolierten Preisen.
+
+    Liefert (starts, prices, gaps); `gaps` sind die Indizes der gefüllten Slots.
+    Die Zeitachse bleibt damit lückenlos, der Planer rechnet mit einer Schätzung.
+    """
+    if not any(b - a > slot_seconds for a, b in zip(starts, starts[1:])): return starts, prices, frozenset()
+    out_starts, out_prices, gaps = [starts[0]], [prices[0]], set()
+    for i in range(1, len(starts)):
+        a, b = starts[i - 1], starts[i]
+        t = a + slot_seconds
+        while t < b:
+            gaps.add(len(out_starts))
+            out_starts.append(t)
+            out_prices.append(prices[i - 1] + (prices[i] - prices[i - 1]) * (t - a) / (b - a))
+            t += slot_seconds
+        out_starts.append(b)
+        out_prices.append(prices[i])
+    return out_starts, out_prices, frozenset(gaps)
+
+
+class PriceTimeline:
+    """Einmal pro Preis-Abruf gebaut, danach nur noch O(log n) Lookups pro Tick.
+
+    Die Quell-Auflösung (stündlich, viertelstündlich, gemischt) wird erkannt und
+    auf ein gleichmäßiges Raster von `slot_seconds` abgebildet (Standard: feinste Quell-Auflösung).
+    Fehlende Slots werden interpoliert und in `gaps` geführt: `slot_at` kennt dort keinen
+    Preis, `cheapest` wählt sie nicht aus.
+    """
+
+    __slots__ = ("starts", "prices", "gaps", "peak_idx", "order", "slot_seconds", "source_seconds", "tz", "version")
+
+    def __init__(self, slots, tz=None, version=0, slot_seconds=None):
+        parsed = dict(
+            (datetime.fromisoformat(p['startsAt']).timestamp(), float(p['total'])) for p in slots
+        )
+        starts = sorted(parsed)
+        prices = [parsed[t] for t in starts]
+        durations = [b - a for a, b in zip(starts, starts[1:])]
+        if durations:
+            # Letzter Slot so lang wie sein Vorgänger; vor einer Lücke so lang wie der Slot davor
+            durations.append(durations[-1])
+            for i, d in enumerate(durations):
+                if d > MAX_SOURCE_SECONDS: durations[i] = durations[i - 1] if i else MAX_SOURCE_SECONDS
+        elif starts:
+            durations = [DEFAULT_SLOT_SECONDS]
+        self.source_seconds = min(durations) if durations else DEFAULT_SLOT_SECONDS
+        self.slot_seconds = slot_seconds or self.source_seconds
+        if any(d != self.slot_seconds for d in durations):
+            starts, prices = resample(starts, durations, prices, self.slot_seconds)
+        starts, prices, self.gaps = fill_gaps(starts, prices, self.slot_seconds)
+        self.starts = starts
+        self.prices = prices
+        self.tz = tz
+        self.version = version
+
+        # Suffix-Maximum: Index des teuersten Slots ab i (bei Gleichstand der früheste)
+        n = len(self.prices)
+        self.peak_idx = [0] * n
+        best = -1
+        for i in range(n - 1, -1, -1):
+            if best < 0 or self.prices[i] >= self.prices[best]: best = i
+            self.peak_idx[i] = best
+
+        # Stabile Sortierung nach Preis (bei Gleichstand zeitlich früher zuerst)
+        self.order = sorted(range(n), key=self.prices.__getitem__)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def time(self, i):
+        return datetime.fromtimestamp(self.starts[i], self.tz)
+
+    @property
+    def end(self):
+        """Ende des letzten Slots als Zeitstempel."""
+        return self.starts[-1] + self.slot_seconds if self.starts else 0
+
+    @property
+    def slot_minutes(self):
+        return int(self.slot_seconds // 60)
+
+    def index_at(self, ts):
+        """Index des letzten Slots mit Start <= `ts` (-1 wenn davor)."""
+        return bisect_right(self.starts, ts) - 1
+
+    def slot_at(self, ts):
+        """Index des Slots, der `ts` enthält (-1 außerhalb der bekannten Preise und in Lücken)."""
+        if ts >= self.end: return -1
+        i = self.index_at(ts)
+        return -1 if i in self.gaps else i
+
+    def index_from(self, ts):
+        """Erster Slot mit Start >= `ts`."""
+        return bisect_left(self.starts, ts)
+
+    def peak_from(self, start):
+        """Index des teuersten Slots ab `start` oder None."""
+        if start >= len(self.starts): return None
+        return self.peak_idx[start]
+
+    def max_price(self, start, end):
+        """Höchster Preis im Bereich [start, end) oder None."""
+        window = self.prices[start:end]
+        return max(window) if window else None
+
+    def cheapest(self, start, end, count):
+        """Die `count` günstigsten Slots in [start, end), zeitlich sortiert."""
+        if count <= 0 or end - start < count: return []
+        picked = []
+        for i in self.order:
+            if start <= i < end and i not in self.gaps:
+                picked.append(i)
+                if len(picked) == count: break
+        return sorted(picked)
@@ -0,0 +1,39 @@
+"""Websocket-Feed des Ladeplans: erst der komplette Plan, danach nur Änderungen."""
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import callback
+
+from .const import DOMAIN
+from .planview import diff_columns
+
+DATA_WEBSOCKET = f"{DOMAIN}_websocket"
+TYPE_PLAN = f"{DOMAIN}/plan"
+
+
+@callback
+def async_register_websocket(hass):
+    """Registriert die Websocket-Befehle einmalig."""
+    if hass.data.get(DATA_WEBSOCKET): return
+    hass.data[DATA_WEBSOCKET] = True
+    websocket_api.async_register_command(hass, ws_subscribe_plan)
+
+
+@websocket_api.websocket_command({vol.Required("type"): TYPE_PLAN, vol.Required("entry_id"): str})
+@callback
+def ws_subscribe_plan(hass, connection, msg):
+    """Abo auf den Plan eines Eintrags. Events: {"full": Spalten} oder ein Diff (siehe planview.diff_columns)."""
+    manager = hass.data.get(DOMAIN, {}).get(msg["entry_id"])
+    if manager is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "Eintrag nicht gefunden")
+        return
+
+    @callback
+    def forward(old, new):
+        diff = diff_columns(old, new)
+        if diff is None: return
+        diff["revision"] = manager.plan_revision
+        connection.send_message(websocket_api.event_message(msg["id"], diff))
+
+    connection.subscriptions[msg["id"]] = manager.async_add_plan_listener(forward)
+    connection.send_result(msg["id"])
+    connection.send_message(websocket_api.event_message(msg["id"], {"full": manager.plan_columns, "revision": manager.plan_revision}))
@@ -0,0 +1,23 @@
+"""Gemeinsame Helfer für die Tests der HA-freien Module."""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Das Paket-__init__ importiert Home Assistant erst beim Setup
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+START = datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def make_slots():
+    """Tibber-artige Slots ab START: `prices` im Abstand von `minutes`, Indizes in `skip` fehlen."""
+
+    def make(prices, minutes=60, skip=(), start=START):
+        return [
+            {"startsAt": (start + timedelta(minutes=minutes * i)).isoformat(), "total": p}
+            for i, p in enumerate(prices) if i not in skip
+        ]
+    return make
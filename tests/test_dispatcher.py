@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+from custom_components.smart_price_charge import dispatcher as dispatcher_mod
+from custom_components.smart_price_charge.dispatcher import Command, InverterDispatcher
+
+
+class FakeHass:
+    """Nur states.get und services.async_call; `fail` lässt jeden Aufruf scheitern."""
+
+    def __init__(self, states=None, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.states = SimpleNamespace(get=lambda e: (states or {}).get(e))
+        self.services = SimpleNamespace(async_call=self._call)
+
+    async def _call(self, domain, service, data, blocking=False):
+        self.calls.append((domain, service, data))
+        if self.fail: raise RuntimeError("offline")
+
+
+def limit(value):
+    return Command("number.min_soc", "number", "set_value", {"entity_id": "number.min_soc", "value": value}, value, 0.5)
+
+
+# Unix-Zeit; der Versand wird gegen den letzten Befehl gedrosselt
+T0 = 1_760_000_000
+
+
+def flush(disp, cmd, offset):
+    disp.desire(cmd)
+    asyncio.run(disp.async_flush(T0 + offset))
+
+
+def test_sends_once_and_suppresses_unchanged():
+    hass = FakeHass()
+    disp = InverterDispatcher(hass)
+    flush(disp, limit(20), 0)
+    flush(disp, limit(20.3), 60)
+    assert len(hass.calls) == 1
+    assert disp.sent == 1 and disp.suppressed == 1
+    flush(disp, limit(40), 120)
+    assert len(hass.calls) == 2
+
+
+def test_device_already_in_state_is_acked():
+    hass = FakeHass(states={"number.min_soc": SimpleNamespace(state="20.0")})
+    disp = InverterDispatcher(hass)
+    flush(disp, limit(20), 0)
+    assert not hass.calls
+
+
+def test_throttles_changes_within_min_interval():
+    hass = FakeHass()
+    disp = InverterDispatcher(hass)
+    flush(disp, limit(20), 0)
+    flush(disp, limit(40), dispatcher_mod.MIN_INTERVAL - 1)
+    assert len(hass.calls) == 1
+    flush(disp, limit(40), dispatcher_mod.MIN_INTERVAL)
+    assert len(hass.calls) == 2
+
+
+def test_retries_with_backoff_then_gives_up():
+    hass = FakeHass(fail=True)
+    disp = InverterDispatcher(hass)
+    for minute in range(240):
+        flush(disp, limit(20), minute * 60)
+    assert len(hass.calls) == dispatcher_mod.MAX_ATTEMPTS + 1
+    assert disp.dropped == ["number.min_soc"]
+    # Ein neuer Sollwert wird wieder versucht
+    flush(disp, limit(40), 240 * 60)
+    assert len(hass.calls) == dispatcher_mod.MAX_ATTEMPTS + 2
+    assert disp.dropped == []
+
+
+def test_forget_clears_dropped_command():
+    hass = FakeHass(fail=True)
+    disp = InverterDispatcher(hass)
+    for minute in range(240):
+        flush(disp, limit(20), minute * 60)
+    disp.forget()
+    flush(disp, limit(20), 240 * 60)
+    assert len(hass.calls) == dispatcher_mod.MAX_ATTEMPTS + 2
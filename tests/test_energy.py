@@ -0,0 +1,54 @@
+import pytest
+
+from custom_components.smart_price_charge.energy import EnergyIntegrator
+from custom_components.smart_price_charge.timeline import PriceTimeline
+
+from conftest import START
+
+T0 = START.timestamp()
+
+
+def test_first_call_only_starts():
+    integ = EnergyIntegrator()
+    assert integ.update(1000, None, T0) == (0.0, 0.0)
+
+
+def test_constant_power_without_timeline():
+    integ = EnergyIntegrator()
+    integ.update(1000, None, T0)
+    kwh, eur = integ.update(1000, None, T0 + 600, fallback_price=0.3)
+    assert kwh == pytest.approx(1000 * 600 / 3_600_000)
+    assert eur == pytest.approx(kwh * 0.3)
+
+
+def test_split_at_slot_boundary(make_slots):
+    tl = PriceTimeline(make_slots([0.1, 0.3]))
+    integ = EnergyIntegrator(max_gap=7200)
+    integ.update(2000, None, T0 + 1800)
+    kwh, eur = integ.update(2000, None, T0 + 5400, tl)
+    # Je eine halbe Stunde zu 0,10 und 0,30 €/kWh
+    assert kwh == pytest.approx(2.0)
+    assert eur == pytest.approx(0.1 + 0.3)
+
+
+def test_trapezoid_until_sample_then_hold():
+    integ = EnergyIntegrator()
+    integ.update(0, None, T0)
+    kwh, _ = integ.update(1200, T0 + 300, T0 + 600)
+    # 0 -> 1200 W über 5 min, danach 5 min konstant 1200 W
+    assert kwh == pytest.approx((600 * 300 + 1200 * 300) / 3_600_000)
+
+
+def test_gap_is_not_counted():
+    integ = EnergyIntegrator(max_gap=900)
+    integ.update(1000, None, T0)
+    assert integ.update(1000, None, T0 + 1000) == (0.0, 0.0)
+    kwh, _ = integ.update(1000, None, T0 + 1600)
+    assert kwh == pytest.approx(1000 * 600 / 3_600_000)
+
+
+def test_clock_going_backwards_is_ignored():
+    integ = EnergyIntegrator()
+    integ.update(1000, None, T0)
+    assert integ.update(1000, None, T0 - 60) == (0.0, 0.0)
+    assert integ.t_acc == T0
@@ -0,0 +1,63 @@
+from datetime import timedelta, timezone
+
+from custom_components.smart_price_charge.fallback import MAX_AGE_DAYS, MIN_SAMPLES, PriceProfile
+from custom_components.smart_price_charge.timeline import PriceTimeline
+
+from conftest import START
+
+
+def day_timeline(make_slots, day, prices, version, skip=()):
+    return PriceTimeline(make_slots(prices, skip=skip, start=START + timedelta(days=day)), timezone.utc, version)
+
+
+def test_median_of_recent_days(make_slots):
+    profile = PriceProfile()
+    for day, level in enumerate((0.1, 0.3, 0.2)):
+        assert profile.add_timeline(day_timeline(make_slots, day, [level] * 24, day + 1))
+    now = START + timedelta(days=2, hours=12)
+    tl = profile.timeline(now)
+    assert tl is not None
+    assert tl.prices[tl.slot_at(now.timestamp())] == 0.2
+    # Heute und morgen, in Viertelstunden
+    assert len(tl) == 2 * 96
+
+
+def test_same_version_is_learned_once(make_slots):
+    profile = PriceProfile()
+    tl = day_timeline(make_slots, 0, [0.1] * 24, 1)
+    assert profile.add_timeline(tl)
+    assert not profile.add_timeline(tl)
+
+
+def test_too_few_days_give_no_prices(make_slots):
+    profile = PriceProfile()
+    for day in range(MIN_SAMPLES - 1):
+        profile.add_timeline(day_timeline(make_slots, day, [0.1] * 24, day + 1))
+    assert profile.timeline(START + timedelta(days=MIN_SAMPLES - 2)) is None
+
+
+def test_stale_profile_is_ignored(make_slots):
+    profile = PriceProfile()
+    for day in range(MIN_SAMPLES):
+        profile.add_timeline(day_timeline(make_slots, day, [0.1] * 24, day + 1))
+    assert profile.timeline(START + timedelta(days=MIN_SAMPLES + MAX_AGE_DAYS)) is None
+
+
+def test_gaps_are_not_learned(make_slots):
+    profile = PriceProfile()
+    for day in range(MIN_SAMPLES):
+        profile.add_timeline(day_timeline(make_slots, day, [0.1] * 24, day + 1, skip={5}))
+    now = START + timedelta(days=MIN_SAMPLES - 1)
+    tl = profile.timeline(now)
+    assert tl.slot_at((now + timedelta(hours=5, minutes=30)).timestamp()) == -1
+    assert tl.slot_at((now + timedelta(hours=4, minutes=30)).timestamp()) >= 0
+
+
+def test_roundtrip_through_storage(make_slots):
+    profile = PriceProfile()
+    profile.add_timeline(day_timeline(make_slots, 0, [0.1] * 24, 1))
+    restored = PriceProfile()
+    restored.load(profile.as_dict())
+    assert restored.days == profile.days and restored.values == profile.values
+    restored.load({"days": [1], "values": []})
+    assert restored.days == profile.days
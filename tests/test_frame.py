@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from custom_components.smart_price_charge.frame import (
+    FLAG_INVALID, FLAG_MISSING, FLAG_STALE, FLAG_UNAVAILABLE, STALE_AFTER, FrameReader,
+)
+
+NOW = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+
+
+def state(value, updated=NOW, **attributes):
+    return SimpleNamespace(state=value, last_updated=updated, last_reported=None, attributes=attributes)
+
+
+def read(reader, states, now=NOW):
+    return reader.read(states.get, now.timestamp())
+
+
+def test_values_and_flags():
+    reader = FrameReader({"soc": "sensor.soc", "grid_w": "sensor.grid", "house_w": "sensor.house",
+                          "pv_w": "sensor.pv", "sun_elevation": "sun.sun"})
+    states = {
+        "sensor.soc": state("55.5"),
+        "sensor.grid": state("unavailable"),
+        "sensor.house": state("abc"),
+        "sun.sun": state("above_horizon", elevation=30),
+    }
+    frame = read(reader, states)
+    assert frame.soc == 55.5 and not frame.flags["soc"]
+    assert frame.flags["grid_w"] == FLAG_UNAVAILABLE and frame.grid_w == 0.0
+    assert frame.flags["house_w"] == FLAG_INVALID
+    assert frame.flags["pv_w"] == FLAG_MISSING
+    assert frame.sun_elevation == 30
+    # Nicht konfiguriert: Ersatzwert ohne Flag
+    assert frame.avg_house_w == 500.0 and not frame.flags["avg_house_w"]
+    assert frame.quality() == {"grid_w": ["unavailable"], "house_w": ["invalid"], "pv_w": ["missing"]}
+
+
+def test_stale_measurement():
+    reader = FrameReader({"soc": "sensor.soc"})
+    old = datetime.fromtimestamp(NOW.timestamp() - STALE_AFTER - 1, timezone.utc)
+    frame = read(reader, {"sensor.soc": state("40", updated=old)})
+    assert frame.flags["soc"] == FLAG_STALE
+    # Veraltet, aber gültig: Wert bleibt erhalten
+    assert frame.soc == 40.0
+    assert frame.flagged("soc", mask=FLAG_STALE)
+
+
+def test_parses_only_new_states():
+    reader = FrameReader({"soc": "sensor.soc"})
+    states = {"sensor.soc": state("40")}
+    read(reader, states)
+    read(reader, states)
+    assert (reader.hits, reader.misses) == (1, 1)
+    states["sensor.soc"] = state("41", updated=datetime(2026, 10, 18, 12, 1, tzinfo=timezone.utc))
+    assert read(reader, states).soc == 41.0
+    assert reader.misses == 2
+
+
+def test_latest_update():
+    reader = FrameReader({"soc": "sensor.soc", "pv_w": "sensor.pv"})
+    later = datetime(2026, 10, 18, 12, 5, tzinfo=timezone.utc)
+    frame = read(reader, {"sensor.soc": state("40"), "sensor.pv": state("100", updated=later)}, later)
+    assert frame.latest("soc", "pv_w") == later.timestamp()
+    assert frame.latest("house_w") is None
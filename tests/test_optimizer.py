@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from custom_components.smart_price_charge.optimizer import (
+    ACTION_CHARGE, ACTION_DISCHARGE, ACTION_HOLD, ChargePlan, solve, solve_policy,
+)
+
+# 8 günstige Viertelstunden, danach teuer
+PRICES = [0.10] * 8 + [0.40] * 40
+
+
+def test_charges_cheap_before_expensive():
+    n = len(PRICES)
+    plan = solve(PRICES, [0.125] * n, [0.0] * n, 0.25, 10.0, 3.0, 20.0, 10.0, 100.0, 0.9, 0.02)
+    assert plan.charge_slots()
+    assert all(i < 8 for i in plan.charge_slots())
+    assert all(a != ACTION_CHARGE for a in plan.actions[8:])
+
+
+def test_flat_prices_never_charge():
+    n = 48
+    plan = solve([0.3] * n, [0.125] * n, [0.0] * n, 0.25, 10.0, 3.0, 50.0, 10.0, 100.0, 0.9, 0.02)
+    assert not plan.charge_slots()
+    assert plan.actions[0] == ACTION_DISCHARGE
+
+
+def test_respects_min_and_target_soc():
+    n = len(PRICES)
+    plan = solve(PRICES, [0.5] * n, [0.0] * n, 0.25, 10.0, 3.0, 50.0, 20.0, 80.0, 0.9, 0.0)
+    assert min(plan.soc) >= 20.0 - 1e-6
+    assert max(plan.soc) <= 80.0 + 1e-6
+
+
+def test_pv_surplus_fills_battery():
+    n = 8
+    plan = solve([0.3] * n, [0.0] * n, [1.0] * n, 0.25, 10.0, 3.0, 50.0, 10.0, 100.0, 0.9, 0.02)
+    assert plan.soc[-1] == pytest.approx(100.0)
+    assert sum(plan.grid_kwh) == 0
+
+
+def test_empty_horizon():
+    plan = solve([], [], [], 0.25, 10.0, 3.0, 40.0, 10.0, 100.0)
+    assert plan.actions == [] and plan.cost == 0.0
+
+
+def test_policy_first_slot_only_in_forward_pass():
+    # Die Rückwärts-Induktion hängt nicht vom ersten Slot ab: gleiche Policy, anderer Bedarf im laufenden Slot
+    rnd = random.Random(3)
+    for _ in range(30):
+        n = rnd.randint(2, 40)
+        prices = [rnd.uniform(-0.05, 0.4) for _ in range(n)]
+        load = [rnd.uniform(0, 1.5) for _ in range(n)]
+        pv = [rnd.uniform(0, 2) for _ in range(n)]
+        policy = solve_policy(prices, load, pv, 0.25, 10.0, 3.0, 20.0, 90.0, 0.9, 0.02)
+        load[0], pv[0] = rnd.uniform(0, 1.5), pv[0] * rnd.random()
+        soc = rnd.uniform(0, 100)
+        ref = solve(prices, load, pv, 0.25, 10.0, 3.0, soc, 20.0, 90.0, 0.9, 0.02)
+        plan = policy.plan(soc, load[0] - pv[0])
+        assert plan.actions == ref.actions and plan.soc == ref.soc
+
+
+def test_plan_advance_and_expected_soc():
+    plan = ChargePlan(10, [ACTION_HOLD, ACTION_CHARGE, ACTION_DISCHARGE], [50.0, 70.0, 60.0], [0.1, 2.0, 0.0], 1.0, 50.0)
+    assert plan.action_at(11) == ACTION_CHARGE
+    assert plan.action_at(13) is None
+    assert plan.expected_soc(11, 0.5) == 60.0
+    later = plan.advance(12)
+    assert later.start == 12 and later.actions == [ACTION_DISCHARGE]
+    assert later.expected_soc(12, 0.0) == 70.0
+    assert plan.charge_slots() == [11]
@@ -0,0 +1,59 @@
+from custom_components.smart_price_charge.optimizer import ACTION_CHARGE, ACTION_DISCHARGE, ChargePlan
+from custom_components.smart_price_charge.plancache import (
+    MAX_AGE, NEED_HYSTERESIS, SOC_DRIFT, PlanCache, PolicyCache, SelectionCache, options_hash, quantise,
+)
+
+
+def make_plan():
+    return ChargePlan(5, [ACTION_CHARGE, ACTION_DISCHARGE, ACTION_DISCHARGE], [60.0, 55.0, 50.0], [1.0, 0.0, 0.0], 0.2, 40.0)
+
+
+def test_plan_cache_reasons():
+    cache = PlanCache()
+    assert cache.lookup("fp", 5, 40.0, 0) is None and cache.reason == "empty"
+    cache.store(make_plan(), "fp", 0)
+    assert cache.lookup("other", 5, 40.0, 0) is None and cache.reason == "inputs"
+    assert cache.lookup("fp", 8, 50.0, 0) is None and cache.reason == "horizon"
+    assert cache.lookup("fp", 5, 40.0, MAX_AGE + 1) is None and cache.reason == "age"
+    assert cache.lookup("fp", 5, 40.0 + SOC_DRIFT + 1, 0) is None and cache.reason == "soc"
+    assert cache.misses == 5
+
+
+def test_plan_cache_follows_plan():
+    cache = PlanCache()
+    cache.store(make_plan(), "fp", 0)
+    # Halber Ladeslot: erwartet 50 %
+    assert cache.lookup("fp", 5, 50.0, 0, 0.5) is not None
+    plan = cache.lookup("fp", 6, 59.0, 900)
+    assert plan.start == 6 and len(plan.actions) == 2
+    assert cache.hits == 2
+
+
+def test_policy_cache_is_lru():
+    cache = PolicyCache(size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_policy_key_quantises_energy():
+    grid, params = (0, 900, 1), (10.0, 3.0, 10, 100, 0.9, 0.02)
+    assert PolicyCache.key(grid, params, [0.101], [0.0]) == PolicyCache.key(grid, params, [0.099], [0.01])
+    assert PolicyCache.key(grid, params, [0.10], [0.0]) != PolicyCache.key(grid, params, [0.20], [0.0])
+
+
+def test_selection_cache_hysteresis():
+    cache = SelectionCache()
+    assert cache.lookup("fp", 2.0, 0) is None
+    cache.store([3, 4, 7], "fp", 2.0)
+    assert cache.lookup("fp", 2.0 + NEED_HYSTERESIS / 2, 4) == [4, 7]
+    assert cache.lookup("fp", 2.0 + NEED_HYSTERESIS, 4) is None
+    assert cache.lookup("fp", 2.0, 8) is None
+
+
+def test_helpers():
+    assert quantise(0.26, 0.25) == 1
+    assert options_hash({"a": 1, "b": 2}) == options_hash({"b": 2, "a": 1})
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from custom_components.smart_price_charge.timeline import PriceTimeline
+
+from conftest import START
+
+
+def ts(hours):
+    return (START + timedelta(hours=hours)).timestamp()
+
+
+def test_slot_at_hourly(make_slots):
+    tl = PriceTimeline(make_slots([i / 10 for i in range(24)]))
+    assert len(tl) == 24 and tl.slot_seconds == 3600
+    assert tl.slot_at(ts(5.5)) == 5
+    assert tl.slot_at(ts(-0.1)) == -1
+    assert tl.slot_at(ts(24)) == -1
+    assert tl.end == ts(24)
+
+
+def test_gap_is_unknown(make_slots):
+    # Stunde 05 fehlt: kein Preis statt des 04:00-Slots
+    tl = PriceTimeline(make_slots([i / 10 for i in range(24)], skip={5}))
+    assert tl.slot_at(ts(5.5)) == -1
+    assert tl.slot_at(ts(4.5)) == 4
+    assert tl.slot_at(ts(6.1)) == 6
+    assert tl.gaps == {5}
+    # Interpolierte Schätzung für den Planer, aber nie als Ladeslot
+    assert abs(tl.prices[5] - 0.5) < 1e-9
+    assert 5 not in tl.cheapest(0, 24, 10)
+
+
+def test_gap_on_finer_grid(make_slots):
+    tl = PriceTimeline(make_slots([1.0] * 24, skip={5}), slot_seconds=900)
+    assert sorted(tl.gaps) == [20, 21, 22, 23]
+    assert tl.slot_at(ts(5.9)) == -1
+    assert tl.slot_at(ts(6)) == 24
+
+
+def test_resample_finer_keeps_price(make_slots):
+    tl = PriceTimeline(make_slots([0.1, 0.2]), slot_seconds=900)
+    assert tl.prices == [0.1] * 4 + [0.2] * 4
+    assert tl.source_seconds == 3600
+
+
+def test_resample_coarser_averages(make_slots):
+    tl = PriceTimeline(make_slots([0.1, 0.2, 0.3, 0.4], minutes=15), slot_seconds=3600)
+    assert len(tl) == 1
+    assert abs(tl.prices[0] - 0.25) < 1e-9
+
+
+def test_mixed_resolution_uses_finest(make_slots):
+    slots = make_slots([0.2, 0.2]) + make_slots([0.1] * 4, minutes=15, start=START + timedelta(hours=2))
+    tl = PriceTimeline(slots)
+    assert tl.slot_seconds == 900
+    assert len(tl) == 12 and not tl.gaps
+
+
+def test_peak_and_cheapest_prefer_earlier_on_ties(make_slots):
+    tl = PriceTimeline(make_slots([0.3, 0.1, 0.3, 0.1, 0.2]))
+    assert tl.peak_from(0) == 0
+    assert tl.peak_from(1) == 2
+    assert tl.peak_from(5) is None
+    assert tl.cheapest(0, 5, 2) == [1, 3]
+    assert tl.cheapest(2, 5, 1) == [3]
+    assert tl.cheapest(0, 2, 3) == []
+    assert tl.max_price(3, 5) == 0.2
+
+
+def test_dst_autumn_day_has_25_hours():
+    tz = ZoneInfo("Europe/Berlin")
+    start = datetime(2025, 10, 26, tzinfo=tz)
+    slots = [{"startsAt": datetime.fromtimestamp(start.timestamp() + 3600 * i, tz).isoformat(), "total": 0.1}
+             for i in range(25)]
+    tl = PriceTimeline(slots, tz)
+    assert len(tl) == 25 and not tl.gaps
+    assert tl.time(24).hour == 23
@@ -0,0 +1,330 @@
+"""Benchmarks für Planer und Preis-Pipeline von SmartPriceCharge.
+
+Misst pro Szenario:
+  price_parse     Aufbau der PriceTimeline aus der Tibber-Antwort (einmal pro Abruf)
+  slot_selection  Peak-Suche und Auswahl der günstigsten Slots (pro Tick)
+  optimizer       DP-Planer über den ganzen Horizont (nur bei geänderten Eingaben)
+  decide          Entscheidungs-Kern allein (engine.py, ohne Home Assistant)
+  run_logic       Kompletter Entscheidungs-Tick mit Fake-hass (benötigt `homeassistant`)
+  fleet_32        Kalter Flotten-Takt: 32 Akkus mit eigener Größe, Last und PV planen einzeln
+                  (der gemeinsame Policy-Cache trifft dabei nicht), nur für quarter_192
+
+Mit --check laufen stattdessen Plausibilitätsprüfungen des DP-Planers, seine
+Laufzeit für quarter_192 gegen BUDGETS_MS und die Benchmarks ohne Home Assistant
+gegen die eingecheckte Baseline (BASELINE, oder --compare) mit --tolerance
+(Exit-Code 1 bei Fehlern, Überschreitung oder Regression). Die Baseline gilt für
+die Maschine, auf der sie gespeichert wurde; auf anderer Hardware neu speichern.
+
+Ziel-Budgets (Raspberry Pi 4, siehe BUDGETS_MS): ein Tick inkl. Planung < 5 ms,
+der DP-Planer wenige ms für 192 Slots × 101 SoC-Level. Der Planer ist reines
+Python (ohne NumPy); Überschreitungen werden mit " !" markiert und lassen --check
+fehlschlagen. Er läuft nur bei geänderten Eingaben (Policy-Cache), nicht in jedem Tick.
+
+Beispiele:
+    python tools/benchmark.py --save tools/benchmark_baseline.json
+    python tools/benchmark.py --compare tools/benchmark_baseline.json --tolerance 1.5
+    python tools/benchmark.py --check
+    python tools/benchmark.py --check --compare /tmp/pi4_baseline.json
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PACKAGE = os.path.join(ROOT, "custom_components", "smart_price_charge")
+TZ = ZoneInfo("Europe/Berlin")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+BUDGETS_MS = {
+    "price_parse": 5.0,
+    "slot_selection": 0.5,
+    "optimizer": 5.0,
+    "decide": 2.0,
+    "run_logic": 5.0,
+}
+# Die Flotte teilt nur den Timer, jeder Akku plant selbst: Budget = FLEET_SIZE × optimizer
+FLEET_SIZE = 32
+BUDGETS_MS["fleet_32"] = FLEET_SIZE * BUDGETS_MS["optimizer"]
+FLEET_GROUPS = 4
+# Plausibilität: 8 günstige Viertelstunden, danach nur noch 0,40 €/kWh; (Kapazität kWh, Last W).
+# Bei Lasten unter einem SoC-Level pro Slot darf der Planer weder halten noch teuer laden.
+CHECK_PRICES = [0.10] * 8 + [0.40] * 88
+CHECK_CASES = ((20.0, 200.0), (20.0, 390.0), (10.0, 300.0), (10.0, 500.0))
+CHECK_MIN_SOC = 10.0
+
+
+def _load_pure(name):
+    """Lädt ein HA-freies Modul direkt aus der Datei (ohne Paket-__init__)."""
+    spec = importlib.util.spec_from_file_location(f"spc_{name}", os.path.join(PACKAGE, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+timeline_mod = _load_pure("timeline")
+optimizer_mod = _load_pure("optimizer")
+plancache_mod = _load_pure("plancache")
+# Die Engine importiert relativ; das Paket-__init__ lädt Home Assistant erst beim Setup
+sys.path.insert(0, ROOT)
+from custom_components.smart_price_charge import engine as engine_mod
+
+
+def _day_slots(day, minutes, price_fn):
+    """Tibber-artige Slots eines lokalen Tages (DST-korrekt über UTC)."""
+    start = datetime.combine(day, datetime.min.time(), TZ).astimezone(timezone.utc)
+    end = datetime.combine(day + timedelta(days=1), datetime.min.time(), TZ).astimezone(timezone.utc)
+    slots, t = [], start
+    while t < end:
+        local = t.astimezone(TZ)
+        slots.append({"startsAt": local.isoformat(), "total": round(price_fn(local), 4)})
+        t += timedelta(minutes=minutes)
+    return slots
+
+
+def _daily_curve(local):
+    h = local.hour + local.minute / 60
+    return 0.28 + 0.08 * math.sin((h - 6) / 24 * 4 * math.pi) + 0.01 * math.cos(h * 7)
+
+
+def _negative_curve(local):
+    h = local.hour + local.minute / 60
+    return _daily_curve(local) - (0.35 if 11 <= h < 15 else 0.0)
+
+
+def scenarios():
+    d = datetime(2025, 6, 10).date()
+    return {
+        "hourly_24": _day_slots(d, 60, _daily_curve),
+        "quarter_96": _day_slots(d, 15, _daily_curve),
+        "quarter_192": _day_slots(d, 15, _daily_curve) + _day_slots(d + timedelta(days=1), 15, _daily_curve),
+        "negative_192": _day_slots(d, 15, _negative_curve) + _day_slots(d + timedelta(days=1), 15, _negative_curve),
+        "no_tomorrow_96": _day_slots(d, 15, _daily_curve),
+        "mixed_120": _day_slots(d, 60, _daily_curve) + _day_slots(d + timedelta(days=1), 15, _daily_curve),
+        "dst_spring_92": _day_slots(datetime(2025, 3, 30).date(), 15, _daily_curve),
+        "dst_autumn_100": _day_slots(datetime(2025, 10, 26).date(), 15, _daily_curve),
+    }
+
+
+def _measure(fn, repeat, number):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number): fn()
+        runs.append((time.perf_counter() - start) * 1000 / number)
+    return {"median_ms": round(statistics.median(runs), 4), "min_ms": round(min(runs), 4)}
+
+
+def bench_pure(slots, repeat):
+    tl = timeline_mod.PriceTimeline(slots, TZ)
+    now = tl.starts[0] + 8 * 3600 + 60
+    start = tl.index_from(now - now % 3600)
+    end = len(tl)
+
+    def select():
+        tl.peak_from(start)
+        tl.cheapest(start, end, 16)
+
+    n = end - start
+    slot_h = tl.slot_seconds / 3600
+    load = [0.5 * slot_h] * n
+    pv = [0.0] * n
+
+    def optimize():
+        optimizer_mod.solve(tl.prices[start:], load, pv, slot_h, 10.0, 3.0, 35.0, 10.0, 100.0, 0.9, 0.02)
+
+    return {
+        "price_parse": _measure(lambda: timeline_mod.PriceTimeline(slots, TZ), repeat, 20),
+        "slot_selection": _measure(select, repeat, 200),
+        "optimizer": _measure(optimize, max(3, repeat // 3), 1),
+    }
+
+
+def check_optimizer():
+    """Plant CHECK_CASES ab 50 % und liefert die Auffälligkeiten als Liste."""
+    errors = []
+    n = len(CHECK_PRICES)
+    for cap, load_w in CHECK_CASES:
+        plan = optimizer_mod.solve(CHECK_PRICES, [load_w / 1000 * 0.25] * n, [0.0] * n, 0.25, cap, 3.0,
+                                   50.0, CHECK_MIN_SOC, 100.0, 0.9, 0.02)
+        for i, (price, action) in enumerate(zip(CHECK_PRICES, plan.actions)):
+            before = plan.soc[i - 1] if i else plan.soc_start
+            if price < max(CHECK_PRICES): continue
+            if action == optimizer_mod.ACTION_CHARGE:
+                errors.append(f"{cap:g} kWh / {load_w:g} W: lädt in Slot {i} zu {price} €/kWh")
+            elif action == optimizer_mod.ACTION_HOLD and before > CHECK_MIN_SOC + 1:
+                errors.append(f"{cap:g} kWh / {load_w:g} W: hält in Slot {i} bei {before:.0f} % und kauft zu {price} €/kWh")
+            else: continue
+            break
+    return errors
+
+
+def check_budget(repeat):
+    """DP-Planer für 192 Slots gegen sein Budget (bester Lauf, damit Ausreißer nicht zählen)."""
+    optimizer = bench_pure(scenarios()["quarter_192"], repeat)["optimizer"]
+    if optimizer["min_ms"] <= BUDGETS_MS["optimizer"]: return []
+    return [f"optimizer quarter_192: {optimizer['min_ms']} ms > Budget {BUDGETS_MS['optimizer']} ms"]
+
+
+def check_regression(repeat, path, tolerance):
+    """Benchmarks ohne Home Assistant (alle Szenarien) gegen die Baseline unter `path`."""
+    if not os.path.exists(path): return [f"Baseline {path} fehlt (mit --save anlegen)"]
+    with open(path) as f: baseline = json.load(f)
+    results = {}
+    for name, slots in scenarios().items():
+        results[name] = bench_pure(slots, repeat)
+        results[name]["decide"] = bench_decide(slots, repeat)
+    return [f"Regression {r}" for r in compare({"results": results}, baseline, tolerance)]
+
+
+def bench_fleet(slots, repeat):
+    """Ein kalter Flotten-Takt: jeder Standort hat eigene Last und PV, plant also selbst."""
+    tl = timeline_mod.PriceTimeline(slots, TZ)
+    slot_h = tl.slot_seconds / 3600
+    hours = [(ts - tl.starts[0]) / 3600 % 24 for ts in tl.starts]
+    sites = []
+    for i in range(FLEET_SIZE):
+        base_w, peak_kw = 300.0 + 23 * i, 2.0 + (i % 7)
+        load_w = [base_w * (1.3 if 17 <= h < 22 else 1.0) for h in hours]
+        pv = [max(0.0, math.sin((h - 6) / 14 * math.pi)) * peak_kw * slot_h for h in hours]
+        sites.append((10.0 + 5 * (i % FLEET_GROUPS), 3.0, 20.0 + i * 2, load_w, pv))
+
+    def tick():
+        cache = plancache_mod.PolicyCache(2 * FLEET_SIZE)
+        for cap, kw, soc, load_w, pv in sites:
+            load = [w / 1000 * slot_h for w in load_w]
+            key = cache.key((0, tl.slot_seconds, hash(tuple(tl.prices))), (cap, kw, 10, 100, 0.9, 0.02), load[1:], pv[1:])
+            policy = cache.get(key)
+            if policy is None:
+                policy = cache.put(key, optimizer_mod.solve_policy(tl.prices, load, pv, slot_h, cap, kw, 10.0, 100.0, 0.9, 0.02))
+            policy.plan(soc)
+
+    return _measure(tick, max(3, repeat // 3), 1)
+
+
+def bench_decide(slots, repeat):
+    """Ein Tick der Engine mit festem Eingabe-Snapshot, die Uhr läuft pro Aufruf eine Minute weiter."""
+    tl = timeline_mod.PriceTimeline(slots, TZ, 1)
+    engine = engine_mod.Engine()
+    settings = engine_mod.EngineSettings(10.0, 3.0)
+    inp = engine_mod.EngineInput(
+        datetime.fromisoformat(slots[0]["startsAt"]) + timedelta(hours=8, minutes=1), tl, slots[0]["total"],
+        35.0, 10.0, settings, house_w=450.0, avg_house_w=500.0,
+    )
+
+    def tick():
+        inp.now += timedelta(seconds=60)
+        engine.decide(inp)
+
+    return _measure(tick, repeat, 20)
+
+
+def bench_run_logic(slots, repeat):
+    """Voller Tick über den Simulator; None, wenn Home Assistant nicht installiert ist."""
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import simulate
+    except ImportError:
+        return None
+
+    settings = {"capacity": 10.0, "charge_kw": 3.0, "soc": 35.0, "avg_house": 500.0, "ref_price": 0.35, "tick": 1}
+    first = datetime.fromisoformat(slots[0]["startsAt"])
+    start = first + timedelta(hours=8, minutes=1)
+    with simulate.simulated_manager({}, settings, start) as (hass, manager, clock, options):
+        manager.timeline = simulate.PriceTimeline(slots, TZ, 1)
+        manager.current_api_price = slots[0]["total"]
+        for key, value in ((simulate.CONF_SOC_SENSOR, 35), (simulate.CONF_PV_POWER, 0),
+                           (simulate.CONF_HOUSE_POWER, 450), (simulate.CONF_AVG_CONSUMPTION, 500),
+                           (simulate.CONF_GRID_POWER, -450), (simulate.CONF_BATTERY_POWER, 0)):
+            hass.states.async_set(simulate.ENTITIES[key], value)
+        loop = asyncio.new_event_loop()
+
+        def tick():
+            clock.now += timedelta(seconds=60)
+            loop.run_until_complete(manager.run_logic())
+            loop.run_until_complete(hass.async_run_pending())
+
+        try:
+            return _measure(tick, repeat, 20)
+        finally:
+            loop.close()
+
+
+def run(repeat):
+    results = {}
+    for name, slots in scenarios().items():
+        res = bench_pure(slots, repeat)
+        res["decide"] = bench_decide(slots, repeat)
+        logic = bench_run_logic(slots, repeat)
+        if logic is not None: res["run_logic"] = logic
+        if name == "quarter_192": res["fleet_32"] = bench_fleet(slots, repeat)
+        results[name] = res
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "time": datetime.now(timezone.utc).isoformat(),
+        },
+        "budgets_ms": BUDGETS_MS,
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Liste der Regressionen (Median langsamer als Baseline × Toleranz)."""
+    regressions = []
+    for scenario, benches in current["results"].items():
+        for bench, value in benches.items():
+            ref = baseline.get("results", {}).get(scenario, {}).get(bench)
+            if ref and value["median_ms"] > ref["median_ms"] * tolerance:
+                regressions.append(f"{scenario}/{bench}: {value['median_ms']} ms (Baseline {ref['median_ms']} ms)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--save", help="Ergebnis als JSON-Baseline speichern")
+    parser.add_argument("--compare", help="Gegen eine gespeicherte Baseline prüfen")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--check", action="store_true", help="Plausibilität, Budget des Planers und Regressionen gegen die Baseline")
+    args = parser.parse_args()
+
+    if args.check:
+        errors = (check_optimizer() + check_budget(args.repeat)
+                  + check_regression(args.repeat, args.compare or BASELINE, args.tolerance))
+        for e in errors: print(f"FEHLER {e}")
+        if errors: sys.exit(1)
+        print(f"Planer plausibel ({len(CHECK_CASES)} Fälle), im Budget und ohne Regression")
+        return
+
+    current = run(args.repeat)
+    for scenario, benches in current["results"].items():
+        line = ", ".join(
+            f"{b} {v['median_ms']:.3f} ms{' !' if v['median_ms'] > BUDGETS_MS.get(b, math.inf) else ''}"
+            for b, v in benches.items()
+        )
+        print(f"{scenario:16s} {line}")
+
+    if args.save:
+        with open(args.save, "w") as f: json.dump(current, f, indent=2)
+        print(f"Baseline gespeichert: {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        for r in regressions: print(f"REGRESSION {r}")
+        if regressions: sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Offline-Simulation der SmartPriceCharge Entscheidungslogik.
+
+Spielt aufgezeichnete Preis-, PV- und Hausverbrauchs-Zeitreihen gegen
+`SmartPriceChargeManager.run_logic` ab – ohne laufendes Home Assistant,
+ohne echte Wartezeiten und ohne echte Service-Aufrufe.
+
+CSV-Format (eine Zeile pro Slot, z.B. 15 min):
+    time,price,pv_w,house_w
+    2025-01-01T00:00:00+01:00,0.281,0,420
+
+Beispiele:
+    python tools/simulate.py data.csv
+    python tools/simulate.py data.csv --sweep min_price_spread_eur=0.02,0.04,0.08 --sweep sleep_over_soc=20,30
+    python tools/simulate.py data.csv --pv-forecast   # PV-Kurve (perfekte Prognose) im Solcast-Format
+
+Benötigt das Paket `homeassistant` (Entwicklungsumgebung), da der Manager importiert wird.
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import homeassistant.util.dt as dt_util
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from custom_components.smart_price_charge.const import *
+from custom_components.smart_price_charge.manager import SmartPriceChargeManager
+from custom_components.smart_price_charge.store import TrackerStore
+from custom_components.smart_price_charge.timeline import PriceTimeline
+
+MIN_SOC_ENTITY = "number.sim_min_soc"
+PV_FORECAST_ENTITY = "sensor.sim_pv_forecast"
+MODE_NORMAL = "Normal"
+MODE_CHARGE = "ForceCharge"
+
+ENTITIES = {
+    CONF_SOC_SENSOR: "sensor.sim_soc",
+    CONF_INVERTER_ENTITY: "select.sim_mode",
+    CONF_PV_POWER: "sensor.sim_pv",
+    CONF_GRID_POWER: "sensor.sim_grid",
+    CONF_BATTERY_POWER: "sensor.sim_battery",
+    CONF_HOUSE_POWER: "sensor.sim_house",
+    CONF_AVG_CONSUMPTION: "sensor.sim_house_avg",
+}
+
+
+class FakeState:
+    __slots__ = ("entity_id", "state", "attributes", "last_updated", "last_changed", "last_reported")
+
+    def __init__(self, entity_id, state, attributes, now):
+        self.entity_id = entity_id
+        self.state = state
+        self.attributes = attributes or {}
+        self.last_updated = now
+        self.last_changed = now
+        self.last_reported = now
+
+
+class FakeStates:
+    """Minimale State-Machine mit virtueller Uhr."""
+
+    def __init__(self, clock):
+        self._clock = clock
+        self._states = {}
+
+    def get(self, entity_id):
+        return self._states.get(entity_id)
+
+    def async_set(self, entity_id, state, attributes=None, *args, **kwargs):
+        old = self._states.get(entity_id)
+        if old and old.state == str(state) and not attributes:
+            # Wie HA: gleicher Wert erneuert nur last_reported
+            old.last_reported = self._clock()
+            return
+        self._states[entity_id] = FakeState(entity_id, str(state), attributes, self._clock())
+
+
+class FakeServices:
+    """Nimmt Service-Aufrufe entgegen und spiegelt sie in die States."""
+
+    def __init__(self, states):
+        self._states = states
+        self.calls = 0
+
+    async def async_call(self, domain, service, data=None, *args, **kwargs):
+        self.calls += 1
+        data = data or {}
+        if service == "select_option":
+            self._states.async_set(data["entity_id"], data["option"])
+        elif service == "set_value":
+            self._states.async_set(data["entity_id"], data["value"])
+
+
+class FakeHass:
+    def __init__(self, clock, storage_dir):
+        self.states = FakeStates(clock)
+        self.services = FakeServices(self.states)
+        self.config = SimpleNamespace(path=lambda *p: os.path.join(storage_dir, *p))
+        self.data = {}
+
+        self.pending = []
+
+    def async_create_task(self, coro, *args, **kwargs):
+        # Hintergrund-Tasks laufen direkt nach dem jeweiligen Tick
+        self.pending.append(coro)
+
+    async def async_run_pending(self):
+        while self.pending:
+            await self.pending.pop(0)
+
+
+class Battery:
+    """Einfaches Speichermodell: Eigenverbrauch oder Zwangsladung."""
+
+    def __init__(self, capacity_kwh, charge_kw, efficiency, soc):
+        self.capacity = capacity_kwh
+        self.charge_kw = charge_kw
+        self.efficiency = efficiency
+        self.soc = soc
+        self.throughput_kwh = 0.0
+
+    def step(self, mode, min_soc, pv_w, house_w, hours):
+        """Gibt (Netzbezug W, Batterieleistung W) zurück. Batterie > 0 = Entladen."""
+        net_w = house_w - pv_w
+        stored = self.soc / 100 * self.capacity
+        floor = max(0.0, min_soc) / 100 * self.capacity
+        if mode == MODE_CHARGE:
+            charge_w = min(self.charge_kw * 1000, (self.capacity - stored) / self.efficiency / hours * 1000)
+            batt_w = -max(0.0, charge_w)
+        elif net_w > 0:
+            batt_w = min(net_w, max(0.0, stored - floor) / hours * 1000)
+        else:
+            batt_w = -min(-net_w, (self.capacity - stored) / self.efficiency / hours * 1000)
+        delta_kwh = -batt_w / 1000 * hours
+        if delta_kwh > 0: delta_kwh *= self.efficiency
+        self.soc = max(0.0, min(100.0, (stored + delta_kwh) / self.capacity * 100))
+        self.throughput_kwh += abs(batt_w) / 1000 * hours
+        return net_w - batt_w, batt_w
+
+
+def load_series(path):
+    rows = []
+    with open(path, newline="") as f:
+        for r in csv.DictReader(f):
+            rows.append((datetime.fromisoformat(r["time"]), float(r["price"]), float(r["pv_w"]), float(r["house_w"])))
+    rows.sort(key=lambda r: r[0])
+    return rows
+
+
+def _day_pv_forecasts(rows):
+    """Solcast-artige `detailedForecast`-Attribute pro Tag (heute + morgen) aus der PV-Zeitreihe."""
+    by_day = {}
+    for t, _, pv_w, _ in rows:
+        by_day.setdefault(t.date(), []).append({"period_start": t.isoformat(), "pv_estimate": round(pv_w / 1000, 3)})
+    return {day: {"detailedForecast": points + by_day.get(day + timedelta(days=1), [])} for day, points in by_day.items()}
+
+
+def _day_timelines(rows):
+    """Vorberechnete Timelines pro Tag: (nur heute, heute + morgen ab 13 Uhr)."""
+    by_day = {}
+    for t, price, _, _ in rows:
+        by_day.setdefault(t.date(), []).append({"startsAt": t.isoformat(), "total": price})
+    tz = rows[0][0].tzinfo
+    result, version = {}, 0
+    for day, slots in by_day.items():
+        tomorrow = by_day.get(day + timedelta(days=1), [])
+        version += 2
+        result[day] = (PriceTimeline(slots, tz, version - 1), PriceTimeline(slots + tomorrow, tz, version))
+    return result
+
+
+@contextmanager
+def simulated_manager(options, settings, start):
+    """Manager mit Fake-hass und virtueller Uhr; liefert (hass, manager, clock, options)."""
+    clock = SimpleNamespace(now=start)
+    now_fn = lambda: clock.now
+    storage = tempfile.mkdtemp(prefix="spc_sim_")
+    hass = FakeHass(now_fn, storage)
+    data = dict(ENTITIES)
+    if settings.get("pv_forecast"): data[CONF_PV_FC_REM] = PV_FORECAST_ENTITY
+    data.update({
+        CONF_MODE_OPTION_NORMAL: MODE_NORMAL,
+        CONF_MODE_OPTION_FORCE_CHARGE: MODE_CHARGE,
+        CONF_BATTERY_CAPACITY: settings["capacity"],
+        CONF_CHARGER_POWER: settings["charge_kw"],
+        CONF_REFERENCE_PRICE: settings["ref_price"],
+    })
+    options = {CONF_INVERTER_MIN_SOC_ENTITY: MIN_SOC_ENTITY, **options}
+    entry = SimpleNamespace(entry_id="sim", data=data, options=options)
+    hass.states.async_set(MIN_SOC_ENTITY, options.get(CONF_MIN_SOC, DEFAULT_MIN_SOC))
+
+    def _coordinator_init(self, hass, *args, **kwargs):
+        self.hass = hass
+
+    with mock.patch.object(DataUpdateCoordinator, "__init__", _coordinator_init), \
+         mock.patch.object(dt_util, "now", lambda *a: clock.now), \
+         mock.patch.object(TrackerStore, "_schedule_save", lambda self: None):
+        yield hass, SmartPriceChargeManager(hass, entry), clock, options
+
+
+async def _run(rows, options, settings):
+    with simulated_manager(options, settings, rows[0][0]) as (hass, manager, clock, options):
+        battery = Battery(settings["capacity"], settings["charge_kw"],
+                          options.get(CONF_BATTERY_EFFICIENCY, DEFAULT_EFFICIENCY), settings["soc"])
+        timelines = _day_timelines(rows)
+        pv_forecasts = _day_pv_forecasts(rows) if settings.get("pv_forecast") else {}
+        tick = timedelta(minutes=settings["tick"])
+        hours = tick.total_seconds() / 3600
+
+        cost = baseline = 0.0
+        decisions = 0
+        for i, (t, price, pv_w, house_w) in enumerate(rows):
+            slot_end = rows[i + 1][0] if i + 1 < len(rows) else t + timedelta(minutes=15)
+            clock.now = t
+            while clock.now < slot_end:
+                today_tl, full_tl = timelines[clock.now.date()]
+                manager.timeline = full_tl if clock.now.hour >= 13 else today_tl
+                manager.prices_tomorrow = [None] if manager.timeline is full_tl and len(full_tl) > len(today_tl) else []
+                manager.current_api_price = price
+                if pv_forecasts and clock.now.date() in pv_forecasts:
+                    hass.states.async_set(PV_FORECAST_ENTITY, 0, pv_forecasts.pop(clock.now.date()))
+
+                mode_state = hass.states.get(ENTITIES[CONF_INVERTER_ENTITY])
+                mode = mode_state.state if mode_state else MODE_NORMAL
+                min_soc = float(hass.states.get(MIN_SOC_ENTITY).state)
+                grid_w, batt_w = battery.step(mode, min_soc, pv_w, house_w, hours)
+                cost += max(0.0, grid_w) / 1000 * hours * price
+                baseline += max(0.0, house_w - pv_w) / 1000 * hours * price
+
+                hass.states.async_set(ENTITIES[CONF_SOC_SENSOR], round(battery.soc, 1))
+                hass.states.async_set(ENTITIES[CONF_PV_POWER], pv_w)
+                hass.states.async_set(ENTITIES[CONF_HOUSE_POWER], house_w)
+                hass.states.async_set(ENTITIES[CONF_AVG_CONSUMPTION], settings["avg_house"])
+                hass.states.async_set(ENTITIES[CONF_GRID_POWER], round(-grid_w, 1))
+                hass.states.async_set(ENTITIES[CONF_BATTERY_POWER], round(batt_w, 1))
+
+                await manager.run_logic()
+                await hass.async_run_pending()
+                decisions += 1
+                clock.now += tick
+
+    return {
+        "options": {k: v for k, v in options.items() if k != CONF_INVERTER_MIN_SOC_ENTITY},
+        "cost_eur": round(cost, 2),
+        "baseline_cost_eur": round(baseline, 2),
+        "savings_eur": round(baseline - cost, 2),
+        "cycles": round(battery.throughput_kwh / (2 * settings["capacity"]), 1),
+        "decisions": decisions,
+        "service_calls": hass.services.calls,
+        "track_cost": round(manager.tracker_cost_total, 2),
+        "track_saved": round(manager.tracker_savings_total, 2),
+        "track_discharge": round(manager.tracker_discharge_savings, 2),
+        "track_pv": round(manager.tracker_pv_savings, 2),
+        "track_kwh": round(manager.tracker_charged_kwh, 2),
+    }
+
+
+def run_simulation(rows, options, settings):
+    return asyncio.run(_run(rows, options, settings))
+
+
+def _parse_sweeps(sweeps):
+    axes = []
+    for item in sweeps:
+        key, values = item.split("=", 1)
+        axes.append([(key, json.loads(v)) for v in values.split(",")])
+    return [dict(combo) for combo in itertools.product(*axes)] if axes else [{}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("csv")
+    parser.add_argument("--capacity", type=float, default=10.0)
+    parser.add_argument("--charge-kw", type=float, default=3.0)
+    parser.add_argument("--soc", type=float, default=50.0)
+    parser.add_argument("--avg-house", type=float, default=500.0)
+    parser.add_argument("--ref-price", type=float, default=0.35)
+    parser.add_argument("--tick", type=int, default=5, help="Minuten zwischen zwei Entscheidungen")
+    parser.add_argument("--options", default="{}", help="JSON mit Options-Werten")
+    parser.add_argument("--sweep", action="append", default=[], help="key=v1,v2,... (mehrfach möglich)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--pv-forecast", action="store_true", help="PV-Kurve aus den Messwerten als Prognose bereitstellen")
+    args = parser.parse_args()
+
+    rows = load_series(args.csv)
+    settings = {
+        "capacity": args.capacity, "charge_kw": args.charge_kw, "soc": args.soc,
+        "avg_house": args.avg_house, "ref_price": args.ref_price, "tick": args.tick,
+        "pv_forecast": args.pv_forecast,
+    }
+    base = json.loads(args.options)
+    variants = [{**base, **v} for v in _parse_sweeps(args.sweep)]
+
+    if len(variants) == 1:
+        results = [run_simulation(rows, variants[0], settings)]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(run_simulation, itertools.repeat(rows), variants, itertools.repeat(settings)))
+
+    results.sort(key=lambda r: r["cost_eur"])
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()